@@ -0,0 +1,135 @@
+# Arquivo: banco/acessos.py
+# Data: 17/10/2026
+# Gravação assíncrona do log de acessos (tabela log_acessos)
+# registrar_acesso apenas coloca a linha em uma fila; uma thread em segundo
+# plano grava as linhas em lote (executemany) a cada LOTE linhas ou a cada
+# INTERVALO_MS milissegundos, o que ocorrer primeiro. As linhas pendentes são
+# gravadas ao encerrar o processo (atexit).
+
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from banco import escrita
+
+logger = logging.getLogger(__name__)
+
+# Linhas acumuladas antes de gravar
+LOTE = 50
+
+# Tempo máximo (ms) que uma linha fica na fila antes de ser gravada
+INTERVALO_MS = 500
+
+_SQL_INSERT = """
+    INSERT INTO log_acessos (user_id, data_acesso, hora_acesso, programa, acao)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+_FIM = object()  # sentinela: encerra a thread
+
+
+class GravadorAcessos:
+    """
+    Fila de linhas do log de acessos com uma thread gravadora.
+
+    A thread é iniciada no primeiro registro. descarregar() grava as linhas
+    pendentes e só retorna depois da gravação (ex: antes de ler o log).
+    As gravações são feitas pelo escritor único do processo (banco/escrita.py)
+    ou pelo CoordenadorEscrita informado.
+    """
+
+    def __init__(self, escritor=None, lote=LOTE, intervalo_ms=INTERVALO_MS):
+        self.escritor = escritor or escrita
+        self.lote = lote
+        self.intervalo = intervalo_ms / 1000
+        self._fila = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.gravadas = 0
+        self.erros = 0
+
+    def registrar(self, user_id, data_acesso, hora_acesso, programa, acao):
+        """Enfileira uma linha do log (não acessa o banco)"""
+        self._iniciar()
+        self._fila.put((user_id, data_acesso, hora_acesso, programa, acao))
+
+    def descarregar(self, timeout=5.0):
+        """Grava as linhas pendentes e aguarda a gravação"""
+        if self._thread is None:
+            return
+        concluido = threading.Event()
+        self._fila.put(concluido)
+        concluido.wait(timeout)
+
+    def encerrar(self, timeout=5.0):
+        """Grava as linhas pendentes e finaliza a thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._fila.put(_FIM)
+        thread.join(timeout)
+
+    def _iniciar(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._executar, name="gravador-log-acessos", daemon=True
+                )
+                self._thread.start()
+
+    def _executar(self):
+        pendentes = []
+        limite = None  # instante em que as pendentes devem ser gravadas
+        while True:
+            espera = None if limite is None else max(0.0, limite - time.monotonic())
+            try:
+                item = self._fila.get(timeout=espera)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, tuple):
+                pendentes.append(item)
+                if limite is None:
+                    limite = time.monotonic() + self.intervalo
+                if len(pendentes) < self.lote:
+                    continue
+
+            # Lote cheio, intervalo esgotado, descarregar() ou encerrar()
+            self._gravar(pendentes)
+            pendentes = []
+            limite = None
+
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is _FIM:
+                return
+
+    def _gravar(self, linhas):
+        if not linhas:
+            return
+        try:
+            self.escritor.executar(lambda cursor: cursor.executemany(_SQL_INSERT, linhas))
+            self.gravadas += len(linhas)
+        except Exception:
+            # Qualquer erro (banco, tempo esgotado no escritor) não pode encerrar a thread
+            self.erros += len(linhas)
+            logger.exception("Erro ao gravar log de acessos (%d linhas)", len(linhas))
+
+
+_gravador = GravadorAcessos()
+atexit.register(_gravador.encerrar)
+
+
+def registrar(user_id, data_acesso, hora_acesso, programa, acao):
+    """Enfileira uma linha do log de acessos no gravador do processo"""
+    _gravador.registrar(user_id, data_acesso, hora_acesso, programa, acao)
+
+
+def descarregar():
+    """Grava as linhas pendentes do log de acessos"""
+    _gravador.descarregar()
@@ -0,0 +1,194 @@
+# Arquivo: banco/cenarios.py
+# Data: 17/10/2026
+# Cenários nomeados por usuário
+# Cada cenário guarda apenas as células de entrada (input, selectbox e
+# input_data) que diferem do padrão do template: um "delta" compacto, do mesmo
+# jeito que a valores_usuario. As células calculadas não são guardadas;
+# são recalculadas ao ativar (recálculo incremental) ou comparar os cenários
+# (uma passada vetorizada, motor/lote.py). Os dados atuais do usuário também são lidos como
+# delta, das linhas gravadas na valores_usuario, e ativar um cenário só
+# toca a diferença simétrica entre os dois deltas.
+
+from banco.valores import TABELA as TABELA_USUARIO, TIPOS_TEXTO
+from motor.lote import LoteUsuarios
+from motor.modelo import numero
+
+TABELA = 'cenarios'
+TABELA_VALORES = 'cenarios_valores'
+
+
+def criar_tabelas(cursor):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABELA} (
+            cenario_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            nome TEXT NOT NULL,
+            criado_em TEXT NOT NULL,
+            UNIQUE (user_id, nome)
+        )
+    """)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABELA_VALORES} (
+            cenario_id INTEGER NOT NULL,
+            name_element TEXT NOT NULL,
+            value_element REAL,
+            str_element TEXT,
+            PRIMARY KEY (cenario_id, name_element)
+        ) WITHOUT ROWID
+    """)
+
+
+def listar(cursor, user_id):
+    """
+    Returns:
+        list: (cenario_id, nome, criado_em, quantidade de células) do usuário
+    """
+    cursor.execute(f"""
+        SELECT c.cenario_id, c.nome, c.criado_em, COUNT(v.name_element)
+        FROM {TABELA} c
+        LEFT JOIN {TABELA_VALORES} v ON v.cenario_id = c.cenario_id
+        WHERE c.user_id = ?
+        GROUP BY c.cenario_id
+        ORDER BY c.nome
+    """, (user_id,))
+    return cursor.fetchall()
+
+
+def carregar(cursor, cenario_ids):
+    """
+    Deltas dos cenários informados em uma consulta.
+
+    Returns:
+        dict: cenario_id -> {name_element: (value_element, str_element)}
+    """
+    cenario_ids = list(cenario_ids)
+    deltas = {cenario_id: {} for cenario_id in cenario_ids}
+    if not cenario_ids:
+        return deltas
+    cursor.execute(f"""
+        SELECT cenario_id, name_element, value_element, str_element
+        FROM {TABELA_VALORES}
+        WHERE cenario_id IN ({', '.join('?' * len(cenario_ids))})
+    """, cenario_ids)
+    for cenario_id, name, value, str_value in cursor.fetchall():
+        deltas[cenario_id][name] = (value, str_value)
+    return deltas
+
+
+def salvar(cursor, user_id, nome, delta, criado_em):
+    """
+    Grava (ou substitui) um cenário do usuário, sem commit.
+
+    Args:
+        delta: {name_element: (value_element, str_element)}
+
+    Returns:
+        int: cenario_id
+    """
+    cursor.execute(f"""
+        INSERT INTO {TABELA} (user_id, nome, criado_em) VALUES (?, ?, ?)
+        ON CONFLICT (user_id, nome) DO UPDATE SET criado_em = excluded.criado_em
+    """, (user_id, nome, criado_em))
+    cursor.execute(f"SELECT cenario_id FROM {TABELA} WHERE user_id = ? AND nome = ?", (user_id, nome))
+    cenario_id = cursor.fetchone()[0]
+
+    cursor.execute(f"DELETE FROM {TABELA_VALORES} WHERE cenario_id = ?", (cenario_id,))
+    cursor.executemany(f"""
+        INSERT INTO {TABELA_VALORES} (cenario_id, name_element, value_element, str_element)
+        VALUES (?, ?, ?, ?)
+    """, [(cenario_id, name, value, str_value) for name, (value, str_value) in delta.items()])
+    return cenario_id
+
+
+def excluir(cursor, user_id, cenario_id):
+    """Exclui um cenário do usuário, sem commit"""
+    cursor.execute(f"DELETE FROM {TABELA} WHERE cenario_id = ? AND user_id = ?", (cenario_id, user_id))
+    if cursor.rowcount:
+        cursor.execute(f"DELETE FROM {TABELA_VALORES} WHERE cenario_id = ?", (cenario_id,))
+
+
+def entradas_gravadas(cursor, user_id, template):
+    """
+    Delta atual do usuário: células de entrada (input, selectbox e
+    input_data) com linha gravada na valores_usuario.
+
+    Returns:
+        dict: name_element -> (value_element, str_element); str_element só
+            para selectbox e input_data
+    """
+    cursor.execute(f"""
+        SELECT name_element, value_element, str_element
+        FROM {TABELA_USUARIO}
+        WHERE tabela = 'forms_tab' AND user_id = ?
+    """, (user_id,))
+    delta = {}
+    for name, value, str_value in cursor.fetchall():
+        slot = template.indice.get(name)
+        if slot is None or slot in template.dependencias:
+            continue
+        tipo = template.tipos[slot]
+        if tipo == 'input' or tipo in TIPOS_TEXTO:
+            delta[name] = (value, str_value if tipo in TIPOS_TEXTO else None)
+    return delta
+
+
+def ativar(modelo, atual, novo):
+    """
+    Troca as entradas do modelo pelas de um cenário. Só são tocadas as
+    células da diferença simétrica entre o delta atual e o novo; as
+    calculadas são atualizadas pelo recálculo incremental. Não grava (ver
+    ModeloUsuario.salvar).
+
+    Args:
+        atual: delta atual do usuário (entradas_gravadas)
+        novo: delta do cenário (carregar)
+
+    Returns:
+        set: nomes das células alteradas (entradas e calculadas)
+    """
+    padrao_valores, padrao_textos = modelo.padroes
+    alterados = set()
+    for nome in set(atual) | set(novo):
+        if atual.get(nome) == novo.get(nome):
+            continue
+        slot = modelo.slot(nome)
+        if slot is None or slot in modelo.template.dependencias:
+            continue
+        if nome in novo:
+            valor, texto = novo[nome]
+            valor = numero(valor)
+            texto = padrao_textos[slot] if texto is None else texto
+        else:
+            valor, texto = padrao_valores[slot], padrao_textos[slot]
+        if modelo.template.tipos[slot] not in TIPOS_TEXTO:
+            texto = None
+        if modelo.definir(nome, valor, texto=texto):
+            alterados.add(nome)
+    return alterados | modelo.propagar(alterados)
+
+
+def comparar(template_modelo, deltas, saidas):
+    """
+    Calcula vários cenários (deltas sobre o template) em uma única passada
+    vetorizada, uma coluna do lote por cenário.
+
+    Args:
+        template_modelo: ModeloUsuario com os padrões do template (user_id 0)
+        deltas: lista de dicts name_element -> (value_element, str_element)
+        saidas: nomes das células de saída
+
+    Returns:
+        np.ndarray: matriz (cenário, célula de saída)
+    """
+    template = template_modelo.template
+    lote = LoteUsuarios.replicar(template_modelo, len(deltas))
+    for col, cenario in enumerate(deltas):
+        for nome, (valor, texto) in cenario.items():
+            slot = template.indice.get(nome)
+            if slot is None or slot in template.dependencias:
+                continue
+            lote.valores[slot, col] = numero(valor)
+            if slot in lote.textos and texto is not None:
+                lote.textos[slot][col] = texto
+    lote.recalcular()
+    return lote.valores[[template.indice[nome] for nome in saidas], :].T.copy()
@@ -0,0 +1,181 @@
+# Arquivo: banco/conexao.py
+# Data: 17/10/2026
+# Gerenciador de conexões com o banco (calcpc.db)
+# As conexões ficam em um pool por processo, compartilhado entre as sessões
+# do Streamlit: cada página pega uma conexão emprestada e a devolve ao final,
+# em vez de abrir e fechar o arquivo a cada chamada. O banco opera em modo
+# WAL, de modo que leitores não bloqueiam o escritor (e vice-versa).
+
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from config import DB_PATH
+
+# Tempo máximo de espera por um lock de escrita (ms)
+BUSY_TIMEOUT_MS = 5000
+
+# Conexões mantidas abertas em cada pool (as excedentes são fechadas ao devolver)
+TAMANHO_POOL = 8
+
+# Configurações aplicadas a toda conexão nova
+PRAGMAS = {
+    'synchronous': 'NORMAL',     # em WAL, fsync apenas nos checkpoints
+    'busy_timeout': BUSY_TIMEOUT_MS,
+    'cache_size': -16000,        # 16 MB de cache de páginas por conexão
+    'mmap_size': 268435456,      # leitura do arquivo via mmap (até 256 MB)
+    'temp_store': 'MEMORY',
+}
+
+_lock = threading.Lock()
+_pools = {}  # (caminho, somente_leitura) -> PoolConexoes
+
+
+def configurar(conn, somente_leitura=False):
+    """Aplica as pragmas de desempenho a uma conexão"""
+    for pragma, valor in PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma} = {valor}")
+    if somente_leitura:
+        conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+def ativar_wal(db_path=DB_PATH):
+    """
+    Coloca o banco em modo WAL. O modo fica gravado no arquivo, então basta
+    executar uma vez; repetir não tem efeito.
+
+    Returns:
+        str: journal_mode resultante
+    """
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000)
+    try:
+        return conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+    finally:
+        conn.close()
+
+
+class ConexaoPool(sqlite3.Connection):
+    """
+    Conexão pertencente a um pool: close() devolve a conexão ao pool em vez
+    de fechá-la, de modo que o código que já chama conn.close() continua válido.
+    """
+
+    pool = None
+    emprestada = False
+
+    def close(self):
+        if self.pool is None:
+            super().close()
+        elif self.emprestada:
+            self.pool.devolver(self)
+
+
+class PoolConexoes:
+    """
+    Pool de conexões para um banco.
+
+    As conexões são criadas sob demanda (check_same_thread=False, já que uma
+    conexão pode ser usada por threads diferentes em momentos diferentes) e
+    reaproveitadas enquanto houver espaço no pool.
+    """
+
+    def __init__(self, db_path, somente_leitura=False, tamanho=TAMANHO_POOL):
+        self.db_path = str(db_path)
+        self.somente_leitura = somente_leitura
+        self._livres = queue.LifoQueue(maxsize=tamanho)
+
+    def _nova(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            factory=ConexaoPool,
+        )
+        conn.pool = self
+        return configurar(conn, self.somente_leitura)
+
+    def obter(self):
+        try:
+            conn = self._livres.get_nowait()
+        except queue.Empty:
+            conn = self._nova()
+        conn.emprestada = True
+        return conn
+
+    def devolver(self, conn):
+        """
+        Devolve a conexão ao pool. Uma transação deixada aberta (sem commit)
+        é desfeita, para não vazar para o próximo uso da conexão.
+        """
+        conn.emprestada = False
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            self._livres.put_nowait(conn)
+        except (sqlite3.Error, queue.Full):
+            sqlite3.Connection.close(conn)
+
+    def fechar(self):
+        while True:
+            try:
+                sqlite3.Connection.close(self._livres.get_nowait())
+            except queue.Empty:
+                return
+
+
+def _pool(db_path, somente_leitura):
+    chave = (str(db_path), somente_leitura)
+    pool = _pools.get(chave)
+    if pool is None:
+        with _lock:
+            pool = _pools.get(chave)
+            if pool is None:
+                if not somente_leitura:
+                    ativar_wal(db_path)
+                pool = _pools[chave] = PoolConexoes(db_path, somente_leitura)
+    return pool
+
+
+def obter_conexao(db_path=DB_PATH, somente_leitura=False):
+    """
+    Empresta uma conexão do pool; conn.close() a devolve.
+
+    Args:
+        db_path: caminho do banco
+        somente_leitura: conexão com query_only (páginas de resultados, relatórios)
+    """
+    return _pool(db_path, somente_leitura).obter()
+
+
+@contextmanager
+def conexao(db_path=DB_PATH, somente_leitura=False):
+    """
+    Empresta uma conexão do pool durante o bloco 'with'.
+
+    O commit continua sendo responsabilidade de quem usa a conexão; ao final
+    do bloco, alterações não confirmadas são desfeitas.
+    """
+    conn = obter_conexao(db_path, somente_leitura)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def checkpoint(db_path=DB_PATH):
+    """
+    Transfere o conteúdo do WAL para o arquivo principal do banco
+    (necessário antes de copiar ou baixar o calcpc.db)
+    """
+    with conexao(db_path) as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def fechar_conexoes():
+    """Fecha todas as conexões dos pools (ex: antes de substituir o arquivo do banco)"""
+    with _lock:
+        for pool in _pools.values():
+            pool.fechar()
+        _pools.clear()
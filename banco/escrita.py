@@ -0,0 +1,193 @@
+# Arquivo: banco/escrita.py
+# Data: 17/10/2026
+# Coordenador de escrita: um único escritor para o calcpc.db
+# Os módulos submetem funções de gravação, que recebem um cursor e são
+# executadas em ordem por uma thread dedicada, dona da única conexão de
+# escrita do processo. Como só há um escritor, não há disputa pelo lock do
+# banco ("database is locked"); as leituras usam conexões somente leitura
+# do pool e, em modo WAL, não esperam pelo escritor.
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from config import DB_PATH
+from banco.conexao import obter_conexao
+
+logger = logging.getLogger(__name__)
+
+# Tempo máximo (s) que executar() aguarda uma gravação
+TEMPO_MAXIMO = 60.0
+
+
+class _Tarefa:
+    __slots__ = ('fn', 'args', 'futuro', 'enfileirada')
+
+    def __init__(self, fn, args):
+        self.fn = fn
+        self.args = args
+        self.futuro = Future()
+        self.enfileirada = time.perf_counter()
+
+
+class CoordenadorEscrita:
+    """
+    Fila de gravações executadas por uma única thread.
+
+    Cada tarefa é uma função fn(cursor, *args). Ao final da função, uma
+    transação ainda aberta é confirmada (commit); se a função levantar uma
+    exceção, a transação é desfeita e a exceção é repassada a quem submeteu.
+    Se a conexão de escrita não puder ser aberta, o erro é repassado à tarefa
+    e a abertura é tentada de novo na próxima; a thread não termina.
+
+    Métricas: profundidade da fila, tempo de espera na fila e tempo de execução.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self._fila = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._metricas_lock = threading.Lock()
+        self._zerar_metricas()
+
+    def _zerar_metricas(self):
+        self._tarefas = 0
+        self._erros = 0
+        self._espera_total = 0.0
+        self._espera_max = 0.0
+        self._execucao_total = 0.0
+        self._profundidade_max = 0
+
+    def submeter(self, fn, *args):
+        """
+        Enfileira uma gravação.
+
+        Returns:
+            Future: resultado de fn(cursor, *args)
+        """
+        tarefa = _Tarefa(fn, args)
+
+        # Chamada de dentro de uma gravação: executa direto (evita esperar a si mesma)
+        if threading.current_thread() is self._thread:
+            self._executar_tarefa(self._cursor, tarefa)
+            return tarefa.futuro
+
+        self._iniciar()
+        self._fila.put(tarefa)
+        profundidade = self._fila.qsize()
+        with self._metricas_lock:
+            self._profundidade_max = max(self._profundidade_max, profundidade)
+        return tarefa.futuro
+
+    def executar(self, fn, *args, timeout=TEMPO_MAXIMO):
+        """
+        Submete uma gravação e aguarda o resultado (repassa exceções).
+
+        Raises:
+            concurrent.futures.TimeoutError: gravação não concluída em timeout segundos
+        """
+        return self.submeter(fn, *args).result(timeout)
+
+    def metricas(self):
+        """
+        Returns:
+            dict: profundidade atual e máxima da fila, tarefas executadas,
+                erros, espera média/máxima e execução média (ms)
+        """
+        with self._metricas_lock:
+            tarefas = self._tarefas
+            return {
+                'profundidade': self._fila.qsize(),
+                'profundidade_max': self._profundidade_max,
+                'tarefas': tarefas,
+                'erros': self._erros,
+                'espera_media_ms': 1000 * self._espera_total / tarefas if tarefas else 0.0,
+                'espera_max_ms': 1000 * self._espera_max,
+                'execucao_media_ms': 1000 * self._execucao_total / tarefas if tarefas else 0.0,
+            }
+
+    def zerar_metricas(self):
+        with self._metricas_lock:
+            self._zerar_metricas()
+
+    def _iniciar(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                thread = threading.Thread(target=self._executar, name="coordenador-escrita", daemon=True)
+                self._thread = thread
+                thread.start()
+
+    def _executar(self):
+        conn = None
+        while True:
+            tarefa = self._fila.get()
+            if conn is None:
+                try:
+                    conn = obter_conexao(self.db_path)
+                    self._cursor = conn.cursor()
+                except Exception as e:
+                    conn = None
+                    logger.exception("Erro ao abrir a conexão de escrita (%s)", self.db_path)
+                    self._falhar(tarefa, e)
+                    continue
+            self._executar_tarefa(self._cursor, tarefa)
+
+    def _falhar(self, tarefa, erro):
+        if tarefa.futuro.set_running_or_notify_cancel():
+            tarefa.futuro.set_exception(erro)
+        with self._metricas_lock:
+            self._tarefas += 1
+            self._erros += 1
+
+    def _executar_tarefa(self, cursor, tarefa):
+        if not tarefa.futuro.set_running_or_notify_cancel():
+            return
+
+        inicio = time.perf_counter()
+        espera = inicio - tarefa.enfileirada
+        erro = False
+        try:
+            resultado = tarefa.fn(cursor, *tarefa.args)
+            if cursor.connection.in_transaction:
+                cursor.connection.commit()
+        except BaseException as e:
+            erro = True
+            try:
+                if cursor.connection.in_transaction:
+                    cursor.connection.rollback()
+            except Exception:
+                logger.exception("Erro ao desfazer a gravação")
+            tarefa.futuro.set_exception(e)
+        else:
+            tarefa.futuro.set_result(resultado)
+        finally:
+            execucao = time.perf_counter() - inicio
+            with self._metricas_lock:
+                self._tarefas += 1
+                self._erros += erro
+                self._espera_total += espera
+                self._espera_max = max(self._espera_max, espera)
+                self._execucao_total += execucao
+
+
+_coordenador = CoordenadorEscrita()
+
+
+def submeter(fn, *args):
+    """Enfileira fn(cursor, *args) no escritor do processo e retorna um Future"""
+    return _coordenador.submeter(fn, *args)
+
+
+def executar(fn, *args, timeout=TEMPO_MAXIMO):
+    """Executa fn(cursor, *args) no escritor do processo e retorna o resultado"""
+    return _coordenador.executar(fn, *args, timeout=timeout)
+
+
+def metricas():
+    """Métricas da fila de escrita do processo (ver CoordenadorEscrita.metricas)"""
+    return _coordenador.metricas()
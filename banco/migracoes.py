@@ -0,0 +1,156 @@
+# Arquivo: banco/migracoes.py
+# Data: 17/10/2026
+# Migrações versionadas do esquema do banco (calcpc.db)
+# Cada migração tem um número de versão; as versões aplicadas ficam
+# registradas na tabela schema_versao. O runner pode ser executado a cada
+# inicialização: migrações já aplicadas não são repetidas e todos os
+# comandos são idempotentes (IF NOT EXISTS).
+
+import sqlite3
+import threading
+from datetime import datetime
+
+from config import DB_PATH
+from banco import versoes
+from banco.cenarios import criar_tabelas as criar_cenarios
+from banco.valores import compactar, resolver_links_na_leitura, separar_valores
+from motor.modelo import ModeloUsuario
+
+# Tabelas de formulários: todas as consultas filtram por (user_id, name_element)
+TABELAS_FORMS = [
+    'forms_tab',
+    'forms_resultados',
+    'forms_result_sea',
+    'forms_setorial',
+    'forms_setorial_sea',
+    'forms_energetica',
+    'forms_insumos',
+]
+
+_lock = threading.Lock()
+_verificados = set()  # bancos já migrados neste processo
+
+
+def tabela_existe(cursor, tabela):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (tabela,))
+    return cursor.fetchone() is not None
+
+
+def garantir_indices(cursor):
+    """
+    Cria os índices (user_id, name_element) nas tabelas forms_* existentes.
+    Também é chamada pelo create_forms.py, que recria as tabelas na importação.
+    """
+    for tabela in TABELAS_FORMS:
+        if not tabela_existe(cursor, tabela):
+            continue
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{tabela}_user_name
+            ON {tabela} (user_id, name_element)
+        """)
+
+    # forms_insumos é consultada apenas pelo nome (referências Insumos!D15)
+    if tabela_existe(cursor, 'forms_insumos'):
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_forms_insumos_name
+            ON forms_insumos (name_element)
+        """)
+
+
+def recalcular_template(cursor):
+    """
+    Recalcula as células calculadas do próprio template (user_id = 0) e grava
+    os valores nas linhas do template. Assim um usuário que não altera nada
+    não grava nenhuma célula (as fórmulas já batem com os padrões).
+    """
+    if not tabela_existe(cursor, 'forms_tab'):
+        return
+    modelo = ModeloUsuario.carregar(cursor, 0)
+    mudaram = modelo.recalcular()
+    cursor.executemany("""
+        UPDATE forms_tab SET value_element = ?
+        WHERE user_id = 0 AND name_element = ?
+    """, [(modelo.valor(nome), nome) for nome in sorted(mudaram)])
+
+
+def compactar_valores(cursor):
+    recalcular_template(cursor)
+    compactar(cursor)
+
+
+# (versão, descrição, função que recebe o cursor)
+MIGRACOES = [
+    (1, "Índices (user_id, name_element) nas tabelas forms_*", garantir_indices),
+    (2, "Valores por usuário na valores_usuario (forms_* apenas com o template)", separar_valores),
+    (3, "valores_usuario apenas com as células diferentes do template", compactar_valores),
+    (4, "Cenários nomeados por usuário (deltas sobre o template)", criar_cenarios),
+    (5, "Células call_dados resolvidas na leitura pelas visões {tabela}_usuario", resolver_links_na_leitura),
+    (6, "Marcas de versão dos dados (template, insumos, resultados e usuários)", versoes.criar),
+]
+
+
+def versao_atual(cursor):
+    """Retorna a maior versão aplicada (0 se o banco nunca foi migrado)"""
+    cursor.execute("SELECT COALESCE(MAX(versao), 0) FROM schema_versao")
+    return cursor.fetchone()[0]
+
+
+def migracoes_pendentes(cursor):
+    """Versões ainda não aplicadas no banco (apenas leitura)"""
+    atual = versao_atual(cursor) if tabela_existe(cursor, 'schema_versao') else 0
+    return [versao for versao, _, _ in MIGRACOES if versao > atual]
+
+
+def aplicar_migracoes(db_path=DB_PATH):
+    """
+    Aplica as migrações pendentes, cada uma em sua própria transação: a
+    versão só é registrada junto com a migração; se a migração falhar, tudo
+    o que ela fez é desfeito e as seguintes não são aplicadas. As funções de
+    migração não fazem commit (a conexão está em modo autocommit e a
+    transação é aberta aqui com BEGIN IMMEDIATE).
+
+    Returns:
+        list: versões aplicadas nesta execução
+    """
+    chave = str(db_path)
+    if chave in _verificados:
+        return []
+
+    with _lock:
+        if chave in _verificados:
+            return []
+
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_versao (
+                    versao INTEGER PRIMARY KEY,
+                    descricao TEXT NOT NULL,
+                    aplicada_em TEXT NOT NULL
+                )
+            """)
+
+            aplicadas = []
+            for versao, descricao, migracao in MIGRACOES:
+                # BEGIN IMMEDIATE: outro processo não aplica a mesma versão em paralelo
+                cursor.execute("BEGIN IMMEDIATE")
+                try:
+                    if versao <= versao_atual(cursor):
+                        cursor.execute("COMMIT")
+                        continue
+                    migracao(cursor)
+                    cursor.execute(
+                        "INSERT INTO schema_versao (versao, descricao, aplicada_em) VALUES (?, ?, ?)",
+                        (versao, descricao, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+                    )
+                    cursor.execute("COMMIT")
+                    aplicadas.append(versao)
+                except Exception:
+                    cursor.execute("ROLLBACK")
+                    raise
+
+            _verificados.add(chave)
+            return aplicadas
+        finally:
+            conn.close()
@@ -0,0 +1,65 @@
+# Arquivo: banco/series.py
+# Data: 17/10/2026
+# Busca das séries dos gráficos e tabelas de resultados
+# Os elementos 'grafico', 'tabela', 'grafico_ae' e 'tabela_ae' listam as
+# células exibidas em select_element ('C6|C18|C24'). Todas as células de um
+# elemento são lidas com uma única consulta (IN) na visão do usuário e
+# devolvidas como um vetor NumPy na mesma ordem dos rótulos; as telas e os
+# geradores de PDF usam as mesmas funções. Com os valores da tabela já lidos
+# (pré-carga dos resultados, motor/precarga.py) a consulta não é feita.
+
+import numpy as np
+
+from banco.valores import visao
+
+
+def buscar_valores(cursor, tabela, user_id, nomes):
+    """
+    Lê várias células de um usuário com uma consulta.
+
+    Returns:
+        dict: name_element -> value_element (em nomes repetidos prevalece o
+            maior ID_element, como nas consultas "ORDER BY ID_element DESC LIMIT 1")
+    """
+    nomes = list(dict.fromkeys(nomes))
+    if not nomes:
+        return {}
+    cursor.execute(f"""
+        SELECT name_element, value_element
+        FROM {visao(tabela)}
+        WHERE user_id = ?
+        AND name_element IN ({', '.join('?' * len(nomes))})
+        ORDER BY ID_element
+    """, (user_id, *nomes))
+    return dict(cursor.fetchall())
+
+
+def buscar_serie(cursor, tabela, user_id, nomes, valores=None):
+    """
+    Valores das células `nomes` (ex: select_element.split('|')) de um usuário.
+    `valores` ({name_element: value_element} da tabela) dispensa a consulta.
+
+    Returns:
+        np.ndarray: float, alinhado a `nomes`; células ausentes ou nulas valem 0.0
+    """
+    nomes = [str(nome).strip() for nome in nomes]
+    if valores is None:
+        valores = buscar_valores(cursor, tabela, user_id, nomes)
+    return np.array(
+        [float(valores[nome]) if valores.get(nome) is not None else 0.0 for nome in nomes],
+        dtype=float,
+    )
+
+
+def buscar_grupos(cursor, tabela, user_id, grupos, valores=None):
+    """
+    Como buscar_serie, para vários grupos de células (ex: séries de um
+    gráfico agrupado) com uma única consulta.
+
+    Returns:
+        list: um np.ndarray por grupo
+    """
+    grupos = [[str(nome).strip() for nome in grupo] for grupo in grupos]
+    serie = buscar_serie(cursor, tabela, user_id, [nome for grupo in grupos for nome in grupo], valores)
+    limites = np.cumsum([len(grupo) for grupo in grupos])[:-1]
+    return np.split(serie, limites) if grupos else []
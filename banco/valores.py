@@ -0,0 +1,226 @@
+# Arquivo: banco/valores.py
+# Data: 17/10/2026
+# Valores por usuário separados do template
+# As tabelas forms_* guardam apenas o template (user_id = 0): layout, tipos,
+# fórmulas, estilos e valores padrão. Os valores de cada usuário ficam na
+# tabela valores_usuario, uma linha compacta por (tabela, usuário, célula).
+# Para leitura, cada tabela tem a visão {tabela}_usuario, com as mesmas
+# colunas da tabela original (template + valores do usuário): as consultas
+# "FROM {tabela}_usuario WHERE user_id = ?" retornam as mesmas linhas que
+# antes eram copiadas para cada usuário.
+# Cópia sob demanda (copy-on-write): nada é copiado no primeiro acesso; só
+# são gravadas as células cujo valor difere do padrão do template, e uma
+# célula que volta ao padrão tem sua linha removida.
+# Nas tabelas de resultados, as células call_dados são resolvidas na leitura:
+# a visão busca o valor da célula da forms_tab referenciada (str_element),
+# então as páginas de resultados apenas leem, sem copiar valores.
+
+TABELA = 'valores_usuario'
+
+# Tabelas com valores por usuário (forms_insumos é global)
+TABELAS_USUARIO = [
+    'forms_tab',
+    'forms_resultados',
+    'forms_result_sea',
+    'forms_setorial',
+    'forms_setorial_sea',
+    'forms_energetica',
+]
+
+# Tipos cujo str_element é preenchido pelo usuário (nos demais é estilo do template)
+TIPOS_TEXTO = ('selectbox', 'input_data')
+
+_SQL_REMOVER = f"DELETE FROM {TABELA} WHERE tabela = ? AND user_id = ? AND name_element = ?"
+
+_SQL_GRAVAR = f"""
+    INSERT INTO {TABELA} (tabela, user_id, name_element, value_element, str_element)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (tabela, user_id, name_element) DO UPDATE SET
+        value_element = excluded.value_element,
+        str_element = COALESCE(excluded.str_element, {TABELA}.str_element)
+"""
+
+
+def visao(tabela):
+    """Nome da visão de leitura por usuário de uma tabela forms_*"""
+    return f"{tabela}_usuario"
+
+
+def _existe(cursor, nome, tipo='table'):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = ? AND name = ?", (tipo, nome))
+    return cursor.fetchone() is not None
+
+
+def criar_tabela(cursor):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABELA} (
+            tabela TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            name_element TEXT NOT NULL,
+            value_element REAL,
+            str_element TEXT,
+            PRIMARY KEY (tabela, user_id, name_element)
+        ) WITHOUT ROWID
+    """)
+
+
+def _valor_link():
+    """
+    Expressão SQL do valor de uma célula call_dados: value_element do usuário
+    (ou do template) da célula da forms_tab referenciada em str_element; em
+    nomes repetidos prevalece o maior ID_element, sem referência resulta 0.0
+    """
+    return f"""COALESCE((
+                SELECT COALESCE(fv.value_element, ft.value_element)
+                FROM forms_tab ft
+                LEFT JOIN {TABELA} fv
+                    ON fv.tabela = 'forms_tab'
+                    AND fv.user_id = u.user_id
+                    AND fv.name_element = ft.name_element
+                WHERE ft.user_id = 0 AND ft.name_element = t.str_element
+                ORDER BY ft.ID_element DESC
+                LIMIT 1
+            ), 0.0)"""
+
+
+def criar_visao(cursor, tabela):
+    """
+    (Re)cria a visão {tabela}_usuario: linhas do template para cada usuário
+    cadastrado, com value_element/str_element do usuário quando existirem.
+    As colunas seguem a ordem da tabela, então os índices das tuplas
+    (element[10] = user_id, etc.) continuam os mesmos.
+    Nas tabelas de resultados, o value_element das células call_dados vem da
+    forms_tab do usuário no momento da leitura.
+    """
+    cursor.execute(f"PRAGMA table_info({tabela})")
+    colunas = []
+    for _, coluna, *_ in cursor.fetchall():
+        if coluna == 'value_element' and tabela != 'forms_tab':
+            colunas.append(f"""CASE WHEN t.type_element = 'call_dados'
+            THEN {_valor_link()}
+            ELSE COALESCE(v.value_element, t.value_element) END AS value_element""")
+        elif coluna == 'value_element':
+            colunas.append("COALESCE(v.value_element, t.value_element) AS value_element")
+        elif coluna == 'str_element':
+            colunas.append("COALESCE(v.str_element, t.str_element) AS str_element")
+        elif coluna == 'user_id':
+            colunas.append("u.user_id AS user_id")
+        else:
+            colunas.append(f"t.{coluna} AS {coluna}")
+
+    cursor.execute(f"DROP VIEW IF EXISTS {visao(tabela)}")
+    cursor.execute(f"""
+        CREATE VIEW {visao(tabela)} AS
+        SELECT {', '.join(colunas)}
+        FROM {tabela} t
+        CROSS JOIN usuarios u
+        LEFT JOIN {TABELA} v
+            ON v.tabela = '{tabela}'
+            AND v.user_id = u.user_id
+            AND v.name_element = t.name_element
+        WHERE t.user_id = 0
+    """)
+
+
+def separar_valores(cursor):
+    """
+    Move as linhas de usuários (user_id <> 0) das tabelas forms_* para a
+    valores_usuario e recria as visões. Idempotente: usada pela migração 2 e
+    pelo create_forms.py após importar uma tabela.
+
+    Em nomes repetidos prevalece o maior ID_element (mesma regra das consultas
+    antigas); o str_element só é guardado quando difere do template.
+    """
+    criar_tabela(cursor)
+    for tabela in TABELAS_USUARIO:
+        if not _existe(cursor, tabela):
+            continue
+        cursor.execute(f"""
+            INSERT OR REPLACE INTO {TABELA}
+                (tabela, user_id, name_element, value_element, str_element)
+            SELECT ?, u.user_id, u.name_element, u.value_element,
+                   CASE WHEN u.str_element IS (
+                       SELECT t.str_element FROM {tabela} t
+                       WHERE t.user_id = 0 AND t.name_element = u.name_element
+                       ORDER BY t.ID_element DESC LIMIT 1
+                   ) THEN NULL ELSE u.str_element END
+            FROM {tabela} u
+            WHERE u.user_id <> 0 AND u.name_element <> ''
+            ORDER BY u.ID_element
+        """, (tabela,))
+        cursor.execute(f"DELETE FROM {tabela} WHERE user_id <> 0")
+        if _existe(cursor, 'usuarios'):
+            criar_visao(cursor, tabela)
+
+
+def gravar(cursor, tabela, user_id, linhas):
+    """
+    Grava valores do usuário (insere ou atualiza), sem commit.
+
+    Args:
+        linhas: iterável de (name_element, value_element, str_element);
+            str_element None mantém o texto atual
+    """
+    cursor.executemany(_SQL_GRAVAR, [
+        (tabela, user_id, name, value, str_value) for name, value, str_value in linhas
+    ])
+
+
+def gravar_usuarios(cursor, tabela, linhas):
+    """Como gravar(), para vários usuários: linhas de (user_id, name_element, value_element, str_element)"""
+    cursor.executemany(_SQL_GRAVAR, [(tabela, *linha) for linha in linhas])
+
+
+def remover(cursor, tabela, user_id, nomes):
+    """Remove valores do usuário, sem commit: as células voltam a ler o padrão do template"""
+    cursor.executemany(_SQL_REMOVER, [(tabela, user_id, nome) for nome in nomes])
+
+
+def remover_usuarios(cursor, tabela, linhas):
+    """Como remover(), para vários usuários: linhas de (user_id, name_element)"""
+    cursor.executemany(_SQL_REMOVER, [(tabela, *linha) for linha in linhas])
+
+
+def resolver_links_na_leitura(cursor):
+    """
+    Recria as visões com as células call_dados resolvidas na leitura e remove
+    as cópias desses valores gravadas pelas páginas de resultados.
+    Usada pela migração 5.
+    """
+    criar_tabela(cursor)
+    for tabela in TABELAS_USUARIO:
+        if not _existe(cursor, tabela):
+            continue
+        if tabela != 'forms_tab':
+            cursor.execute(f"""
+                DELETE FROM {TABELA}
+                WHERE tabela = ?
+                AND name_element IN (
+                    SELECT name_element FROM {tabela}
+                    WHERE user_id = 0 AND type_element = 'call_dados'
+                )
+            """, (tabela,))
+        if _existe(cursor, 'usuarios'):
+            criar_visao(cursor, tabela)
+
+
+def compactar(cursor):
+    """
+    Remove as linhas iguais ao padrão do template (valor igual e sem texto
+    próprio), deixando na valores_usuario apenas as células alteradas.
+    Usada pela migração 3 sobre os valores copiados por usuário.
+    """
+    criar_tabela(cursor)
+    for tabela in TABELAS_USUARIO:
+        if not _existe(cursor, tabela):
+            continue
+        cursor.execute(f"""
+            DELETE FROM {TABELA}
+            WHERE tabela = ?
+            AND str_element IS NULL
+            AND value_element IS (
+                SELECT t.value_element FROM {tabela} t
+                WHERE t.user_id = 0 AND t.name_element = {TABELA}.name_element
+                ORDER BY t.ID_element DESC LIMIT 1
+            )
+        """, (tabela,))
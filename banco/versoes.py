@@ -0,0 +1,97 @@
+# Arquivo: banco/versoes.py
+# Data: 17/10/2026
+# Marcas de versão dos dados usados pelos caches do processo
+# Gatilhos (triggers) trocam a marca de uma chave a cada alteração nas
+# tabelas correspondentes: 'template' (forms_tab), 'insumos' (forms_insumos),
+# 'resultados' (tabelas de resultados) e 'usuario:<user_id>' (valores_usuario).
+# Conferir se um cache ainda vale custa uma leitura por chave, em vez de reler
+# as tabelas inteiras. As marcas são aleatórias, então não se repetem entre
+# bancos diferentes nem depois de uma tabela ser recriada.
+
+TABELA = 'versoes_dados'
+
+# Tabelas com valores por usuário (valores_usuario): uma chave por usuário
+USUARIO = 'usuario:'
+
+# Tabela -> expressão SQL da chave (linha = NEW ou OLD)
+GATILHOS = {
+    'forms_tab': lambda linha: "'template'",
+    'forms_insumos': lambda linha: "'insumos'",
+    'forms_resultados': lambda linha: "'resultados'",
+    'forms_result_sea': lambda linha: "'resultados'",
+    'forms_setorial': lambda linha: "'resultados'",
+    'forms_setorial_sea': lambda linha: "'resultados'",
+    'forms_energetica': lambda linha: "'resultados'",
+    'valores_usuario': lambda linha: f"'{USUARIO}' || {linha}.user_id",
+}
+
+# Chaves de todo o banco (as de usuário são criadas na primeira alteração)
+CHAVES = ('template', 'insumos', 'resultados')
+
+_MARCA = "lower(hex(randomblob(8)))"
+
+
+def chave_usuario(user_id):
+    return f"{USUARIO}{user_id}"
+
+
+def _existe(cursor, nome, tipo='table'):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = ? AND name = ?", (tipo, nome))
+    return cursor.fetchone() is not None
+
+
+def criar(cursor):
+    """
+    Cria a tabela de marcas e os gatilhos das tabelas existentes e troca
+    todas as marcas. Idempotente: usada pela migração 6 e pelo
+    create_forms.py, que recria as tabelas na importação (e com elas perde
+    os gatilhos).
+    """
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABELA} (
+            chave TEXT PRIMARY KEY,
+            versao TEXT NOT NULL
+        ) WITHOUT ROWID
+    """)
+    # UPSERT no corpo: um "OR REPLACE" seria trocado pela política de conflito
+    # do comando que disparou o gatilho (ex: o UPSERT da valores_usuario)
+    for tabela, chave in GATILHOS.items():
+        if not _existe(cursor, tabela):
+            continue
+        for evento, linha in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS versao_{tabela}_{evento.lower()}
+                AFTER {evento} ON {tabela}
+                BEGIN
+                    INSERT INTO {TABELA} (chave, versao)
+                    VALUES ({chave(linha)}, {_MARCA})
+                    ON CONFLICT (chave) DO UPDATE SET versao = excluded.versao;
+                END
+            """)
+    cursor.executemany(f"INSERT OR IGNORE INTO {TABELA} (chave, versao) VALUES (?, '')",
+                       [(chave,) for chave in CHAVES])
+    cursor.execute(f"UPDATE {TABELA} SET versao = {_MARCA}")
+
+
+def marcas(cursor, chaves):
+    """
+    Marcas atuais das chaves (chave sem alteração registrada: '').
+
+    Returns:
+        tuple: marca de cada chave, na ordem informada, ou None se o banco
+            ainda não tem a tabela de marcas (migração 6 pendente)
+    """
+    if not _existe(cursor, TABELA):
+        return None
+    cursor.execute(f"""
+        SELECT chave, versao FROM {TABELA}
+        WHERE chave IN ({', '.join('?' for _ in chaves)})
+    """, tuple(chaves))
+    atuais = dict(cursor.fetchall())
+    return tuple(atuais.get(chave, '') for chave in chaves)
+
+
+def marca(cursor, chave):
+    """Marca atual de uma chave ('' sem alteração registrada), ou None sem a migração 6"""
+    resultado = marcas(cursor, (chave,))
+    return None if resultado is None else resultado[0]
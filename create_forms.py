@@ -17,6 +17,9 @@ from contextlib import contextmanager
 
 from pathlib import Path
 from config import DB_PATH, DATA_DIR  # Adicione esta importação
+from banco.migracoes import garantir_indices
+from banco.valores import separar_valores
+from banco import versoes
 
 @contextmanager
 def get_db_connection():
@@ -514,6 +517,12 @@ def create_database():
                         print(f"Erro ao inserir linha na tabela {table_name}: {str(e)}")
                         continue
 
+                # A tabela foi recriada: recria os índices (user_id, name_element)
+                garantir_indices(cursor)
+                # Linhas de usuários importadas vão para a valores_usuario; recria as visões
+                separar_valores(cursor)
+                # Recria os gatilhos da tabela e troca as marcas: os caches dos processos são refeitos
+                versoes.criar(cursor)
                 conn.commit()
                 messagebox.showinfo("Sucesso", 
                     f"Dados importados com sucesso para a tabela '{table_name}'\n"
@@ -628,6 +637,10 @@ def create_database_insumos():
                     print(f"Erro ao inserir linha na tabela {table_name}: {str(e)}")
                     continue
 
+            # A tabela foi recriada: recria os índices (user_id, name_element)
+            garantir_indices(cursor)
+            # Linhas de usuários importadas vão para a valores_usuario; recria as visões
+            separar_valores(cursor)
             conn.commit()
             messagebox.showinfo("Sucesso", 
                 f"Dados importados com sucesso para a tabela '{table_name}'\n"
@@ -760,6 +773,10 @@ def create_database_forms():
                     print(f"Erro ao inserir linha na tabela {table_name}: {str(e)}")
                     continue
 
+            # A tabela foi recriada: recria os índices (user_id, name_element)
+            garantir_indices(cursor)
+            # Linhas de usuários importadas vão para a valores_usuario; recria as visões
+            separar_valores(cursor)
             conn.commit()
             messagebox.showinfo("Sucesso", 
                 f"Dados importados com sucesso para a tabela '{table_name}'\n"
@@ -943,6 +960,10 @@ def create_database_result_sea():
                     print(f"Erro ao inserir linha na tabela {table_name}: {str(e)}")
                     continue
 
+            # A tabela foi recriada: recria os índices (user_id, name_element)
+            garantir_indices(cursor)
+            # Linhas de usuários importadas vão para a valores_usuario; recria as visões
+            separar_valores(cursor)
             conn.commit()
             messagebox.showinfo("Sucesso", 
                 f"Dados importados com sucesso para a tabela '{table_name}'\n"
@@ -1054,6 +1075,10 @@ def create_database_setorial():
                     print(f"Erro ao inserir linha na tabela {table_name}: {str(e)}")
                     continue
 
+            # A tabela foi recriada: recria os índices (user_id, name_element)
+            garantir_indices(cursor)
+            # Linhas de usuários importadas vão para a valores_usuario; recria as visões
+            separar_valores(cursor)
             conn.commit()
             messagebox.showinfo("Sucesso", 
                 f"Dados importados com sucesso para a tabela '{table_name}'\n"
@@ -1163,6 +1188,10 @@ def create_database_setorial_sea():
                     print(f"Erro ao inserir linha na tabela {table_name}: {str(e)}")
                     continue
 
+            # A tabela foi recriada: recria os índices (user_id, name_element)
+            garantir_indices(cursor)
+            # Linhas de usuários importadas vão para a valores_usuario; recria as visões
+            separar_valores(cursor)
             conn.commit()
             messagebox.showinfo("Sucesso", 
                 f"Dados importados com sucesso para a tabela '{table_name}'\n"
@@ -1274,6 +1303,10 @@ def create_database_energetica():
                     print(f"Erro ao inserir linha na tabela {table_name}: {str(e)}")
                     continue
 
+            # A tabela foi recriada: recria os índices (user_id, name_element)
+            garantir_indices(cursor)
+            # Linhas de usuários importadas vão para a valores_usuario; recria as visões
+            separar_valores(cursor)
             conn.commit()
             messagebox.showinfo("Sucesso", 
                 f"Dados importados com sucesso para a tabela '{table_name}'\n"
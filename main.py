@@ -16,6 +16,12 @@ import os
 from paginas.monitor import registrar_acesso  # Adicione esta importação no topo do arquivo
 import streamlit.components.v1 as components
 from ui.theme import COLORS, FONTS, global_css, sidebar_css, login_css, terms_css
+from banco.migracoes import aplicar_migracoes
+from motor.grafo import CicloDependenciaError
+from banco.conexao import conexao
+from banco import escrita
+from banco import valores as valores_usuario
+from motor.modelo import ModeloUsuario
 
 # Adicione esta linha logo no início do arquivo, após os imports
 # os.environ['RENDER'] = 'true'
@@ -42,6 +48,18 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Migrações do banco (índices e versão do esquema) - aplicadas uma vez por processo
+# Uma migração com erro é desfeita por inteiro; sem ela as páginas não funcionam
+try:
+    aplicar_migracoes()
+except sqlite3.Error as e:
+    st.error(f"Erro ao atualizar a estrutura do banco de dados: {str(e)}")
+    st.stop()
+except CicloDependenciaError as e:
+    # A migração 3 recalcula os usuários pelo template
+    st.error(f"Erro no template de cálculo ao atualizar o banco de dados: {str(e)}")
+    st.stop()
+
 # Adicionar verificação e carregamento do logo
 import os
 
@@ -89,9 +107,6 @@ def authenticate_user():
     if not DB_PATH.exists():
         st.error(f"Banco de dados não encontrado em {DB_PATH}")
         return False, None
-        
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
 
     if "user_profile" not in st.session_state:
         st.session_state["user_profile"] = None
@@ -141,10 +156,12 @@ def authenticate_user():
             login_button = st.button("Entrar", disabled=not aceite_termos)
         
         if login_button and aceite_termos:
-            cursor.execute("""
-                SELECT id, user_id, perfil, nome FROM usuarios WHERE LOWER(email) = LOWER(?) AND senha = ?
-            """, (email, password))
-            user = cursor.fetchone()
+            with conexao(somente_leitura=True) as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT id, user_id, perfil, nome FROM usuarios WHERE LOWER(email) = LOWER(?) AND senha = ?
+                """, (email, password))
+                user = cursor.fetchone()
 
             if user:
                 st.session_state["logged_in"] = True
@@ -181,17 +198,16 @@ def show_welcome():
     """Exibe a tela de boas-vindas"""
     
     # Buscar dados do usuário
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT email, empresa 
-        FROM usuarios 
-        WHERE user_id = ?
-    """, (st.session_state.get('user_id'),))
-    user_info = cursor.fetchone()
+    with conexao(somente_leitura=True) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT email, empresa 
+            FROM usuarios 
+            WHERE user_id = ?
+        """, (st.session_state.get('user_id'),))
+        user_info = cursor.fetchone()
     
     # Removemos a consulta de contagem de formulários
-    conn.close()
     
     empresa = user_info[1] if user_info[1] is not None else "Não informada"
     
@@ -238,22 +254,39 @@ def zerar_value_element():
     if st.sidebar.button("Zerar Valores"):
         if confirma:
             try:
-                conn = sqlite3.connect(DB_PATH)
-                cursor = conn.cursor()
+                def zerar(cursor, user_id):
+                    # Células sem linha gravada leem o padrão do template (que pode
+                    # não ser zero): grava 0.0 para todas as input e formula
+                    cursor.execute(f"""
+                        INSERT INTO {valores_usuario.TABELA} (tabela, user_id, name_element, value_element)
+                        SELECT 'forms_tab', ?, name_element, 0.0
+                        FROM forms_tab
+                        WHERE user_id = 0 AND type_element IN ('input', 'formula')
+                        ON CONFLICT (tabela, user_id, name_element) DO UPDATE SET value_element = 0.0
+                    """, (user_id,))
+                    registros = cursor.rowcount
+                    
+                    # Linhas iguais ao padrão do template não são guardadas (copy-on-write)
+                    cursor.execute(f"""
+                        DELETE FROM {valores_usuario.TABELA}
+                        WHERE tabela = 'forms_tab' AND user_id = ?
+                        AND str_element IS NULL
+                        AND value_element = COALESCE((
+                            SELECT t.value_element FROM forms_tab t
+                            WHERE t.user_id = 0 AND t.name_element = {valores_usuario.TABELA}.name_element
+                            ORDER BY t.ID_element DESC LIMIT 1
+                        ), 0.0)
+                    """, (user_id,))
+                    
+                    # Recalcula as fórmulas a partir das entradas zeradas (salvar faz o commit)
+                    modelo = ModeloUsuario.carregar(cursor, user_id)
+                    modelo.recalcular()
+                    modelo.salvar(cursor)
+                    cursor.connection.commit()
+                    return registros
                 
-                # Atualiza value_element para 0.0 para os tipos especificados
-                cursor.execute("""
-                    UPDATE forms_tab 
-                    SET value_element = 0.0 
-                    WHERE user_id = ? 
-                    AND value_element IS NOT NULL
-                    AND type_element IN ('input', 'formula')
-                """, (st.session_state["user_id"],))
-                
-                registros_afetados = cursor.rowcount
-                
-                conn.commit()
-                conn.close()
+                # Gravação pelo escritor único (banco/escrita.py)
+                registros_afetados = escrita.executar(zerar, st.session_state["user_id"])
                 
                 # Registra a ação no monitor
                 registrar_acesso(
@@ -270,8 +303,6 @@ def zerar_value_element():
                 
             except Exception as e:
                 st.sidebar.error(f"Erro ao zerar valores: {str(e)}")
-                if 'conn' in locals():
-                    conn.close()
         else:
             st.sidebar.warning("Confirme a operação para prosseguir")
 
@@ -311,31 +342,28 @@ def trocar_senha():
                 return
             
             try:
-                conn = sqlite3.connect(DB_PATH)
-                cursor = conn.cursor()
-                
-                # Verificar se a senha atual está correta
-                cursor.execute("""
-                    SELECT id, user_id, nome FROM usuarios 
-                    WHERE user_id = ? AND senha = ?
-                """, (st.session_state.get('user_id'), senha_atual))
-                
-                user = cursor.fetchone()
-                
-                if not user:
-                    st.error("Senha atual incorreta!")
-                    conn.close()
-                    return
+                with conexao(somente_leitura=True) as conn:
+                    cursor = conn.cursor()
+                    
+                    # Verificar se a senha atual está correta
+                    cursor.execute("""
+                        SELECT id, user_id, nome FROM usuarios 
+                        WHERE user_id = ? AND senha = ?
+                    """, (st.session_state.get('user_id'), senha_atual))
+                    
+                    user = cursor.fetchone()
+                    
+                    if not user:
+                        st.error("Senha atual incorreta!")
+                        return
                 
-                # Atualizar a senha
-                cursor.execute("""
+                # Atualizar a senha (escritor único)
+                user_id = st.session_state.get('user_id')
+                escrita.executar(lambda escritor: escritor.execute("""
                     UPDATE usuarios 
                     SET senha = ? 
                     WHERE user_id = ?
-                """, (nova_senha, st.session_state.get('user_id')))
-                
-                conn.commit()
-                conn.close()
+                """, (nova_senha, user_id)))
                 
                 # Registrar a ação no monitor
                 registrar_acesso(
@@ -353,8 +381,6 @@ def trocar_senha():
                 
             except Exception as e:
                 st.error(f"Erro ao trocar senha: {str(e)}")
-                if 'conn' in locals():
-                    conn.close()
 
 def main():
     """Gerencia a navegação entre as páginas do sistema."""
@@ -550,10 +576,11 @@ def show_page(selected_simulation=None):
 def save_current_form_data():
     """Salva os dados do formulário atual quando houver mudança de página"""
     if "form_data" in st.session_state:
-        with st.spinner('Salvando dados...'):
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
+        previous_page = st.session_state.get("previous_page", "")
+        user_id = st.session_state["user_id"]
+        form_data = st.session_state.get("form_data", {})
+        
+        def gravar(cursor):
             # Queries SQL sem comentários para evitar erros de parsing
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS form_cafe (
@@ -588,11 +615,9 @@ def save_current_form_data():
                 )
             """)
             
-            previous_page = st.session_state.get("previous_page", "")
-            
             if "Tipo do Café" in previous_page:
-                tipo_cafe = st.session_state.get("form_data", {}).get("tipo_cafe")
-                quantidade = st.session_state.get("form_data", {}).get("quantidade")
+                tipo_cafe = form_data.get("tipo_cafe")
+                quantidade = form_data.get("quantidade")
                 
                 if tipo_cafe and quantidade is not None:  # Verifica se os dados existem
                     cursor.execute("""
@@ -600,7 +625,7 @@ def save_current_form_data():
                         (user_id, data_input, tipo_cafe, quantidade)
                         VALUES (?, datetime('now'), ?, ?)
                     """, (
-                        st.session_state["user_id"],
+                        user_id,
                         tipo_cafe,
                         quantidade
                     ))
@@ -611,9 +636,9 @@ def save_current_form_data():
                     (user_id, data_input, tipo_moagem, temperatura)
                     VALUES (?, datetime('now'), ?, ?)
                 """, (
-                    st.session_state["user_id"],
-                    st.session_state.get("form_data", {}).get("tipo_moagem"),
-                    st.session_state.get("form_data", {}).get("temperatura")
+                    user_id,
+                    form_data.get("tipo_moagem"),
+                    form_data.get("temperatura")
                 ))
             
             elif "Embalagem" in previous_page:
@@ -622,13 +647,14 @@ def save_current_form_data():
                     (user_id, data_input, tipo_embalagem, peso)
                     VALUES (?, datetime('now'), ?, ?)
                 """, (
-                    st.session_state["user_id"],
-                    st.session_state.get("form_data", {}).get("tipo_embalagem"),
-                    st.session_state.get("form_data", {}).get("peso")
+                    user_id,
+                    form_data.get("tipo_embalagem"),
+                    form_data.get("peso")
                 ))
-            
-            conn.commit()
-            conn.close()
+        
+        with st.spinner('Salvando dados...'):
+            # Gravação pelo escritor único (banco/escrita.py)
+            escrita.executar(gravar)
             # Limpar os dados do formulário após salvar
             st.session_state["form_data"] = {}
             time.sleep(0.5)  # Pequeno delay para feedback visual
@@ -642,11 +668,11 @@ def login():
     
     if st.form_submit_button("Login"):
         try:
-            # Use a conexão do DB_PATH em vez de criar_conexao
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM usuarios WHERE email = ? AND senha = ?", (email, senha))
-            usuario = cursor.fetchone()
+            # Conexão emprestada do pool (banco/conexao.py)
+            with conexao(somente_leitura=True) as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT * FROM usuarios WHERE email = ? AND senha = ?", (email, senha))
+                usuario = cursor.fetchone()
             
             if usuario:
                 st.session_state.autenticado = True
@@ -666,13 +692,9 @@ def login():
                 st.rerun()
             else:
                 st.error("Email ou senha incorretos")
-                
-            conn.close()
             
         except Exception as e:
             st.error(f"Erro ao realizar login: {str(e)}")
-            if 'conn' in locals():
-                conn.close()
 
 if __name__ == "__main__":
     main()
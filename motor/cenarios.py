@@ -0,0 +1,262 @@
+# Arquivo: motor/cenarios.py
+# Data: 17/10/2026
+# Cálculo de cenários em lote, fora do Streamlit
+# Lê uma tabela de cenários (CSV ou Parquet: uma linha por cenário e uma
+# coluna por célula de entrada da forms_tab), calcula os cenários em um pool
+# de processos e grava a tabela de indicadores (energia, água, GEE e
+# resíduos). Cada processo carrega o template uma vez e calcula blocos de
+# cenários de forma vetorizada (motor/lote.py).
+#
+# Uso:
+#   python -m motor.cenarios cenarios.csv resultados.parquet
+#       [--usuario 8] [--processos 4] [--bloco 500] [--banco data/calcpc.db]
+#       [--celulas H54 K54] [--separador ";"] [--decimal ","] [--rotulos]
+#       [--migrar]
+#
+# Colunas de entrada: input (número), selectbox (texto da opção) e
+# input_data (dd/mm/aaaa). Células ausentes ou vazias mantêm o valor do
+# usuário base (--usuario; 0 = padrões do template). A coluna opcional
+# 'cenario' identifica as linhas na saída.
+#
+# O banco é aberto somente para leitura: um banco com migrações pendentes é
+# recusado, a menos que --migrar seja informado (altera o arquivo).
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from config import DB_PATH
+from banco.migracoes import aplicar_migracoes, migracoes_pendentes
+from motor.lote import LoteUsuarios
+from motor.modelo import ModeloUsuario, data_para_dias, numero
+from motor.template import carregar_template
+
+# Tabelas de resultados cujas células call_dados definem os indicadores
+TABELAS_INDICADORES = ['forms_resultados', 'forms_result_sea', 'forms_energetica']
+
+# Coluna opcional com o identificador do cenário
+COLUNA_CENARIO = 'cenario'
+
+# Cenários calculados de uma vez por processo
+BLOCO = 500
+
+_estado = {}  # modelo base e células de saída de cada processo
+
+
+def conectar(db_path=DB_PATH):
+    """Conexão somente leitura (vários processos leem o banco ao mesmo tempo)"""
+    return sqlite3.connect(f"file:{Path(db_path).as_posix()}?mode=ro", uri=True)
+
+
+def indicadores(cursor):
+    """
+    Células da forms_tab exibidas nas páginas de resultados (call_dados).
+
+    Returns:
+        dict: name_element -> rótulo (msg_element), na ordem das páginas
+    """
+    celulas = {}
+    for tabela in TABELAS_INDICADORES:
+        cursor.execute(f"""
+            SELECT str_element, msg_element
+            FROM {tabela}
+            WHERE user_id = 0 AND type_element = 'call_dados'
+            ORDER BY ID_element
+        """)
+        for ref, rotulo in cursor.fetchall():
+            if ref and ref.strip():
+                celulas.setdefault(ref.strip(), (rotulo or '').split('|')[0].strip())
+    return celulas
+
+
+def validar(template, entradas, saidas):
+    """
+    Verifica as colunas de entrada e as células de saída.
+
+    Raises:
+        ValueError: célula inexistente no template ou entrada calculada
+    """
+    erros = []
+    for nome in entradas:
+        slot = template.indice.get(nome)
+        if slot is None or template.tipos[slot] is None:
+            erros.append(f"entrada '{nome}' não existe no template")
+        elif slot in template.dependencias:
+            erros.append(f"entrada '{nome}' é calculada ({template.tipos[slot]})")
+    for nome in saidas:
+        if nome not in template.indice:
+            erros.append(f"saída '{nome}' não existe no template")
+    if erros:
+        raise ValueError("; ".join(erros))
+
+
+def aplicar_entrada(lote, col, nome, valor):
+    """Aplica o valor de uma célula de entrada na coluna `col` do lote"""
+    template = lote.template
+    slot = template.indice[nome]
+    tipo = template.tipos[slot]
+
+    if tipo == 'selectbox':
+        lote.valores[slot, col] = 0.0
+        if slot in lote.textos:
+            lote.textos[slot][col] = str(valor).strip()
+    elif tipo == 'input_data':
+        lote.valores[slot, col] = data_para_dias(str(valor).strip())
+    else:
+        lote.valores[slot, col] = numero(valor)
+
+
+def _iniciar_processo(db_path, user_id, saidas):
+    """Carrega o template e o modelo base uma vez por processo"""
+    conn = conectar(db_path)
+    try:
+        cursor = conn.cursor()
+        template = carregar_template(cursor)
+        _estado['base'] = ModeloUsuario.carregar(cursor, user_id, template)
+        _estado['saidas'] = [template.indice[nome] for nome in saidas]
+    finally:
+        conn.close()
+
+
+def calcular_bloco(cenarios):
+    """
+    Calcula um bloco de cenários (lista de dicts célula -> valor).
+
+    Returns:
+        np.ndarray: matriz (cenário, célula de saída)
+    """
+    lote = LoteUsuarios.replicar(_estado['base'], len(cenarios))
+    for col, cenario in enumerate(cenarios):
+        for nome, valor in cenario.items():
+            aplicar_entrada(lote, col, nome, valor)
+    lote.recalcular()
+    return lote.valores[_estado['saidas'], :].T.copy()
+
+
+def calcular_cenarios(cenarios, saidas, db_path=DB_PATH, user_id=0, processos=None, bloco=BLOCO):
+    """
+    Calcula os cenários em um pool de processos.
+
+    Args:
+        cenarios: lista de dicts célula -> valor
+        saidas: células de saída
+        processos: número de processos (1 = no próprio processo)
+
+    Returns:
+        np.ndarray: matriz (cenário, célula de saída)
+    """
+    blocos = [cenarios[i:i + bloco] for i in range(0, len(cenarios), bloco)]
+    if not blocos:
+        return np.zeros((0, len(saidas)))
+
+    processos = min(processos or os.cpu_count() or 1, len(blocos))
+    if processos == 1:
+        _iniciar_processo(db_path, user_id, saidas)
+        return np.vstack([calcular_bloco(b) for b in blocos])
+
+    with ProcessPoolExecutor(
+        max_workers=processos,
+        initializer=_iniciar_processo,
+        initargs=(str(db_path), user_id, saidas),
+    ) as executor:
+        return np.vstack(list(executor.map(calcular_bloco, blocos)))
+
+
+def ler_tabela(caminho, separador=',', decimal='.'):
+    caminho = Path(caminho)
+    if caminho.suffix.lower() == '.parquet':
+        return pd.read_parquet(caminho)
+    return pd.read_csv(caminho, sep=separador, decimal=decimal, dtype=object)
+
+
+def gravar_tabela(df, caminho, separador=',', decimal='.'):
+    caminho = Path(caminho)
+    if caminho.suffix.lower() == '.parquet':
+        df.to_parquet(caminho)
+    else:
+        df.to_csv(caminho, sep=separador, decimal=decimal)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m motor.cenarios",
+        description="Calcula cenários do modelo em lote (sem Streamlit)",
+    )
+    parser.add_argument("entrada", help="CSV ou Parquet com um cenário por linha")
+    parser.add_argument("saida", help="CSV ou Parquet com os indicadores por cenário")
+    parser.add_argument("--banco", default=str(DB_PATH), help="caminho do calcpc.db")
+    parser.add_argument("--usuario", type=int, default=0,
+                        help="valores base dos cenários (0 = padrões do template)")
+    parser.add_argument("--processos", type=int, default=None, help="padrão: número de CPUs")
+    parser.add_argument("--bloco", type=int, default=BLOCO, help="cenários por tarefa")
+    parser.add_argument("--celulas", nargs="+", default=None,
+                        help="células de saída (padrão: indicadores das páginas de resultados)")
+    parser.add_argument("--separador", default=",", help="separador do CSV")
+    parser.add_argument("--decimal", default=".", help="separador decimal do CSV")
+    parser.add_argument("--rotulos", action="store_true",
+                        help="nomeia as colunas de saída com os rótulos dos indicadores")
+    parser.add_argument("--migrar", action="store_true",
+                        help="aplica as migrações pendentes no banco antes do cálculo (altera o arquivo)")
+    args = parser.parse_args(argv)
+
+    df = ler_tabela(args.entrada, args.separador, args.decimal)
+    if COLUNA_CENARIO in df.columns:
+        df = df.set_index(COLUNA_CENARIO)
+    df.columns = [str(coluna).strip() for coluna in df.columns]
+
+    # A valores_usuario e as visões vêm das migrações: só com --migrar o banco é alterado
+    if args.migrar:
+        aplicar_migracoes(args.banco)
+
+    conn = conectar(args.banco)
+    try:
+        cursor = conn.cursor()
+        pendentes = migracoes_pendentes(cursor)
+        if pendentes:
+            print(f"Erro: o banco {args.banco} tem migrações pendentes "
+                  f"({', '.join(map(str, pendentes))}); abra-o pelo aplicativo ou "
+                  f"execute novamente com --migrar", file=sys.stderr)
+            return 2
+        template = carregar_template(cursor)
+        rotulos = indicadores(cursor)
+    finally:
+        conn.close()
+
+    saidas = args.celulas or list(rotulos)
+    try:
+        validar(template, df.columns, saidas)
+    except ValueError as e:
+        print(f"Erro: {str(e)}", file=sys.stderr)
+        return 2
+
+    # Células vazias mantêm o valor base
+    cenarios = [
+        {nome: valor for nome, valor in linha.items() if pd.notna(valor) and str(valor).strip() != ''}
+        for linha in df.to_dict('records')
+    ]
+
+    inicio = time.perf_counter()
+    resultado = calcular_cenarios(
+        cenarios, saidas, args.banco, args.usuario, args.processos, args.bloco
+    )
+    duracao = time.perf_counter() - inicio
+
+    colunas = [f"{rotulos[nome]} [{nome}]" if args.rotulos and rotulos.get(nome) else nome
+               for nome in saidas]
+    gravar_tabela(pd.DataFrame(resultado, index=df.index, columns=colunas),
+                  args.saida, args.separador, args.decimal)
+
+    print(f"{len(cenarios)} cenários calculados em {duracao:.2f} s "
+          f"({len(cenarios) / duracao if duracao else 0:.0f} cenários/s) -> {args.saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+# Arquivo: motor/formulas.py
+# Data: 17/10/2026
+# Compilação das fórmulas do template (forms_tab, user_id = 0)
+# Cada fórmula é convertida uma única vez em uma função Python com as
+# referências de células já resolvidas para índices (slots)
+
+import ast
+import re
+
+# Referências a células: B15, HH1461, Insumos!D15
+REF_PATTERN = re.compile(r'(?:Insumos!)?[A-Z]+[0-9]+')
+
+# Tokens aceitos em math_element: referências, números (vírgula ou ponto
+# como separador decimal), operadores aritméticos e parênteses
+_TOKEN = re.compile(r"""
+    \s*(?:
+        (?P<ref>(?:Insumos!)?[A-Z]+[0-9]+)
+      | (?P<num>\d+(?:[.,]\d*)?(?:[eE][-+]?\d+)?|[.,]\d+)
+      | (?P<op>[-+*/()])
+    )""", re.VERBOSE)
+
+# Diferença entre duas datas (ex: 'B3 - A3' com células input_data): meses
+_DIFERENCA_DATAS = re.compile(r'^\s*([A-Z]+[0-9]+)\s*-\s*([A-Z]+[0-9]+)\s*$')
+
+# Dias por mês usados na conversão da diferença de datas
+DIAS_POR_MES = 30.44
+
+# Nós de AST permitidos na expressão compilada
+_NOS_PERMITIDOS = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Subscript,
+    ast.Name, ast.Load, ast.Add, ast.Sub, ast.Mult, ast.Div,
+    ast.UAdd, ast.USub,
+)
+
+
+def safe_div(x, y):
+    """Divisão segura: divisores muito próximos de zero retornam 0.0"""
+    if abs(float(y)) < 1e-10:
+        return 0.0
+    return x / y
+
+
+def nao_negativo(x):
+    """max(0, x) para float, número dual ou vetor NumPy"""
+    try:
+        return x if float(x) > 0 else x - x
+    except TypeError:
+        return x - x * (x <= 0)  # vetor: não é conversível para float
+
+
+class FormulaCompilada:
+    """
+    Fórmula já analisada e compilada.
+
+    Atributos:
+        texto: math_element original
+        refs: nomes das células referenciadas (sem repetição, na ordem em que aparecem)
+        slots: índices correspondentes a cada referência
+        fn: função fn(v, _div) que calcula o resultado; v é indexável por slot
+    """
+
+    __slots__ = ('texto', 'refs', 'slots', 'fn')
+
+    def __init__(self, texto, refs, slots, fn):
+        self.texto = texto
+        self.refs = refs
+        self.slots = slots
+        self.fn = fn
+
+    def avaliar(self, valores, div=safe_div):
+        """
+        Avalia a fórmula.
+
+        Args:
+            valores: sequência (ou dicionário) indexada por slot
+            div: função de divisão; permite trocar o backend numérico
+        """
+        return self.fn(valores, div)
+
+
+class _DivisaoSegura(ast.NodeTransformer):
+    """Troca todo 'a / b' por '_div(a, b)'"""
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Div):
+            return ast.copy_location(
+                ast.Call(
+                    func=ast.Name(id='_div', ctx=ast.Load()),
+                    args=[node.left, node.right],
+                    keywords=[],
+                ),
+                node,
+            )
+        return node
+
+
+def extrair_referencias(texto):
+    """Retorna as referências de células presentes em uma fórmula"""
+    return REF_PATTERN.findall(str(texto or ''))
+
+
+def compilar_formula(texto, resolver_slot, tipo=None):
+    """
+    Compila o math_element de uma fórmula.
+
+    A diferença entre duas células input_data ('B3 - A3') resulta em meses:
+    dias / DIAS_POR_MES, nunca negativa (o valor das células input_data é o
+    número de dias da data).
+
+    Args:
+        texto: expressão da fórmula (ex: '(B15/B11/1000*F15*D151)*1000')
+        resolver_slot: função nome -> índice do slot
+        tipo: função opcional nome -> type_element (identifica as datas)
+
+    Returns:
+        FormulaCompilada
+
+    Raises:
+        ValueError: se a expressão contiver tokens ou construções não suportadas
+    """
+    texto = str(texto or '').strip()
+    refs = []
+    slots = []
+    partes = []
+
+    pos = 0
+    while pos < len(texto):
+        match = _TOKEN.match(texto, pos)
+        if not match or match.end() == pos:
+            if texto[pos:].strip() == '':
+                break
+            raise ValueError(f"Token inválido na fórmula '{texto}' (posição {pos})")
+        pos = match.end()
+
+        if match.group('ref'):
+            ref = match.group('ref')
+            slot = resolver_slot(ref)
+            if ref not in refs:
+                refs.append(ref)
+                slots.append(slot)
+            partes.append(f"v[{slot}]")
+        elif match.group('num'):
+            partes.append(repr(float(match.group('num').replace(',', '.'))))
+        else:
+            partes.append(match.group('op'))
+
+    fonte = ' '.join(partes) or '0.0'
+
+    try:
+        arvore = ast.parse(fonte, mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"Sintaxe inválida na fórmula '{texto}': {e.msg}")
+
+    for no in ast.walk(arvore):
+        if not isinstance(no, _NOS_PERMITIDOS):
+            raise ValueError(f"Construção não suportada na fórmula '{texto}'")
+
+    datas = _DIFERENCA_DATAS.match(texto)
+    if datas and tipo and all(tipo(ref) == 'input_data' for ref in datas.groups()):
+        arvore.body = ast.Call(
+            func=ast.Name(id='_nao_negativo', ctx=ast.Load()),
+            args=[ast.BinOp(left=arvore.body, op=ast.Div(), right=ast.Constant(DIAS_POR_MES))],
+            keywords=[],
+        )
+
+    arvore = _DivisaoSegura().visit(arvore)
+    funcao = ast.Expression(
+        body=ast.Lambda(
+            args=ast.arguments(
+                posonlyargs=[],
+                args=[ast.arg(arg='v'), ast.arg(arg='_div')],
+                kwonlyargs=[],
+                kw_defaults=[],
+                defaults=[],
+            ),
+            body=arvore.body,
+        )
+    )
+    ast.fix_missing_locations(funcao)
+    fn = eval(compile(funcao, f"<formula {texto}>", 'eval'),
+              {'__builtins__': None, '_nao_negativo': nao_negativo})
+
+    return FormulaCompilada(texto, tuple(refs), tuple(slots), fn)
@@ -0,0 +1,71 @@
+# Arquivo: motor/grafo.py
+# Data: 17/10/2026
+# Grafo de dependências entre células do template
+# Define a ordem de cálculo (ordem topológica) e detecta referências circulares
+
+from collections import deque
+
+
+class CicloDependenciaError(ValueError):
+    """Referência circular entre células calculadas do template"""
+
+    def __init__(self, ciclo):
+        self.ciclo = list(ciclo)
+        super().__init__("Referência circular entre células: " + " -> ".join(self.ciclo))
+
+
+def ordem_topologica(dependencias, nomes=None):
+    """
+    Ordena as células calculadas de forma que cada célula venha depois de
+    todas as células calculadas de que depende.
+
+    Args:
+        dependencias: dict célula -> sequência de células referenciadas.
+            Apenas as chaves são consideradas células calculadas; referências
+            a outras células (inputs, selectbox, insumos) são tratadas como valores fixos.
+        nomes: função opcional célula -> nome, usada na mensagem de erro
+
+    Returns:
+        list: células na ordem de cálculo (empates mantêm a ordem das chaves)
+
+    Raises:
+        CicloDependenciaError: se houver dependência circular
+    """
+    pendentes = {no: 0 for no in dependencias}
+    dependentes = {no: [] for no in dependencias}
+    for no, refs in dependencias.items():
+        for ref in set(refs):
+            if ref in pendentes:
+                pendentes[no] += 1
+                dependentes[ref].append(no)
+
+    fila = deque(no for no, qtd in pendentes.items() if qtd == 0)
+    ordem = []
+    while fila:
+        no = fila.popleft()
+        ordem.append(no)
+        for dep in dependentes[no]:
+            pendentes[dep] -= 1
+            if pendentes[dep] == 0:
+                fila.append(dep)
+
+    if len(ordem) != len(dependencias):
+        restantes = {no for no, qtd in pendentes.items() if qtd > 0}
+        ciclo = _encontrar_ciclo(dependencias, restantes)
+        if nomes:
+            ciclo = [nomes(no) for no in ciclo]
+        raise CicloDependenciaError([str(no) for no in ciclo])
+
+    return ordem
+
+
+def _encontrar_ciclo(dependencias, restantes):
+    """Segue as dependências entre as células restantes até repetir uma delas"""
+    no = next(iter(sorted(restantes)))
+    caminho = []
+    visitados = {}
+    while no not in visitados:
+        visitados[no] = len(caminho)
+        caminho.append(no)
+        no = next(ref for ref in dependencias[no] if ref in restantes)
+    return caminho[visitados[no]:] + [no]
@@ -0,0 +1,121 @@
+# Arquivo: motor/incerteza.py
+# Data: 17/10/2026
+# Propagação de incerteza pelo modelo (Monte Carlo)
+# Células de entrada recebem uma distribuição (normal, triangular ou
+# uniforme); as amostras são sorteadas de uma vez com NumPy e o modelo é
+# calculado para todas elas em uma única passada vetorizada (motor/lote.py),
+# uma coluna da matriz por amostra. O resultado são os percentis de cada
+# célula de saída (ex: faixa P5-P95 dos indicadores de carbono, energia e água).
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from motor.lote import LoteUsuarios
+
+# Distribuições aceitas e seus parâmetros, na ordem
+DISTRIBUICOES = {
+    'normal': ('media', 'desvio'),
+    'triangular': ('minimo', 'moda', 'maximo'),
+    'uniforme': ('minimo', 'maximo'),
+}
+
+# Número padrão de amostras
+AMOSTRAS = 10000
+
+# Percentis padrão (faixa central de 90%)
+PERCENTIS = (5, 50, 95)
+
+
+@dataclass(frozen=True)
+class Distribuicao:
+    """
+    Distribuição de uma célula de entrada.
+
+    Atributos:
+        tipo: 'normal', 'triangular' ou 'uniforme'
+        parametros: valores na ordem de DISTRIBUICOES[tipo]
+    """
+    tipo: str
+    parametros: tuple
+
+    def __post_init__(self):
+        nomes = DISTRIBUICOES.get(self.tipo)
+        if nomes is None:
+            raise ValueError(f"Distribuição desconhecida: {self.tipo}")
+        if len(self.parametros) != len(nomes):
+            raise ValueError(f"Distribuição {self.tipo} requer {', '.join(nomes)}")
+        if self.tipo == 'normal' and self.parametros[1] < 0:
+            raise ValueError("Desvio padrão negativo")
+        if self.tipo == 'triangular' and not (
+            self.parametros[0] <= self.parametros[1] <= self.parametros[2]
+        ):
+            raise ValueError("Triangular requer mínimo <= moda <= máximo")
+        if self.tipo == 'uniforme' and self.parametros[0] > self.parametros[1]:
+            raise ValueError("Uniforme requer mínimo <= máximo")
+
+    def amostrar(self, gerador, quantidade):
+        """Sorteia `quantidade` valores com o gerador NumPy informado"""
+        p = self.parametros
+        if self.tipo == 'normal':
+            return gerador.normal(p[0], p[1], quantidade)
+        if self.tipo == 'triangular':
+            if p[0] == p[2]:
+                return np.full(quantidade, float(p[0]))
+            return gerador.triangular(p[0], p[1], p[2], quantidade)
+        return gerador.uniform(p[0], p[1], quantidade)
+
+
+def validar(template, distribuicoes):
+    """
+    Verifica se as células com distribuição são entradas numéricas.
+
+    Raises:
+        ValueError: célula inexistente, calculada ou não numérica
+    """
+    for nome in distribuicoes:
+        slot = template.indice.get(nome)
+        if slot is None:
+            raise ValueError(f"Célula '{nome}' não existe no template")
+        if slot in template.dependencias:
+            raise ValueError(f"Célula '{nome}' é calculada ({template.tipos[slot]})")
+        if template.tipos[slot] != 'input':
+            raise ValueError(f"Célula '{nome}' não é uma entrada numérica")
+
+
+def simular(modelo, distribuicoes, saidas, amostras=AMOSTRAS, semente=None):
+    """
+    Calcula o modelo para `amostras` sorteios das células com distribuição;
+    as demais entradas mantêm os valores do modelo (usuário ou template).
+
+    Args:
+        modelo: ModeloUsuario base
+        distribuicoes: dict nome -> Distribuicao
+        saidas: nomes das células de saída
+        semente: semente do gerador (resultados reproduzíveis)
+
+    Returns:
+        np.ndarray: matriz (amostra, célula de saída)
+    """
+    template = modelo.template
+    validar(template, distribuicoes)
+
+    gerador = np.random.default_rng(semente)
+    lote = LoteUsuarios.replicar(modelo, amostras)
+    for nome, distribuicao in distribuicoes.items():
+        lote.valores[template.indice[nome], :] = distribuicao.amostrar(gerador, amostras)
+    lote.recalcular()
+
+    return lote.valores[[template.indice[nome] for nome in saidas], :].T.copy()
+
+
+def percentis(modelo, distribuicoes, saidas, amostras=AMOSTRAS, niveis=PERCENTIS, semente=None):
+    """
+    Percentis das células de saída.
+
+    Returns:
+        dict: nome -> tupla com um valor por nível de `niveis`
+    """
+    resultado = simular(modelo, distribuicoes, saidas, amostras, semente)
+    faixas = np.percentile(resultado, niveis, axis=0)
+    return {nome: tuple(float(v) for v in faixas[:, i]) for i, nome in enumerate(saidas)}
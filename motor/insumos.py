@@ -0,0 +1,102 @@
+# Arquivo: motor/insumos.py
+# Data: 17/10/2026
+# Valores da forms_insumos convertidos uma única vez por processo
+# Os math_element ('491105/100000', '4,91') são convertidos e validados na
+# carga e ficam em um mapeamento imutável (name_element -> float),
+# compartilhado entre sessões. O cache só é refeito quando a tabela muda.
+
+import hashlib
+import threading
+from collections.abc import Mapping
+from types import MappingProxyType
+
+from banco import versoes
+from motor.ocultas import converter_insumo
+
+_lock = threading.Lock()
+_cache = {'versao': None, 'insumos': None}
+
+
+class TabelaInsumos(Mapping):
+    """
+    Mapeamento imutável name_element -> float da forms_insumos.
+
+    Atributos:
+        versao: versão da forms_insumos que gerou os valores (ver versao_insumos)
+        invalidos: name_element -> mensagem de erro (valores que não converteram)
+    """
+
+    def __init__(self, versao, linhas):
+        self.versao = versao
+        valores = {}
+        invalidos = {}
+        for name, math_value in linhas:
+            if not name:
+                continue
+            name = name.strip()
+            try:
+                valores[name] = converter_insumo(math_value)
+            except ValueError as e:
+                invalidos[name] = f"Valor inválido '{math_value}': {str(e)}"
+        self._valores = MappingProxyType(valores)
+        self.invalidos = MappingProxyType(invalidos)
+
+    def __getitem__(self, nome):
+        return self._valores[nome]
+
+    def __iter__(self):
+        return iter(self._valores)
+
+    def __len__(self):
+        return len(self._valores)
+
+
+def linhas_insumos(cursor):
+    cursor.execute("""
+        SELECT name_element, math_element
+        FROM forms_insumos
+        ORDER BY ID_element
+    """)
+    return cursor.fetchall()
+
+
+def versao_insumos(cursor):
+    """
+    Versão da forms_insumos: a marca da chave 'insumos' (banco/versoes.py) ou,
+    antes da migração 6, a impressão digital (hash) das linhas.
+
+    Returns:
+        tuple: (versão, linhas); linhas é None quando a versão vem da marca
+    """
+    marca = versoes.marca(cursor, 'insumos')
+    if marca is not None:
+        return marca, None
+    linhas = linhas_insumos(cursor)
+    return hashlib.sha1(repr(linhas).encode('utf-8')).hexdigest(), linhas
+
+
+def carregar_insumos(cursor):
+    """
+    Retorna a TabelaInsumos do processo, convertendo os valores novamente
+    apenas quando a versão da forms_insumos mudar.
+    """
+    versao, linhas = versao_insumos(cursor)
+
+    insumos = _cache['insumos']
+    if insumos is not None and _cache['versao'] == versao:
+        return insumos
+
+    with _lock:
+        if _cache['insumos'] is None or _cache['versao'] != versao:
+            if linhas is None:
+                linhas = linhas_insumos(cursor)
+            _cache['insumos'] = TabelaInsumos(versao, linhas)
+            _cache['versao'] = versao
+        return _cache['insumos']
+
+
+def limpar_cache():
+    """Descarta os valores convertidos (ex: após importação via create_forms.py)"""
+    with _lock:
+        _cache['versao'] = None
+        _cache['insumos'] = None
@@ -0,0 +1,211 @@
+# Arquivo: motor/lote.py
+# Data: 17/10/2026
+# Cálculo vetorizado do modelo para vários usuários ao mesmo tempo (NumPy)
+# Os valores ficam em uma matriz (células x usuários): cada linha da matriz é
+# uma célula do template com o valor de todos os usuários, de modo que as
+# mesmas funções compiladas das fórmulas avaliam a coluna inteira de uma vez
+
+import numpy as np
+
+from banco import valores as valores_usuario
+from motor.insumos import carregar_insumos
+from motor.modelo import TOLERANCIA, mudou, numero
+from motor.ocultas import mapear_condicao
+from motor.template import carregar_template
+
+# Mesmo limite de safe_div
+LIMITE_DIVISAO = 1e-10
+
+
+def div_vetorizada(x, y):
+    """safe_div vetorizada: divisor com |y| < 1e-10 resulta em 0.0"""
+    y = np.asarray(y, dtype=float)
+    zero = np.abs(y) < LIMITE_DIVISAO
+    return np.where(zero, 0.0, np.divide(x, np.where(zero, 1.0, y)))
+
+
+def refs_texto(template):
+    """Slots dos selectbox referenciados por condicaoH (únicos textos usados no cálculo)"""
+    return {template.indice[ref] for ref, _ in template.condicoes.values() if ref in template.indice}
+
+
+class LoteUsuarios:
+    """
+    Modelos de vários usuários em uma única matriz.
+
+    Atributos:
+        template: Template compilado
+        user_ids: lista de IDs (coluna -> usuário)
+        valores: matriz float (slot, usuário)
+        textos: dict slot -> lista de str_element por usuário
+            (apenas selectbox referenciados por condicaoH)
+        alterados: matriz bool (slot, usuário) com alterações não gravadas
+        padroes: vetor float (slot) com os valores do template, ou None
+    """
+
+    def __init__(self, template, user_ids, valores, textos, insumos=None, padroes=None):
+        self.template = template
+        self.user_ids = list(user_ids)
+        self.valores = valores
+        self.textos = textos
+        self.insumos = insumos or {}
+        self.padroes = padroes
+        self.alterados = np.zeros(valores.shape, dtype=bool)
+
+    @classmethod
+    def carregar(cls, cursor, user_ids=None, template=None):
+        """
+        Carrega os usuários informados (ou todos os cadastrados e os que têm
+        valores gravados): uma consulta para os valores padrão do template e
+        uma na valores_usuario.
+        """
+        if template is None:
+            template = carregar_template(cursor)
+
+        if user_ids is None:
+            cursor.execute(f"""
+                SELECT user_id FROM usuarios
+                UNION
+                SELECT user_id FROM {valores_usuario.TABELA} WHERE tabela = 'forms_tab'
+                ORDER BY user_id
+            """)
+            user_ids = [row[0] for row in cursor.fetchall()]
+        user_ids = list(user_ids)
+        coluna = {user_id: col for col, user_id in enumerate(user_ids)}
+
+        tamanho = len(template)
+        valores = np.zeros((tamanho, len(user_ids)))
+        padroes = np.zeros(tamanho)
+        textos = {slot: [None] * len(user_ids) for slot in refs_texto(template)}
+
+        # Valores padrão do template em todas as colunas
+        cursor.execute("""
+            SELECT name_element, value_element, str_element
+            FROM forms_tab
+            WHERE user_id = 0
+            ORDER BY ID_element
+        """)
+        for name, value, str_value in cursor.fetchall():
+            slot = template.indice.get(name)
+            if slot is None or slot >= tamanho:
+                continue
+            valores[slot, :] = padroes[slot] = numero(value)
+            if slot in textos:
+                textos[slot] = [str_value] * len(user_ids)
+
+        # Valores de cada usuário sobre os padrões
+        cursor.execute(f"""
+            SELECT user_id, name_element, value_element, str_element
+            FROM {valores_usuario.TABELA}
+            WHERE tabela = 'forms_tab'
+        """)
+        for user_id, name, value, str_value in cursor.fetchall():
+            col = coluna.get(user_id)
+            slot = template.indice.get(name)
+            if col is None or slot is None or slot >= tamanho:
+                continue
+            if value is not None:
+                valores[slot, col] = numero(value)
+            if slot in textos and str_value is not None:
+                textos[slot][col] = str_value
+
+        insumos = carregar_insumos(cursor)
+        for name, valor in insumos.items():
+            slot = template.indice.get(name)
+            if slot is not None and slot < tamanho:
+                valores[slot, :] = padroes[slot] = valor
+
+        return cls(template, user_ids, valores, textos, insumos, padroes)
+
+    @classmethod
+    def replicar(cls, modelo, quantidade):
+        """
+        Lote com `quantidade` colunas iguais a um ModeloUsuario (cenários
+        calculados a partir dos valores de um usuário ou do template).
+        As colunas são numeradas de 0 a quantidade - 1 e não devem ser gravadas.
+        """
+        template = modelo.template
+        valores = np.tile(np.asarray(modelo.valores, dtype=float)[:, None], (1, quantidade))
+        textos = {slot: [modelo.textos[slot]] * quantidade for slot in refs_texto(template)}
+        return cls(template, range(quantidade), valores, textos, modelo.insumos)
+
+    def calcular(self, slot):
+        """
+        Calcula uma célula para todos os usuários.
+        Posições sem valor de referência retornam NaN (mantêm o valor atual).
+        """
+        template = self.template
+        nome = template.nomes[slot]
+        usuarios = len(self.user_ids)
+
+        formula = template.formulas.get(nome)
+        if formula is not None:
+            resultado = formula.avaliar(self.valores, div_vetorizada)
+            return np.broadcast_to(np.asarray(resultado, dtype=float), (usuarios,))
+
+        if nome in template.condicoes:
+            math_ref, mapeamento = template.condicoes[nome]
+            textos = self.textos.get(template.indice.get(math_ref), [None] * usuarios)
+            mapa = {}
+            resultado = np.empty(usuarios)
+            for col, texto in enumerate(textos):
+                if texto not in mapa:
+                    try:
+                        valor = mapear_condicao(mapeamento, texto)
+                    except ValueError:
+                        valor = None
+                    mapa[texto] = np.nan if valor is None else valor
+                resultado[col] = mapa[texto]
+            return resultado
+
+        valor = self.insumos.get(template.insumos[nome])
+        return np.full(usuarios, np.nan if valor is None else valor)
+
+    def recalcular(self):
+        """
+        Recalcula todas as células calculadas, na ordem topológica,
+        para todos os usuários.
+
+        Returns:
+            int: número de células (usuário x célula) cujo valor mudou
+        """
+        valores = self.valores
+        for slot in self.template.ordem:
+            resultado = self.calcular(slot)
+            atual = valores[slot]
+            diferente = ~np.isnan(resultado) & (
+                np.abs(atual - resultado) > TOLERANCIA * np.maximum(1.0, np.abs(resultado))
+            )
+            if diferente.any():
+                atual[diferente] = resultado[diferente]
+                self.alterados[slot] |= diferente
+        return int(self.alterados.sum())
+
+    def salvar(self, cursor):
+        """
+        Grava as células alteradas de todos os usuários em uma transação
+        (as que voltaram ao padrão do template são removidas).
+
+        Returns:
+            int: número de células gravadas ou removidas
+        """
+        slots, cols = np.nonzero(self.alterados)
+        if not len(slots):
+            return 0
+
+        nomes = self.template.nomes
+        gravar, remover = [], []
+        for slot, col in zip(slots.tolist(), cols.tolist()):
+            valor = float(self.valores[slot, col])
+            if self.padroes is not None and not mudou(self.padroes[slot], valor):
+                # Voltou ao padrão do template: a linha do usuário é removida
+                remover.append((self.user_ids[col], nomes[slot]))
+            else:
+                gravar.append((self.user_ids[col], nomes[slot], valor, None))
+
+        valores_usuario.gravar_usuarios(cursor, 'forms_tab', gravar)
+        valores_usuario.remover_usuarios(cursor, 'forms_tab', remover)
+        cursor.connection.commit()
+
+        self.alterados[:] = False
+        return len(slots)
@@ -0,0 +1,141 @@
+# Arquivo: motor/memoria.py
+# Data: 17/10/2026
+# Memoização do recálculo completo do modelo
+# O resultado das células calculadas depende apenas das células de entrada
+# (valores e textos), dos insumos e da versão do template. A chave do cache é
+# a impressão digital (hash) desse conjunto; o valor é o vetor com o resultado
+# de todas as células calculadas, na ordem topológica. Como muitos usuários
+# mantêm os padrões do template, entradas iguais reaproveitam o cálculo.
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from motor.modelo import mudou
+
+# Quantidade máxima de vetores de resultado mantidos (LRU)
+CAPACIDADE = 256
+
+
+def impressao_digital(modelo):
+    """
+    Hash das entradas do modelo: valores das células não calculadas, textos
+    (selectbox, datas), insumos e versão do template.
+    """
+    template = modelo.template
+    calculadas = template.dependencias
+    entradas = [
+        (valor, texto)
+        for slot, (valor, texto) in enumerate(zip(modelo.valores, modelo.textos))
+        if slot not in calculadas
+    ]
+    # TabelaInsumos já traz a impressão digital da forms_insumos
+    insumos = getattr(modelo.insumos, 'versao', None) or sorted(modelo.insumos.items())
+    conteudo = repr((template.versao, entradas, insumos))
+    return hashlib.sha1(conteudo.encode('utf-8')).hexdigest()
+
+
+def _ocultas(template):
+    """Slots das células condicaoH e call_insumosH"""
+    return [template.indice[nome] for nome in (*template.condicoes, *template.insumos)]
+
+
+class CacheResultados:
+    """
+    Cache LRU de vetores de resultado, compartilhado pelas sessões do processo.
+
+    Atributos:
+        capacidade: número máximo de entradas
+        acertos / falhas: contadores de consultas
+    """
+
+    def __init__(self, capacidade=CAPACIDADE):
+        self.capacidade = capacidade
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.descartes = 0
+
+    def obter(self, chave):
+        with self._lock:
+            saida = self._entradas.get(chave)
+            if saida is None:
+                self.falhas += 1
+                return None
+            self._entradas.move_to_end(chave)
+            self.acertos += 1
+            return saida
+
+    def guardar(self, chave, saida):
+        with self._lock:
+            self._entradas[chave] = saida
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.capacidade:
+                self._entradas.popitem(last=False)
+                self.descartes += 1
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def estatisticas(self):
+        """
+        Returns:
+            dict: tamanho, capacidade, acertos, falhas, descartes e taxa de acerto (%)
+        """
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                'tamanho': len(self._entradas),
+                'capacidade': self.capacidade,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'descartes': self.descartes,
+                'taxa_acerto': 100 * self.acertos / consultas if consultas else 0.0,
+            }
+
+    def recalcular(self, modelo):
+        """
+        Recalcula todas as células calculadas do modelo (mesmo resultado de
+        ModeloUsuario.recalcular), aplicando o vetor do cache quando as
+        entradas já foram calculadas antes.
+
+        Returns:
+            set: nomes das células cujo valor mudou
+        """
+        chave = impressao_digital(modelo)
+        saida = self.obter(chave)
+        if saida is None:
+            mudaram = modelo.recalcular()
+            # Célula oculta sem valor de referência mantém o valor anterior:
+            # o resultado deixa de depender só das entradas e não é guardado
+            if not any(modelo.calcular(slot) is None for slot in _ocultas(modelo.template)):
+                self.guardar(chave, tuple(modelo.valores[slot] for slot in modelo.template.ordem))
+            return mudaram
+
+        nomes = modelo.template.nomes
+        mudaram = set()
+        for slot, valor in zip(modelo.template.ordem, saida):
+            if mudou(modelo.valores[slot], valor):
+                modelo.valores[slot] = valor
+                modelo.alterados.add(slot)
+                mudaram.add(nomes[slot])
+        return mudaram
+
+
+_cache = CacheResultados()
+
+
+def recalcular(modelo):
+    """Recálculo completo do modelo pelo cache do processo"""
+    return _cache.recalcular(modelo)
+
+
+def estatisticas():
+    """Estatísticas do cache do processo (ver CacheResultados.estatisticas)"""
+    return _cache.estatisticas()
+
+
+def limpar():
+    _cache.limpar()
@@ -0,0 +1,194 @@
+# Arquivo: motor/meta.py
+# Data: 17/10/2026
+# Busca de meta (goal seek): valor de uma célula de entrada que leva uma
+# célula de saída a um valor alvo (ex: peso da embalagem para atingir uma
+# pegada de carbono). Cada tentativa recalcula apenas o subgrafo entre a
+# entrada e a saída, em uma cópia dos valores do modelo, com números duais
+# (motor/sensibilidade.py) para obter a derivada exata. A iteração é de
+# Newton, protegida por bisseção assim que o alvo fica cercado (intervalo
+# com sinais opostos); antes disso o passo é limitado (CRESCIMENTO) e um
+# estouro numérico encerra a busca sem convergência. Nada é gravado: o valor
+# só é aplicado ao modelo se o usuário aceitar o resultado.
+
+import math
+import time
+from dataclasses import dataclass
+
+from motor.sensibilidade import Dual, div_dual
+
+# Número máximo de avaliações
+ITERACOES = 100
+
+# Tolerância relativa ao alvo
+TOLERANCIA = 1e-9
+
+# Passo máximo fora do intervalo cercado, relativo a max(1, |x|): evita que
+# saídas saturadas (derivada quase nula) levem a entrada ao overflow
+CRESCIMENTO = 10.0
+
+
+@dataclass
+class ResultadoMeta:
+    """
+    Resultado da busca de meta.
+
+    Atributos:
+        valor: valor encontrado para a entrada
+        obtido: valor da saída com a entrada em `valor`
+        convergiu: True se |obtido - alvo| ficou dentro da tolerância
+        iteracoes: avaliações do subgrafo
+        duracao_ms: tempo total da busca
+        mensagem: descrição do resultado
+    """
+    entrada: str
+    saida: str
+    alvo: float
+    valor: float
+    obtido: float
+    convergiu: bool
+    iteracoes: int
+    duracao_ms: float
+    mensagem: str
+
+
+def subgrafo(template, slot_entrada, slot_saida):
+    """
+    Slots calculados a jusante da entrada e a montante da saída (inclusive),
+    na ordem topológica: as únicas células que mudam a saída.
+    """
+    montante = {slot_saida}
+    pilha = [slot_saida]
+    while pilha:
+        for ref in template.dependencias.get(pilha.pop(), ()):
+            if ref not in montante:
+                montante.add(ref)
+                pilha.append(ref)
+    return [slot for slot in template.afetados({slot_entrada}) if slot in montante]
+
+
+def buscar_meta(modelo, entrada, saida, alvo, minimo=0.0, maximo=None,
+                tolerancia=TOLERANCIA, iteracoes=ITERACOES):
+    """
+    Procura o valor de `entrada` para o qual `saida` = `alvo`.
+    O modelo não é alterado.
+
+    Args:
+        modelo: ModeloUsuario com os valores atuais (já recalculado)
+        entrada: nome da célula de entrada (input)
+        saida: nome da célula de saída
+        alvo: valor desejado para a saída
+        minimo / maximo: limites da entrada (None = sem limite)
+
+    Returns:
+        ResultadoMeta
+
+    Raises:
+        ValueError: entrada calculada/inexistente ou saída que não depende da entrada
+        OverflowError: saída fora da faixa numérica já no valor atual da entrada
+    """
+    inicio = time.perf_counter()
+    template = modelo.template
+    slot_entrada = modelo.slot(entrada)
+    slot_saida = modelo.slot(saida)
+    if slot_entrada is None or slot_entrada in template.dependencias:
+        raise ValueError(f"'{entrada}' não é uma célula de entrada")
+    if slot_saida is None:
+        raise ValueError(f"Célula '{saida}' não existe no template")
+
+    caminho = subgrafo(template, slot_entrada, slot_saida)
+    if slot_saida not in caminho:
+        raise ValueError(f"'{saida}' não depende de '{entrada}'")
+
+    # Células fora do caminho não mudam: condicaoH/call_insumosH são constantes
+    valores = list(modelo.valores)
+    constantes = {}
+    for slot in caminho:
+        if template.nomes[slot] not in template.formulas:
+            resultado = modelo.calcular(slot)
+            constantes[slot] = valores[slot] if resultado is None else resultado
+
+    def avaliar(x):
+        """Saída - alvo e sua derivada em relação à entrada"""
+        valores[slot_entrada] = Dual(x, 1.0)
+        for slot in caminho:
+            formula = template.formulas.get(template.nomes[slot])
+            valores[slot] = constantes[slot] if formula is None else formula.avaliar(valores, div_dual)
+        resultado = valores[slot_saida]
+        if isinstance(resultado, Dual):
+            return float(resultado.valor) - alvo, float(resultado.derivada)
+        return float(resultado) - alvo, 0.0
+
+    def limitar(x):
+        if minimo is not None:
+            x = max(x, minimo)
+        if maximo is not None:
+            x = min(x, maximo)
+        return x
+
+    limite = tolerancia * max(1.0, abs(alvo))
+    x = limitar(float(modelo.valores[slot_entrada]))
+    negativo = positivo = None  # entradas com saída abaixo/acima do alvo
+    melhor = None
+
+    estouro = False
+    for iteracao in range(1, iteracoes + 1):
+        try:
+            fx, dfx = avaliar(x)
+        except (OverflowError, FloatingPointError, ZeroDivisionError):
+            fx = dfx = math.inf
+        if not (math.isfinite(fx) and math.isfinite(dfx)):
+            estouro = True
+            break
+        if melhor is None or abs(fx) < abs(melhor[1]):
+            melhor = (x, fx)
+        if abs(fx) <= limite:
+            break
+
+        if fx < 0:
+            negativo = x
+        else:
+            positivo = x
+
+        proximo = x - fx / dfx if dfx else None
+        if negativo is not None and positivo is not None:
+            # Alvo cercado: Newton só é aceito dentro do intervalo
+            baixo, alto = sorted((negativo, positivo))
+            if proximo is None or not baixo < proximo < alto:
+                proximo = (negativo + positivo) / 2
+        else:
+            if proximo is None:
+                # Derivada nula e alvo ainda não cercado: amplia a procura
+                proximo = x * 2 if x else 1.0
+            # Região de confiança: passo limitado enquanto o alvo não é cercado
+            passo = CRESCIMENTO * max(1.0, abs(x))
+            proximo = min(max(proximo, x - passo), x + passo)
+
+        proximo = limitar(proximo)
+        if proximo == x:
+            break  # limite da entrada atingido
+        x = proximo
+
+    if melhor is None:
+        raise OverflowError(f"'{saida}' não pode ser calculada com '{entrada}' = {x}")
+    valor, diferenca = melhor
+    convergiu = abs(diferenca) <= limite
+    if convergiu:
+        mensagem = "Meta atingida"
+    elif estouro:
+        mensagem = "Busca interrompida (resultado fora da faixa numérica); valor mais próximo"
+    elif negativo is None or positivo is None:
+        mensagem = "Meta inatingível dentro dos limites da entrada; valor mais próximo"
+    else:
+        mensagem = f"Meta não atingida em {iteracoes} iterações; valor mais próximo"
+
+    return ResultadoMeta(
+        entrada=entrada,
+        saida=saida,
+        alvo=alvo,
+        valor=valor,
+        obtido=diferenca + alvo,
+        convergiu=convergiu,
+        iteracoes=iteracao,
+        duracao_ms=(time.perf_counter() - inicio) * 1000,
+        mensagem=mensagem,
+    )
@@ -0,0 +1,294 @@
+# Arquivo: motor/modelo.py
+# Data: 17/10/2026
+# Modelo de cálculo de um usuário em memória
+# Carrega todas as células do usuário com uma única consulta (template +
+# valores_usuario), resolve as referências a partir de listas indexadas por
+# slot e grava as alterações com um único executemany. Só ficam gravadas as
+# células diferentes do padrão do template (copy-on-write).
+
+from banco import valores as valores_usuario
+from motor.formulas import safe_div
+from motor.insumos import carregar_insumos
+from motor.ocultas import mapear_condicao
+from motor.template import carregar_template
+
+# Tolerância para considerar que o valor de uma célula mudou
+TOLERANCIA = 1e-12
+
+
+def numero(valor):
+    """Converte value_element em float (aceita REAL, texto com vírgula ou None)"""
+    if valor is None or valor == '':
+        return 0.0
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        try:
+            return float(str(valor).replace(',', '.'))
+        except ValueError:
+            return 0.0
+
+
+def data_para_dias(texto):
+    """
+    Converte uma data dd/mm/aaaa em número de dias desde 01/01/1900
+    (valor gravado nas células input_data). Vazio ou fora da faixa: 0.
+
+    Raises:
+        ValueError: texto fora do formato dd/mm/aaaa
+    """
+    if not texto:
+        return 0
+
+    dia, mes, ano = map(int, str(texto).split('/'))
+    if not (1900 <= ano <= 2100 and 1 <= mes <= 12 and 1 <= dia <= 31):
+        return 0
+
+    bissexto = lambda y: (y % 4 == 0 and y % 100 != 0) or (y % 400 == 0)
+    dias = (ano - 1900) * 365 + sum(1 for y in range(1900, ano) if bissexto(y))
+    dias_no_mes = [0, 31, 29 if bissexto(ano) else 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+    return dias + sum(dias_no_mes[1:mes]) + dia - 1
+
+
+def mudou(anterior, novo):
+    """Indica se a diferença entre dois valores ultrapassa a tolerância"""
+    return abs(anterior - novo) > TOLERANCIA * max(1.0, abs(novo))
+
+
+class ModeloUsuario:
+    """
+    Valores de um usuário alinhados aos slots do template.
+
+    Atributos:
+        template: Template compilado
+        user_id: ID do usuário
+        valores: lista slot -> value_element (float)
+        textos: lista slot -> str_element
+        alterados: slots com alterações ainda não gravadas
+        padroes: (valores, textos) do template, ou None (grava todas as alteradas)
+    """
+
+    def __init__(self, template, user_id, valores, textos, insumos=None, padroes=None):
+        self.template = template
+        self.user_id = user_id
+        self.valores = valores
+        self.textos = textos
+        self.insumos = insumos or {}
+        self.padroes = padroes
+        self.alterados = set()
+
+    @classmethod
+    def carregar(cls, cursor, user_id, template=None):
+        """
+        Carrega o modelo do usuário: uma consulta no template com os valores
+        do usuário (valores_usuario) e uma na forms_insumos. Células sem valor
+        gravado assumem o padrão do template.
+        """
+        if template is None:
+            template = carregar_template(cursor)
+
+        tamanho = len(template)
+        valores = [0.0] * tamanho
+        textos = [None] * tamanho
+        padrao_valores = [0.0] * tamanho
+        padrao_textos = [None] * tamanho
+
+        # Em nomes repetidos prevalece o maior ID_element (mesma regra das consultas antigas)
+        cursor.execute(f"""
+            SELECT t.name_element, t.value_element, t.str_element,
+                   v.value_element, v.str_element
+            FROM forms_tab t
+            LEFT JOIN {valores_usuario.TABELA} v
+                ON v.tabela = 'forms_tab'
+                AND v.user_id = ?
+                AND v.name_element = t.name_element
+            WHERE t.user_id = 0
+            ORDER BY t.ID_element
+        """, (user_id,))
+        for name, value, str_value, valor_usuario, texto_usuario in cursor.fetchall():
+            slot = template.indice.get(name)
+            if slot is not None and slot < tamanho:
+                padrao_valores[slot] = numero(value)
+                padrao_textos[slot] = str_value
+                valores[slot] = padrao_valores[slot] if valor_usuario is None else numero(valor_usuario)
+                textos[slot] = str_value if texto_usuario is None else texto_usuario
+
+        insumos = carregar_insumos(cursor)
+        for name, valor in insumos.items():
+            slot = template.indice.get(name)
+            if slot is not None and slot < tamanho:
+                valores[slot] = padrao_valores[slot] = valor
+
+        return cls(template, user_id, valores, textos, insumos, (padrao_valores, padrao_textos))
+
+    def copiar(self):
+        """Cópia independente dos valores (template, insumos e padrões compartilhados)"""
+        return ModeloUsuario(self.template, self.user_id, list(self.valores),
+                             list(self.textos), self.insumos, self.padroes)
+
+    def slot(self, nome):
+        slot = self.template.indice.get(nome)
+        if slot is None or slot >= len(self.valores):
+            return None
+        return slot
+
+    def valor(self, nome):
+        """Valor numérico de uma célula (0.0 se não existir)"""
+        slot = self.slot(nome)
+        if slot is None:
+            return self.insumos.get(nome, 0.0)
+        return self.valores[slot]
+
+    def texto(self, nome):
+        """str_element de uma célula (None se não existir)"""
+        slot = self.slot(nome)
+        return None if slot is None else self.textos[slot]
+
+    def definir(self, nome, valor, texto=None):
+        """
+        Altera o valor (e opcionalmente o str_element) de uma célula.
+
+        Returns:
+            bool: True se algo mudou
+        """
+        slot = self.slot(nome)
+        if slot is None:
+            return False
+
+        valor = float(valor)
+        alterou = mudou(self.valores[slot], valor)
+        if texto is not None and texto != self.textos[slot]:
+            self.textos[slot] = texto
+            alterou = True
+        if alterou:
+            self.valores[slot] = valor
+            self.alterados.add(slot)
+        return alterou
+
+    def selecionar(self, nome, texto):
+        """
+        Altera o texto de um selectbox e resolve em memória, pelo índice
+        reverso do template, as células condicaoH que o referenciam.
+
+        Returns:
+            set: nomes alterados (o selectbox e os condicaoH cujo valor mudou)
+        """
+        # O value_element do selectbox é sempre 0.0; a escolha fica no str_element
+        if not self.definir(nome, 0.0, texto=texto):
+            return set()
+        mudaram = {nome}
+        for dependente in self.template.condicoes_por_ref.get(nome, ()):
+            if self.atualizar(dependente):
+                mudaram.add(dependente)
+        return mudaram
+
+    def calcular(self, slot):
+        """
+        Calcula uma célula do grafo (formula, condicaoH ou call_insumosH).
+        Retorna None quando não há valor de referência (mantém o valor atual).
+        """
+        template = self.template
+        nome = template.nomes[slot]
+
+        formula = template.formulas.get(nome)
+        if formula is not None:
+            return float(formula.avaliar(self.valores, safe_div))
+
+        if nome in template.condicoes:
+            math_ref, mapeamento = template.condicoes[nome]
+            try:
+                return mapear_condicao(mapeamento, self.texto(math_ref))
+            except ValueError:
+                return None
+
+        return self.insumos.get(template.insumos[nome])
+
+    def _atualizar(self, slot):
+        resultado = self.calcular(slot)
+        if resultado is None or not mudou(self.valores[slot], resultado):
+            return False
+        self.valores[slot] = resultado
+        self.alterados.add(slot)
+        return True
+
+    def atualizar(self, nome):
+        """
+        Recalcula uma célula calculada a partir dos valores do modelo.
+
+        Returns:
+            bool: True se o valor mudou
+        """
+        slot = self.slot(nome)
+        if slot is None or slot not in self.template.dependencias:
+            return False
+        return self._atualizar(slot)
+
+    def recalcular(self):
+        """
+        Recalcula todas as células calculadas na ordem topológica.
+
+        Returns:
+            set: nomes das células cujo valor mudou
+        """
+        nomes = self.template.nomes
+        return {nomes[slot] for slot in self.template.ordem if self._atualizar(slot)}
+
+    def propagar(self, alterados):
+        """
+        Recálculo incremental a partir das células alteradas: só recalcula uma
+        célula se alguma de suas dependências mudou de fato.
+
+        Returns:
+            set: nomes das células calculadas cujo valor mudou
+        """
+        template = self.template
+        sujos = {slot for slot in map(self.slot, alterados) if slot is not None}
+        mudaram = set()
+
+        for slot in template.afetados(sujos):
+            if not any(ref in sujos for ref in template.dependencias[slot]):
+                continue
+            if self._atualizar(slot):
+                sujos.add(slot)
+                mudaram.add(template.nomes[slot])
+
+        return mudaram
+
+    def padrao(self, slot):
+        """Indica se a célula está igual ao padrão do template"""
+        if self.padroes is None:
+            return False
+        padrao_valores, padrao_textos = self.padroes
+        if mudou(padrao_valores[slot], self.valores[slot]):
+            return False
+        return (self.template.tipos[slot] not in valores_usuario.TIPOS_TEXTO
+                or self.textos[slot] == padrao_textos[slot])
+
+    def salvar(self, cursor):
+        """
+        Grava as células alteradas em uma transação: as diferentes do padrão
+        com um executemany e as que voltaram ao padrão são removidas.
+
+        Returns:
+            int: número de células gravadas ou removidas
+        """
+        if not self.alterados:
+            return 0
+
+        nomes = self.template.nomes
+        tipos = self.template.tipos
+        gravar, remover = [], []
+        for slot in sorted(self.alterados):
+            if self.padrao(slot):
+                remover.append(nomes[slot])
+            else:
+                texto = self.textos[slot] if tipos[slot] in valores_usuario.TIPOS_TEXTO else None
+                gravar.append((nomes[slot], self.valores[slot], texto))
+
+        valores_usuario.gravar(cursor, 'forms_tab', self.user_id, gravar)
+        valores_usuario.remover(cursor, 'forms_tab', self.user_id, remover)
+        cursor.connection.commit()
+
+        gravados = len(self.alterados)
+        self.alterados.clear()
+        return gravados
@@ -0,0 +1,72 @@
+# Arquivo: motor/ocultas.py
+# Data: 17/10/2026
+# Regras de cálculo das células ocultas do template
+#   condicaoH:     valor = mapeamento 'chave:valor|...' (select_element) aplicado
+#                  ao texto selecionado no selectbox referenciado em math_element
+#   call_insumosH: valor = math_element da forms_insumos referenciado em str_element
+
+from functools import lru_cache
+from types import MappingProxyType
+
+
+@lru_cache(maxsize=None)
+def compilar_condicao(mapeamento):
+    """
+    Converte um mapeamento condicaoH em dicionário, uma única vez por texto.
+
+    Args:
+        mapeamento: texto no formato 'chave:valor|chave:valor'
+
+    Returns:
+        mapeamento imutável chave -> float (None se o valor não for numérico);
+        em chaves repetidas prevalece a primeira
+    """
+    tabela = {}
+    for par in str(mapeamento or '').strip('"').split('|'):
+        if ':' not in par:
+            continue
+        item, _, valor = par.partition(':')
+        try:
+            numero = float(valor.strip())
+        except ValueError:
+            numero = None
+        tabela.setdefault(item.strip(), numero)
+    return MappingProxyType(tabela)
+
+
+def mapear_condicao(mapeamento, chave):
+    """
+    Aplica um mapeamento condicaoH.
+
+    Args:
+        mapeamento: dicionário de compilar_condicao (ou o texto 'chave:valor|...')
+        chave: texto selecionado no selectbox de referência
+
+    Returns:
+        float ou None se a chave não estiver no mapeamento
+    """
+    if not mapeamento or chave is None:
+        return None
+    if isinstance(mapeamento, str):
+        mapeamento = compilar_condicao(mapeamento)
+    return mapeamento.get(str(chave).strip())
+
+
+def converter_insumo(math_value):
+    """
+    Converte o math_element da forms_insumos em número.
+    Aceita frações ('491105/100000') e números com vírgula ou ponto.
+
+    Raises:
+        ValueError: valor inválido ou divisão por zero
+    """
+    if not math_value:
+        return 0.0
+
+    math_value = str(math_value)
+    if '/' in math_value:
+        num, den = map(lambda x: float(x.replace(',', '.')), math_value.split('/'))
+        if den == 0:
+            raise ValueError(f"Divisão por zero encontrada em '{math_value}'")
+        return num / den
+    return float(math_value.replace(',', '.'))
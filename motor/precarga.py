@@ -0,0 +1,287 @@
+# Arquivo: motor/precarga.py
+# Data: 17/10/2026
+# Pré-carga dos resultados em segundo plano
+# Depois que uma alteração de entrada é gravada (páginas de formulário), o
+# usuário é colocado em uma fila; uma thread recalcula o modelo, grava as
+# células calculadas que mudaram e lê, em uma única transação de leitura, as
+# linhas das tabelas de resultados (as quatro simulações e a energética). O
+# resultado fica em um cache por usuário, marcado com a impressão digital dos
+# dados (marcas de versão dos valores do usuário, do template, dos insumos e
+# das tabelas de resultados, banco/versoes.py): as páginas de resultados
+# usam o cache se a impressão ainda for a mesma e só calculam na hora quando
+# não há pré-carga válida.
+
+import hashlib
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from config import DB_PATH
+from banco import escrita, versoes
+from banco.conexao import obter_conexao
+from banco.valores import TABELA, visao
+from motor import memoria
+from motor.insumos import versao_insumos
+from motor.modelo import ModeloUsuario
+from motor.template import versao_template
+
+logger = logging.getLogger(__name__)
+
+# Tabelas exibidas pelas páginas de resultados
+TABELAS_RESULTADOS = [
+    'forms_resultados',
+    'forms_result_sea',
+    'forms_setorial',
+    'forms_setorial_sea',
+    'forms_energetica',
+]
+
+# Usuários mantidos no cache (LRU)
+CAPACIDADE = 100
+
+# Colunas lidas pelas páginas de resultados (mesma ordem das tuplas element[i])
+_COLUNAS = """name_element, type_element, math_element, msg_element,
+              value_element, select_element, str_element, e_col, e_row,
+              section, user_id"""
+
+
+class ResultadosUsuario:
+    """
+    Resultados pré-calculados de um usuário.
+
+    Atributos:
+        impressao: impressão digital dos dados usados no cálculo
+        modelo: ModeloUsuario recalculado (usar copiar() antes de alterar)
+        elementos: tabela -> linhas (_COLUNAS) ordenadas por e_row, e_col
+        valores: tabela -> {name_element: value_element} (maior ID_element prevalece)
+        criado_em: instante do cálculo (time.time())
+    """
+
+    def __init__(self, user_id, impressao, modelo, elementos, valores):
+        self.user_id = user_id
+        self.impressao = impressao
+        self.modelo = modelo
+        self.elementos = elementos
+        self.valores = valores
+        self.criado_em = time.time()
+
+
+def impressao(cursor, user_id):
+    """
+    Marcas de versão dos valores gravados do usuário, do template, dos
+    insumos e das tabelas de resultados (editáveis pelo CRUD): uma leitura
+    por chave. Sem a tabela de marcas (migração 6 pendente), hash do
+    conteúdo dessas tabelas.
+    """
+    marcas = versoes.marcas(cursor, (versoes.chave_usuario(user_id),) + versoes.CHAVES)
+    if marcas is not None:
+        return marcas
+    cursor.execute(f"""
+        SELECT tabela, name_element, value_element, str_element
+        FROM {TABELA}
+        WHERE user_id = ?
+        ORDER BY tabela, name_element
+    """, (user_id,))
+    partes = [cursor.fetchall(), versao_template(cursor)[0], versao_insumos(cursor)[0]]
+    for tabela in TABELAS_RESULTADOS:
+        cursor.execute(f"SELECT * FROM {tabela} ORDER BY ID_element")
+        partes.append(cursor.fetchall())
+    conteudo = repr(partes)
+    return hashlib.sha1(conteudo.encode('utf-8')).hexdigest()
+
+
+def preparar(cursor, user_id):
+    """
+    Recalcula o modelo do usuário (gravando as células que mudaram) e lê as
+    tabelas de resultados em uma única transação de leitura.
+
+    Returns:
+        ResultadosUsuario
+    """
+    modelo = ModeloUsuario.carregar(cursor, user_id)
+    memoria.recalcular(modelo)
+    if modelo.alterados:
+        escrita.executar(modelo.salvar)
+
+    conn = cursor.connection
+    fechar = not conn.in_transaction
+    if fechar:
+        cursor.execute("BEGIN")  # mesmo instantâneo para a impressão e as tabelas
+    try:
+        marca = impressao(cursor, user_id)
+        elementos, valores = {}, {}
+        for tabela in TABELAS_RESULTADOS:
+            cursor.execute(f"""
+                SELECT {_COLUNAS}
+                FROM {visao(tabela)}
+                WHERE user_id = ?
+                ORDER BY e_row, e_col
+            """, (user_id,))
+            elementos[tabela] = cursor.fetchall()
+            cursor.execute(f"""
+                SELECT name_element, value_element
+                FROM {visao(tabela)}
+                WHERE user_id = ?
+                ORDER BY ID_element
+            """, (user_id,))
+            valores[tabela] = dict(cursor.fetchall())
+    finally:
+        if fechar:
+            conn.commit()
+
+    return ResultadosUsuario(user_id, marca, modelo, elementos, valores)
+
+
+class PrecargaResultados:
+    """
+    Cache de ResultadosUsuario com uma thread de pré-carga.
+
+    agendar() coloca o usuário na fila (pedidos repetidos enquanto o usuário
+    aguarda são agrupados); obter() devolve os resultados se ainda valem para
+    os dados atuais do banco.
+    """
+
+    def __init__(self, db_path=DB_PATH, capacidade=CAPACIDADE):
+        self.db_path = db_path
+        self.capacidade = capacidade
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self._fila = queue.Queue()
+        self._pendentes = set()
+        self._thread = None
+        self.precargas = 0
+        self.acertos = 0
+        self.falhas = 0
+        self.erros = 0
+
+    def agendar(self, user_id):
+        """Pede a pré-carga dos resultados do usuário (não bloqueia)"""
+        with self._lock:
+            if user_id in self._pendentes:
+                return
+            self._pendentes.add(user_id)
+        self._iniciar()
+        self._fila.put(user_id)
+
+    def obter(self, cursor, user_id):
+        """
+        Returns:
+            ResultadosUsuario se a pré-carga corresponde aos dados atuais, senão None
+        """
+        with self._lock:
+            entrada = self._entradas.get(user_id)
+        if entrada is not None and entrada.impressao == impressao(cursor, user_id):
+            with self._lock:
+                self._entradas.move_to_end(user_id)
+                self.acertos += 1
+            return entrada
+        with self._lock:
+            self.falhas += 1
+        return None
+
+    def guardar(self, resultados):
+        with self._lock:
+            self._entradas[resultados.user_id] = resultados
+            self._entradas.move_to_end(resultados.user_id)
+            while len(self._entradas) > self.capacidade:
+                self._entradas.popitem(last=False)
+
+    def carregar(self, cursor, user_id):
+        """Resultados do cache ou, sem pré-carga válida, calculados agora"""
+        resultados = self.obter(cursor, user_id)
+        if resultados is None:
+            resultados = preparar(cursor, user_id)
+            self.guardar(resultados)
+        return resultados
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def estatisticas(self):
+        """
+        Returns:
+            dict: usuários em cache, pendentes, pré-cargas feitas, acertos, falhas e erros
+        """
+        with self._lock:
+            return {
+                'tamanho': len(self._entradas),
+                'pendentes': len(self._pendentes),
+                'precargas': self.precargas,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'erros': self.erros,
+            }
+
+    def _iniciar(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._executar, name="precarga-resultados", daemon=True
+                )
+                self._thread.start()
+
+    def _executar(self):
+        while True:
+            user_id = self._fila.get()
+            with self._lock:
+                self._pendentes.discard(user_id)
+            try:
+                conn = obter_conexao(self.db_path, somente_leitura=True)
+                try:
+                    self.guardar(preparar(conn.cursor(), user_id))
+                    self.precargas += 1
+                finally:
+                    conn.close()
+            except Exception:
+                # Qualquer erro (banco, cálculo, escritor) não pode encerrar a thread;
+                # a página de resultados calcula na hora
+                self.erros += 1
+                logger.exception("Erro na pré-carga dos resultados (user_id %s)", user_id)
+
+
+_precarga = PrecargaResultados()
+
+
+def agendar(user_id):
+    """Pede a pré-carga dos resultados do usuário na thread do processo"""
+    _precarga.agendar(user_id)
+
+
+# Resultados validados por carregar() na thread atual (execução da página)
+_validados = threading.local()
+
+
+def carregar(cursor, user_id):
+    """
+    Resultados do usuário pelo cache do processo (ver PrecargaResultados.carregar).
+    O resultado, já conferido com os dados atuais, fica disponível para
+    valores() na mesma thread.
+    """
+    resultados = _precarga.carregar(cursor, user_id)
+    _validados.resultados = resultados
+    return resultados
+
+
+def valores(user_id, tabela):
+    """
+    {name_element: value_element} da tabela nos resultados validados pelo
+    último carregar() desta thread, ou None (sem carregar() para o usuário,
+    quem chama consulta o banco).
+    """
+    resultados = getattr(_validados, 'resultados', None)
+    if resultados is None or resultados.user_id != user_id:
+        return None
+    return resultados.valores.get(tabela)
+
+
+def estatisticas():
+    return _precarga.estatisticas()
+
+
+def limpar():
+    _precarga.limpar()
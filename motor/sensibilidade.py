@@ -0,0 +1,165 @@
+# Arquivo: motor/sensibilidade.py
+# Data: 17/10/2026
+# Análise de sensibilidade por diferenciação automática (modo direto)
+# Cada célula é um número dual: valor + vetor de derivadas parciais em relação
+# a todas as células de entrada. As mesmas funções compiladas das fórmulas
+# (motor/formulas.py) são avaliadas uma única vez, na ordem topológica, com
+# números duais no lugar dos floats; ao final, cada célula de saída traz suas
+# derivadas em relação a todas as entradas (uma passada para todas).
+
+import numpy as np
+
+from motor.formulas import safe_div
+
+# Variação relativa padrão das entradas no gráfico de tornado (±10%)
+VARIACAO = 0.10
+
+
+class Dual:
+    """
+    Número dual com vetor de derivadas.
+
+    Atributos:
+        valor: float
+        derivada: np.ndarray com a derivada em relação a cada entrada
+    """
+
+    __slots__ = ('valor', 'derivada')
+
+    def __init__(self, valor, derivada):
+        self.valor = valor
+        self.derivada = derivada
+
+    def __add__(self, outro):
+        if isinstance(outro, Dual):
+            return Dual(self.valor + outro.valor, self.derivada + outro.derivada)
+        return Dual(self.valor + outro, self.derivada)
+
+    __radd__ = __add__
+
+    def __sub__(self, outro):
+        if isinstance(outro, Dual):
+            return Dual(self.valor - outro.valor, self.derivada - outro.derivada)
+        return Dual(self.valor - outro, self.derivada)
+
+    def __rsub__(self, outro):
+        return Dual(outro - self.valor, -self.derivada)
+
+    def __mul__(self, outro):
+        if isinstance(outro, Dual):
+            return Dual(
+                self.valor * outro.valor,
+                self.derivada * outro.valor + outro.derivada * self.valor,
+            )
+        return Dual(self.valor * outro, self.derivada * outro)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, outro):
+        if isinstance(outro, Dual):
+            return Dual(
+                self.valor / outro.valor,
+                (self.derivada * outro.valor - outro.derivada * self.valor) / outro.valor ** 2,
+            )
+        return Dual(self.valor / outro, self.derivada / outro)
+
+    def __rtruediv__(self, outro):
+        return Dual(outro / self.valor, -outro * self.derivada / self.valor ** 2)
+
+    def __neg__(self):
+        return Dual(-self.valor, -self.derivada)
+
+    def __pos__(self):
+        return self
+
+    def __float__(self):
+        return float(self.valor)
+
+
+def div_dual(x, y):
+    """safe_div para números duais: divisor com |y| < 1e-10 resulta em 0 (derivada 0)"""
+    divisor = y.valor if isinstance(y, Dual) else y
+    if abs(float(divisor)) < 1e-10:
+        dual = x if isinstance(x, Dual) else y
+        if not isinstance(dual, Dual):
+            return 0.0
+        return Dual(0.0, np.zeros_like(dual.derivada))
+    return x / y
+
+
+def entradas_numericas(template):
+    """Nomes das células input que não são calculadas, na ordem dos slots"""
+    return [
+        nome for slot, nome in enumerate(template.nomes)
+        if template.tipos[slot] == 'input' and slot not in template.dependencias
+    ]
+
+
+def derivadas(modelo, saidas, entradas=None):
+    """
+    Valores e derivadas parciais das células de saída em relação às
+    entradas, em uma única passada pelo grafo. O modelo não é alterado.
+
+    Args:
+        modelo: ModeloUsuario
+        saidas: nomes das células de saída
+        entradas: nomes das células de entrada (padrão: todas as input)
+
+    Returns:
+        tuple: (vetor de valores das saídas, matriz (saída, entrada) de derivadas)
+    """
+    template = modelo.template
+    if entradas is None:
+        entradas = entradas_numericas(template)
+
+    quantidade = len(entradas)
+    zero = np.zeros(quantidade)
+    v = [Dual(float(valor), zero) for valor in modelo.valores]
+    for i, nome in enumerate(entradas):
+        semente = np.zeros(quantidade)
+        semente[i] = 1.0
+        slot = template.indice[nome]
+        v[slot] = Dual(v[slot].valor, semente)
+
+    for slot in template.ordem:
+        formula = template.formulas.get(template.nomes[slot])
+        if formula is not None:
+            resultado = formula.avaliar(v, div_dual)
+            v[slot] = resultado if isinstance(resultado, Dual) else Dual(float(resultado), zero)
+        else:
+            # condicaoH e call_insumosH não dependem de entradas numéricas
+            resultado = modelo.calcular(slot)
+            if resultado is not None:
+                v[slot] = Dual(float(resultado), zero)
+
+    slots = [template.indice[nome] for nome in saidas]
+    valores = np.array([v[slot].valor for slot in slots])
+    matriz = np.array([v[slot].derivada for slot in slots]).reshape(len(slots), quantidade)
+    return valores, matriz
+
+
+def tornado(modelo, saida, entradas=None, variacao=VARIACAO, limite=10):
+    """
+    Efeito de uma variação de ±`variacao` (relativa) em cada entrada sobre uma
+    célula de saída, pela aproximação linear (derivada x variação).
+
+    Returns:
+        list: (entrada, saída com -variação, saída com +variação, elasticidade),
+            em ordem decrescente de efeito, com no máximo `limite` entradas
+            (entradas sem efeito são omitidas)
+    """
+    if entradas is None:
+        entradas = entradas_numericas(modelo.template)
+
+    valores, matriz = derivadas(modelo, [saida], entradas)
+    base = valores[0]
+    barras = []
+    for nome, derivada in zip(entradas, matriz[0]):
+        efeito = derivada * modelo.valor(nome) * variacao
+        if abs(efeito) <= 1e-12 * max(1.0, abs(base)):
+            continue
+        elasticidade = safe_div(derivada * modelo.valor(nome), base)
+        barras.append((nome, float(base - efeito), float(base + efeito), float(elasticidade)))
+
+    barras.sort(key=lambda barra: abs(barra[2] - barra[1]), reverse=True)
+    return barras[:limite]
@@ -0,0 +1,217 @@
+# Arquivo: motor/template.py
+# Data: 17/10/2026
+# Template de cálculo (forms_tab, user_id = 0) compilado uma única vez por processo
+# O cache é compartilhado entre sessões e só é refeito quando o template muda
+
+import hashlib
+import threading
+
+from banco import versoes
+from motor.formulas import compilar_formula
+from motor.grafo import ordem_topologica
+from motor.ocultas import compilar_condicao
+
+_lock = threading.Lock()
+_cache = {'versao': None, 'template': None}
+
+
+class Template:
+    """
+    Layout do template com as fórmulas compiladas.
+
+    Cada name_element do template recebe um slot (índice). Referências que não
+    existem no template (ex: Insumos!D15) recebem slots extras no final.
+    Depois da carga a tabela de slots fica congelada: os modelos são
+    dimensionados por len(template) e nenhuma fórmula pode indexar além dele.
+
+    As células calculadas (formula, condicaoH, call_insumosH) formam um grafo
+    de dependências; 'ordem' contém seus slots em ordem topológica.
+
+    Raises:
+        CicloDependenciaError: se o template tiver referência circular
+    """
+
+    def __init__(self, versao, linhas):
+        self.versao = versao
+        self.nomes = []       # slot -> name_element
+        self.indice = {}      # name_element -> slot
+        self.tipos = []       # slot -> type_element
+        self.formulas = {}    # name_element -> FormulaCompilada
+        self.condicoes = {}   # name_element -> (selectbox de referência, mapeamento compilado)
+        self.condicoes_por_ref = {}  # selectbox -> condicaoH que o referenciam (índice reverso)
+        self.insumos = {}     # name_element -> referência na forms_insumos (ex: Insumos!D15)
+        self.erros = {}       # name_element -> mensagem de erro de compilação
+        self._por_texto = {}  # math_element -> FormulaCompilada
+        self._lock = threading.Lock()
+        self._congelado = False
+
+        for name, type_elem, math_elem, select_elem, str_elem in linhas:
+            if name and name not in self.indice:
+                self._novo_slot(name, type_elem)
+
+        for name, type_elem, math_elem, select_elem, str_elem in linhas:
+            if not name:
+                continue
+            if type_elem == 'formula':
+                try:
+                    self.formulas[name] = self.compilar(math_elem)
+                except ValueError as e:
+                    self.erros[name] = str(e)
+            elif type_elem == 'condicaoH' and math_elem and select_elem:
+                ref = math_elem.strip()
+                self.condicoes[name] = (ref, compilar_condicao(select_elem))
+                self.condicoes_por_ref.setdefault(ref, []).append(name)
+            elif type_elem == 'call_insumosH' and str_elem:
+                self.insumos[name] = str_elem.strip()
+
+        self.dependencias = self._montar_dependencias()
+        self.ordem = ordem_topologica(self.dependencias, nomes=lambda slot: self.nomes[slot])
+        self.posicao = {slot: pos for pos, slot in enumerate(self.ordem)}
+
+        # Grafo reverso: slot -> slots calculados que o referenciam
+        self.dependentes = {}
+        for slot, refs in self.dependencias.items():
+            for ref in set(refs):
+                self.dependentes.setdefault(ref, []).append(slot)
+        self._afetados = {}
+        self._congelado = True
+
+    def _montar_dependencias(self):
+        """Monta o grafo: slot calculado -> slots referenciados"""
+        dependencias = {}
+        for slot, name in enumerate(list(self.nomes)):
+            if name in self.formulas:
+                dependencias[slot] = self.formulas[name].slots
+            elif name in self.condicoes:
+                dependencias[slot] = (self.slot(self.condicoes[name][0]),)
+            elif name in self.insumos:
+                dependencias[slot] = (self.slot(self.insumos[name]),)
+        return dependencias
+
+    def afetados(self, slots):
+        """
+        Retorna os slots calculados a jusante dos slots informados,
+        na ordem topológica (ordem em que devem ser recalculados).
+        """
+        resultado = set()
+        for slot in slots:
+            cache = self._afetados.get(slot)
+            if cache is None:
+                visitados = set()
+                pilha = [slot]
+                while pilha:
+                    for dep in self.dependentes.get(pilha.pop(), ()):
+                        if dep not in visitados:
+                            visitados.add(dep)
+                            pilha.append(dep)
+                cache = self._afetados[slot] = frozenset(visitados)
+            resultado |= cache
+        return sorted(resultado, key=self.posicao.__getitem__)
+
+    def _novo_slot(self, name, type_elem=None):
+        self.indice[name] = len(self.nomes)
+        self.nomes.append(name)
+        self.tipos.append(type_elem)
+        return self.indice[name]
+
+    def slot(self, name):
+        """
+        Retorna o slot de uma célula, criando um slot extra se necessário
+        (apenas durante a carga do template).
+
+        Raises:
+            ValueError: referência fora do template depois da carga
+        """
+        slot = self.indice.get(name)
+        if slot is None:
+            if self._congelado:
+                raise ValueError(f"Referência fora do template: '{name}'")
+            slot = self._novo_slot(name)
+        return slot
+
+    def tipo(self, name):
+        """type_element de uma célula (None para referências fora do template)"""
+        slot = self.indice.get(name)
+        return None if slot is None else self.tipos[slot]
+
+    def compilar(self, texto):
+        """
+        Retorna a fórmula compilada para um math_element.
+        Textos fora do template (fórmulas alteradas por usuário) também
+        são compilados uma única vez e guardados junto ao template, desde que
+        só referenciem células com slot.
+
+        Raises:
+            ValueError: expressão inválida ou referência fora do template
+        """
+        texto = str(texto or '').strip()
+        compilada = self._por_texto.get(texto)
+        if compilada is None:
+            with self._lock:
+                compilada = self._por_texto.get(texto)
+                if compilada is None:
+                    compilada = compilar_formula(texto, self.slot, self.tipo)
+                    self._por_texto[texto] = compilada
+        return compilada
+
+    def __len__(self):
+        return len(self.nomes)
+
+
+def linhas_template(cursor):
+    """Linhas do template que afetam o cálculo"""
+    cursor.execute("""
+        SELECT ID_element, name_element, type_element, math_element,
+               CASE WHEN type_element = 'condicaoH' THEN select_element END,
+               CASE WHEN type_element = 'call_insumosH' THEN str_element END
+        FROM forms_tab
+        WHERE user_id = 0
+        ORDER BY ID_element
+    """)
+    return cursor.fetchall()
+
+
+def versao_template(cursor):
+    """
+    Versão do template: a marca da chave 'template' (banco/versoes.py) ou,
+    antes da migração 6, a impressão digital (hash) das linhas do template.
+
+    Returns:
+        tuple: (versão, linhas); linhas é None quando a versão vem da marca
+    """
+    marca = versoes.marca(cursor, 'template')
+    if marca is not None:
+        return marca, None
+    linhas = linhas_template(cursor)
+    return hashlib.sha1(repr(linhas).encode('utf-8')).hexdigest(), linhas
+
+
+def carregar_template(cursor):
+    """
+    Retorna o Template compilado, reaproveitando o cache do processo
+    enquanto a versão do template não mudar (uma leitura da marca, sem
+    reler as linhas).
+
+    Raises:
+        CicloDependenciaError: se o template tiver referência circular
+    """
+    versao, linhas = versao_template(cursor)
+
+    template = _cache['template']
+    if template is not None and _cache['versao'] == versao:
+        return template
+
+    with _lock:
+        if _cache['template'] is None or _cache['versao'] != versao:
+            if linhas is None:
+                linhas = linhas_template(cursor)
+            _cache['template'] = Template(versao, [linha[1:] for linha in linhas])
+            _cache['versao'] = versao
+        return _cache['template']
+
+
+def limpar_cache():
+    """Descarta o template compilado (ex: após importação via create_forms.py)"""
+    with _lock:
+        _cache['versao'] = None
+        _cache['template'] = None
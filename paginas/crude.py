@@ -12,6 +12,11 @@ from pathlib import Path
 from typing import List, Any, Dict, Tuple
 
 from config import DB_PATH  # Adicione esta importação
+from banco.conexao import checkpoint, conexao
+from banco import escrita
+from banco import valores as valores_usuario
+from motor.grafo import CicloDependenciaError
+from paginas.form_model_recalc import atualizar_formulas_lote
 
 # Constantes
 COLUMN_WIDTHS = {
@@ -190,22 +195,23 @@ def show_download_calcpc_button():
     # Confirmação antes do download
     if st.button("📥 Download calcpc.db", help="Clique para baixar o arquivo calcpc.db"):
         try:
+            # CORREÇÃO 2: Registrar download no log (AUDITORIA) - escritor único
+            registro = (
+                st.session_state.get("user_id"),
+                datetime.now().strftime("%Y-%m-%d"),
+                datetime.now().strftime("%H:%M:%S"),
+                "CRUD",
+                "DOWNLOAD_DB"
+            )
+            escrita.executar(lambda escritor: escritor.execute("""
+                INSERT INTO log_acessos (user_id, data_acesso, hora_acesso, programa, acao)
+                VALUES (?, ?, ?, ?, ?)
+            """, registro))
+
+            # Modo WAL: grava o conteúdo do -wal no calcpc.db antes de ler o arquivo
+            checkpoint()
+
             with open(calcpc_path, "rb") as file:
-                # CORREÇÃO 2: Registrar download no log (AUDITORIA)
-                conn = sqlite3.connect(DB_PATH)
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO log_acessos (user_id, data_acesso, hora_acesso, programa, acao)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (
-                    st.session_state.get("user_id"),
-                    datetime.now().strftime("%Y-%m-%d"),
-                    datetime.now().strftime("%H:%M:%S"),
-                    "CRUD",
-                    "DOWNLOAD_DB"
-                ))
-                conn.commit()
-                conn.close()
                 
                 st.download_button(
                     label="✅ Confirmar Download",
@@ -282,8 +288,9 @@ def get_forms_tab_data(cursor):
     )
     sort_order = st.selectbox("Ordem", ["ASC", "DESC"], index=0)
     
+    # Com filtro, mostra a visão do usuário (template + valores_usuario)
     query = f"""
-        SELECT * FROM forms_tab
+        SELECT * FROM {"forms_tab_usuario" if user_id_filter > 0 else "forms_tab"}
         {f"WHERE user_id = {user_id_filter}" if user_id_filter > 0 else ""}
         ORDER BY {sort_column} {sort_order}
     """
@@ -394,13 +401,26 @@ def validate_forms_tab_duplicates(edited_df):
     return True
 
 def insert_new_records(cursor, selected_table, edited_df, df, columns):
-    """Insere novos registros na tabela."""
+    """
+    Insere novos registros na tabela.
+
+    Returns:
+        list: mensagens dos registros não inseridos
+    """
+    avisos = []
     if len(edited_df) > len(df):
         new_records = edited_df.iloc[len(df):]
         for _, row in new_records.iterrows():
+            # As visões {tabela}_usuario só leem as linhas do template (user_id = 0)
+            if selected_table in valores_usuario.TABELAS_USUARIO and (
+                pd.isnull(row['user_id']) or int(row['user_id']) != 0
+            ):
+                avisos.append(f"⚠️ Não é possível adicionar '{row['name_element']}': novas linhas de "
+                              f"{selected_table} são do template (user_id = 0); os valores dos "
+                              f"usuários são gravados pela edição das linhas do usuário")
+                continue
+
             if selected_table == 'forms_tab':
-                st.write(f"Tentando inserir ID_element: {row['ID_element']}")
-                
                 cursor.execute("""
                     SELECT ID_element, rowid 
                     FROM forms_tab 
@@ -409,7 +429,7 @@ def insert_new_records(cursor, selected_table, edited_df, df, columns):
                 existing = cursor.fetchone()
                 
                 if existing:
-                    st.error(f"⚠️ Não é possível adicionar: O ID_element '{row['ID_element']}' já existe na linha {existing[1]}")
+                    avisos.append(f"⚠️ Não é possível adicionar: O ID_element '{row['ID_element']}' já existe na linha {existing[1]}")
                     continue
 
             row_values = [row[col] for col in columns]
@@ -418,10 +438,63 @@ def insert_new_records(cursor, selected_table, edited_df, df, columns):
             VALUES ({', '.join(['?' for _ in columns])})
             """
             cursor.execute(insert_query, tuple(row_values))
+    return avisos
+
+def _mesmo_valor(a, b):
+    """Compara dois valores do DataFrame (nulos são iguais entre si)"""
+    if pd.isnull(a) or pd.isnull(b):
+        return pd.isnull(a) and pd.isnull(b)
+    try:
+        return float(a) == float(b)
+    except (TypeError, ValueError):
+        return str(a) == str(b)
+
+def gravar_valor_usuario(cursor, row, original):
+    """
+    Grava na valores_usuario a célula de uma linha de usuário da forms_tab,
+    só se o valor mudou em relação ao DataFrame original (copy-on-write).
+    O str_element só é gravado nos tipos preenchidos pelo usuário
+    (TIPOS_TEXTO); nos demais é estilo do template. Uma célula que volta
+    ao padrão do template tem a linha removida.
+    """
+    texto = row['type_element'] in valores_usuario.TIPOS_TEXTO
+    if _mesmo_valor(row['value_element'], original['value_element']) and (
+        not texto or _mesmo_valor(row['str_element'], original['str_element'])
+    ):
+        return
+
+    user_id, name = int(row['user_id']), row['name_element']
+    cursor.execute("""
+        SELECT value_element, str_element
+        FROM forms_tab
+        WHERE user_id = 0 AND name_element = ?
+        ORDER BY ID_element DESC LIMIT 1
+    """, (name,))
+    padrao = cursor.fetchone()
+    if padrao is not None and _mesmo_valor(row['value_element'], padrao[0]) and (
+        not texto or _mesmo_valor(row['str_element'], padrao[1])
+    ):
+        valores_usuario.remover(cursor, 'forms_tab', user_id, [name])
+        return
+
+    str_value = row['str_element'] if texto and not pd.isnull(row['str_element']) else None
+    value = None if pd.isnull(row['value_element']) else row['value_element']
+    valores_usuario.gravar(cursor, 'forms_tab', user_id, [(name, value, str_value)])
 
 def update_existing_records(cursor, selected_table, edited_df, df, columns):
-    """Atualiza registros existentes na tabela."""
-    for index, row in edited_df.iloc[:len(df)].iterrows():
+    """
+    Atualiza registros existentes na tabela.
+
+    Returns:
+        list: mensagens dos registros não atualizados
+    """
+    avisos = []
+    for posicao, (index, row) in enumerate(edited_df.iloc[:len(df)].iterrows()):
+        if selected_table == 'forms_tab' and row['user_id'] != 0:
+            # Linha de usuário (visão forms_tab_usuario): grava apenas o valor alterado
+            gravar_valor_usuario(cursor, row, df.iloc[posicao])
+            continue
+
         if selected_table == 'forms_tab':
             cursor.execute("""
                 SELECT ID_element, rowid 
@@ -438,7 +511,7 @@ def update_existing_records(cursor, selected_table, edited_df, df, columns):
             
             existing = cursor.fetchone()
             if existing:
-                st.error(f"⚠️ Não é possível atualizar: O ID_element '{row['ID_element']}' já está sendo usado em outro registro com o mesmo user_id")
+                avisos.append(f"⚠️ Não é possível atualizar: O ID_element '{row['ID_element']}' já está sendo usado em outro registro com o mesmo user_id")
                 continue
 
         if selected_table == 'forms_tab':
@@ -457,18 +530,32 @@ def update_existing_records(cursor, selected_table, edited_df, df, columns):
             values = tuple(row)
             
         cursor.execute(update_query, values)
+    return avisos
+
+def gravar_alteracoes(cursor, selected_table, edited_df, df, columns):
+    """
+    Insere os registros novos e atualiza os existentes em uma transação.
+    Executada pelo escritor único (banco/escrita.py): commit ao final,
+    rollback se houver erro.
 
-def save_changes(cursor, selected_table, edited_df, df, columns):
+    Returns:
+        list: mensagens dos registros não gravados
+    """
+    avisos = insert_new_records(cursor, selected_table, edited_df, df, columns)
+    return avisos + update_existing_records(cursor, selected_table, edited_df, df, columns)
+
+def save_changes(selected_table, edited_df, df, columns):
     """Salva as alterações na tabela."""
     try:
         if selected_table == 'forms_tab' and not validate_forms_tab_duplicates(edited_df):
             return
 
-        insert_new_records(cursor, selected_table, edited_df, df, columns)
-        update_existing_records(cursor, selected_table, edited_df, df, columns)
-        
-        # Commit das alterações no banco de dados
-        cursor.connection.commit()
+        # Gravação pelo escritor único (a página usa apenas uma conexão de leitura)
+        avisos = escrita.executar(gravar_alteracoes, selected_table, edited_df, df, columns)
+        for aviso in avisos:
+            st.error(aviso)
+        if avisos:
+            return
         
         st.success("Alterações salvas com sucesso!")
         st.rerun()
@@ -476,6 +563,20 @@ def save_changes(cursor, selected_table, edited_df, df, columns):
     except Exception as e:
         st.error(f"Erro ao salvar alterações: {str(e)}")
 
+def recalcular_usuarios(cursor):
+    """
+    Recalcula as células calculadas de todos os usuários com o template e
+    os insumos atuais (cálculo em lote, NumPy), após alterações no template.
+    """
+    try:
+        with st.spinner("Recalculando os usuários..."):
+            gravadas = atualizar_formulas_lote(cursor)
+        st.success(f"Usuários recalculados: {gravadas} células atualizadas.")
+    except CicloDependenciaError as e:
+        st.error(f"Erro no template de cálculo: {str(e)}")
+    except Exception as e:
+        st.error(f"Erro ao recalcular os usuários: {str(e)}")
+
 def export_table_data(edited_df, selected_table):
     """Exporta dados da tabela para arquivo TXT."""
     if not edited_df.empty:
@@ -545,7 +646,12 @@ def process_table_data(cursor, selected_table):
     
     # Botão para salvar alterações
     if st.button("Salvar Alterações"):
-        save_changes(cursor, selected_table, edited_df, df, columns)
+        save_changes(selected_table, edited_df, df, columns)
+    
+    # Fórmulas ou insumos alterados: valores calculados gravados dos usuários
+    if selected_table in ("forms_tab", "forms_insumos"):
+        if st.button("Recalcular Usuários", help="Recalcula as células calculadas de todos os usuários"):
+            recalcular_usuarios(cursor)
     
     # Botão de exportação
     export_table_data(edited_df, selected_table)
@@ -564,13 +670,11 @@ def show_crud():
     selected_table = show_table_selector()
     
     if selected_table:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        try:
-            process_table_data(cursor, selected_table)
-        except Exception as e:
-            st.error(f"Erro ao processar dados: {str(e)}")
-        finally:
-            conn.close()
+        with conexao(somente_leitura=True) as conn:
+            cursor = conn.cursor()
+            
+            try:
+                process_table_data(cursor, selected_table)
+            except Exception as e:
+                st.error(f"Erro ao processar dados: {str(e)}")
 
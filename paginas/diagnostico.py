@@ -12,6 +12,9 @@ import platform
 from datetime import datetime
 import psutil
 
+from banco import escrita
+from motor import memoria, precarga
+
 def show_diagnostics():
     """Página de diagnóstico do sistema"""
     
@@ -39,6 +42,50 @@ def show_diagnostics():
             st.write(f"Memory Usage: {psutil.Process().memory_info().rss / 1024 / 1024:.2f} MB")
             st.write(f"Disk Usage: {psutil.disk_usage('/').percent}%")
     
+    # Fila de escrita do banco (escritor único)
+    with st.expander("Banco de Dados - Fila de Escrita", expanded=True):
+        metricas = escrita.metricas()
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            st.metric("Fila (atual / máx.)", f"{metricas['profundidade']} / {metricas['profundidade_max']}")
+            st.metric("Gravações", metricas['tarefas'])
+        with col2:
+            st.metric("Espera média", f"{metricas['espera_media_ms']:.1f} ms")
+            st.metric("Espera máxima", f"{metricas['espera_max_ms']:.1f} ms")
+        with col3:
+            st.metric("Execução média", f"{metricas['execucao_media_ms']:.1f} ms")
+            st.metric("Erros", metricas['erros'])
+    
+    # Cache de resultados do motor de cálculo
+    with st.expander("Motor de Cálculo - Cache de Resultados", expanded=True):
+        cache = memoria.estatisticas()
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            st.metric("Acertos", cache['acertos'])
+            st.metric("Falhas", cache['falhas'])
+        with col2:
+            st.metric("Taxa de acerto", f"{cache['taxa_acerto']:.1f}%")
+            st.metric("Descartes (LRU)", cache['descartes'])
+        with col3:
+            st.metric("Entradas (atual / máx.)", f"{cache['tamanho']} / {cache['capacidade']}")
+    
+    # Pré-carga dos resultados em segundo plano
+    with st.expander("Pré-carga dos Resultados", expanded=True):
+        carga = precarga.estatisticas()
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            st.metric("Acertos", carga['acertos'])
+            st.metric("Falhas", carga['falhas'])
+        with col2:
+            st.metric("Pré-cargas", carga['precargas'])
+            st.metric("Erros", carga['erros'])
+        with col3:
+            st.metric("Usuários em cache", carga['tamanho'])
+            st.metric("Pendentes", carga['pendentes'])
+    
     # Warnings e Logs
     with st.expander("Warnings e Logs", expanded=True):
         # Inicializar warning_logs na session_state se não existir
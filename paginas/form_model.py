@@ -1,15 +1,19 @@
 # Arquivo: form_model.py
 # 16/08/2025 - 18:00 
-# Fatoração: titulo(), formula()
+# Fatoração: titulo()
 
 import sqlite3
 import streamlit as st
-import pandas as pd
 import re
 # import logging
 
-from config import DB_PATH
+from banco.conexao import obter_conexao
+from banco import escrita
+from banco.valores import visao
 from paginas.monitor import registrar_acesso  # Ajustado para incluir o caminho completo
+from motor.template import carregar_template
+from motor import precarga
+from motor.modelo import ModeloUsuario, data_para_dias
 
 MAX_COLUMNS = 5  # Número máximo de colunas no layout
 
@@ -19,58 +23,22 @@ def date_to_days(date_str):
     Converte uma data no formato dd/mm/aaaa para número de dias desde 01/01/1900
     """
     try:
-        if not date_str:
-            return 0
-            
-        dia, mes, ano = map(int, date_str.split('/'))
-        
-        # Validação básica da data
-        if not (1900 <= ano <= 2100 and 1 <= mes <= 12 and 1 <= dia <= 31):
-            return 0
-            
-        # Cálculo dos dias
-        # Anos completos desde 1900
-        days = (ano - 1900) * 365
-        
-        # Adiciona dias dos anos bissextos
-        leap_years = sum(1 for y in range(1900, ano) if (y % 4 == 0 and y % 100 != 0) or (y % 400 == 0))
-        days += leap_years
-        
-        # Dias dos meses completos no ano atual
-        days_in_month = [0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
-        if (ano % 4 == 0 and ano % 100 != 0) or (ano % 400 == 0):
-            days_in_month[2] = 29
-            
-        days += sum(days_in_month[1:mes])
-        
-        # Adiciona dias do mês atual
-        days += dia - 1
-        
-        return days
+        return data_para_dias(date_str)
     except Exception as e:
         st.error(f"Erro na conversão de data: {str(e)}")
         return 0
 
-def get_element_value(cursor, name_element, element=None):
-    """Busca o valor de um elemento na tabela forms_tab."""
-    cursor.execute("""
-        SELECT value_element 
-        FROM forms_tab 
-        WHERE name_element = ? AND user_id = ?
-    """, (name_element, st.session_state.user_id))
-    result = cursor.fetchone()
-    if result and result[0] is not None:
-        return float(result[0])  # Valor já está como REAL no banco
-    return 0.0
-
-def calculate_formula(formula, values, cursor):
+def calculate_formula(formula, values, cursor, template, modelo):
     """
     Calcula o resultado de uma fórmula com suporte a operações matemáticas e datas.
-    
+
     Args:
         formula: A fórmula a ser calculada (pode ser número, string ou expressão)
         values: Dicionário com valores das células
         cursor: Cursor do banco de dados
+        template: Template compilado
+        modelo: ModeloUsuario carregado; as referências são resolvidas em
+            memória, sem consultas ao banco
     
     Returns:
         float: O resultado do cálculo, formatado segundo as seguintes regras:
@@ -94,75 +62,15 @@ def calculate_formula(formula, values, cursor):
         # Processa referências de diferentes abas
         processed_formula = str(formula)
         
-        # Verifica se é uma fórmula de data (mantém lógica existente)
-        if re.match(r'^\s*[A-Z][0-9]+\s*-\s*[A-Z][0-9]+\s*$', processed_formula):
-            # Extrai as duas referências
-            refs = re.findall(r'[A-Z][0-9]+', processed_formula)
-            if len(refs) == 2:
-                # Inverte a ordem das referências para garantir data_final - data_inicial
-                data_final = refs[0]  # B2
-                data_inicial = refs[1]  # A2
-                
-                # Busca as datas no banco
-                cursor.execute("""
-                    SELECT str_element 
-                    FROM forms_tab 
-                    WHERE name_element = ? AND user_id = ?
-                """, (data_final, st.session_state.user_id))
-                result = cursor.fetchone()
-                data_final_str = result[0] if result and result[0] else None
-                
-                cursor.execute("""
-                    SELECT str_element 
-                    FROM forms_tab 
-                    WHERE name_element = ? AND user_id = ?
-                """, (data_inicial, st.session_state.user_id))
-                result = cursor.fetchone()
-                data_inicial_str = result[0] if result and result[0] else None
-                
-                # Converte as datas para dias
-                dias_final = date_to_days(data_final_str)
-                dias_inicial = date_to_days(data_inicial_str)
-                
-                # Calcula a diferença em dias
-                diff_dias = dias_final - dias_inicial
-                
-                # Converte para meses (usando média mais precisa de dias por mês)
-                meses = diff_dias / 30.44
-                
-                return max(0, meses)  # Garante que não retorne valor negativo
-        
-        # Processa referências na fórmula
-        cell_refs = re.findall(r'(?:Insumos!)?[A-Z]{1,2}[0-9]+', processed_formula)
-        
-        for ref in cell_refs:
-            float_value = get_element_value(
-                cursor, 
-                ref, 
-                st.session_state.user_id if not ref.startswith('Insumos!') else None
-            )
-            processed_formula = re.sub(r'\b' + re.escape(ref) + r'\b', str(float_value), processed_formula)
-        
-        # Substitui vírgulas por pontos antes do eval
-        processed_formula = processed_formula.replace(',', '.')
-        
-        # Verifica divisão por zero antes do eval
-        # Primeiro, avalia a expressão para obter os denominadores
-        def safe_div(x, y):
-            if abs(float(y)) < 1e-10:  # Considera valores muito próximos de zero
-                return 0.0
-            return x / y
-        
-        # Cria um ambiente seguro para eval com a função de divisão segura
-        safe_env = {
-            'safe_div': safe_div,
-            '__builtins__': None
-        }
-        
-        # Substitui todas as divisões pela função segura
-        processed_formula = re.sub(r'(\d+\.?\d*|\([^)]+\))\s*/\s*(\d+\.?\d*|\([^)]+\))', r'safe_div(\1, \2)', processed_formula)
-        
-        result = float(eval(processed_formula, safe_env, {}))
+        # Fórmula compilada uma única vez (cache do processo, por versão do template);
+        # a diferença entre datas (input_data) resulta em meses, como no recálculo
+        compilada = template.compilar(processed_formula)
+
+        # Busca apenas os valores das referências, indexados pelo slot
+        valores = {slot: modelo.valor(ref) for ref, slot in zip(compilada.refs, compilada.slots)}
+
+        # Todas as divisões usam safe_div (divisor ~0 retorna 0.0)
+        result = float(compilada.avaliar(valores))
         
         # Retorna o valor original do cálculo (sem formatação)
         # A formatação será feita apenas na exibição, não no armazenamento
@@ -177,90 +85,6 @@ def calculate_formula(formula, values, cursor):
         st.error(f"Erro no cálculo da fórmula: {str(e)}")
         return 0.0
 
-def condicaoH(cursor, element, conn):
-    """
-    Atualiza o value_element baseado em um valor de referência e mapeamento.
-    """
-    # print(f"\nCondicaoH chamada para elemento: {element[0]}")  # Debug
-    
-    try:
-        # Extrai informações da linha atual
-        name_element = element[1]  # D151, D152, etc
-        math_ref = element[3]      # D15 (vem da coluna math_element)
-        select_options = element[6] # String com mapeamento (vem da coluna str_element)
-        
-        # print(f"  math_ref: {math_ref}")  # Debug
-        # print(f"  select_options: {select_options}")  # Debug
-        
-        # 1. Validações iniciais
-        if not all([name_element, math_ref, select_options]):
-            # print("  Erro: dados incompletos")  # Debug
-            return False
-            
-        # 2. Busca str_element da referência
-        cursor.execute("""
-            SELECT str_element 
-            FROM forms_tab 
-            WHERE name_element = ? AND user_id = ?
-        """, (math_ref, st.session_state.user_id))
-        
-        result = cursor.fetchone()
-        if not result or result[0] is None:
-            # print("  Erro: str_element não encontrado")  # Debug
-            return False
-            
-        str_ref = result[0].strip()  # Remove espaços extras
-        # print(f"  str_ref encontrado: {str_ref}")  # Debug
-        
-        # 3. Processa mapeamento do select_options
-        try:
-            # Remove aspas duplas do início e fim do select_options
-            select_options = select_options.strip('"')
-            
-            # Divide os pares de valores
-            mapeamento = {}
-            for par in select_options.split('|'):
-                if ':' in par:
-                    chave, valor = par.split(':')
-                    chave = chave.strip()  # Remove espaços extras da chave
-                    valor = valor.strip()  # Remove espaços extras do valor
-                    mapeamento[chave] = float(valor)
-            
-            # print(f"  Mapeamento: {mapeamento}")  # Debug
-            
-            # Busca valor correspondente
-            if str_ref in mapeamento:
-                valor_encontrado = mapeamento[str_ref]
-                # print(f"  Valor encontrado: {valor_encontrado}")  # Debug
-                
-                # 4. Atualiza o banco
-                cursor.execute("""
-                    UPDATE forms_tab 
-                    SET value_element = ?
-                    WHERE name_element = ? AND user_id = ?
-                """, (valor_encontrado, name_element, st.session_state.user_id))
-                
-                conn.commit()
-                return True
-            
-            # print(f"  Erro: str_ref '{str_ref}' não encontrado no mapeamento")  # Debug
-            return False
-            
-        except ValueError:
-            # print("  Erro: ValueError ao processar valores")  # Debug
-            return False
-            
-        except sqlite3.Error:
-            # print("  Erro: Erro no banco de dados")  # Debug
-            conn.rollback()
-            return False
-        
-    except Exception as e:
-        # print(f"  Erro inesperado: {str(e)}")  # Debug
-        if 'conn' in locals():
-            conn.rollback()
-        return False
-
 def titulo(cursor, element):
     """
     Exibe títulos formatados na interface com base nos valores do banco de dados.
@@ -296,37 +120,487 @@ def titulo(cursor, element):
     except Exception as e:
         st.error(f"Erro ao processar título: {str(e)}")
 
-def new_user(cursor, user_id):
+def chave_widget(prefixo, element):
+    """Chave do widget no session_state (a mesma usada na renderização)"""
+    return f"{prefixo}_{element[0]}_{element[8]}_{element[7] - 1}"
+
+def data_valida(texto):
+    """Verifica se o texto é uma data válida no formato dd/mm/aaaa"""
+    if not texto or not re.match(r'^\d{2}/\d{2}/\d{4}$', texto):
+        return False
+    dia, mes, ano = map(int, texto.split('/'))
+    return not (mes < 1 or mes > 12 or dia < 1 or dia > 31 or
+                ano < 1900 or ano > 2100 or
+                (mes in [4, 6, 9, 11] and dia > 30) or
+                (mes == 2 and dia > 29))
+
+def calcular_secao(cursor, modelo, template, elements, section, log_key):
     """
-    Inicializa registros para um novo usuário copiando dados do user_id 0.
+    Fase de cálculo da renderização de uma seção.
+    
+    Os valores digitados/selecionados já estão no session_state antes de os
+    widgets serem desenhados; eles são aplicados ao modelo em memória, as
+    alterações são propagadas e as células da seção são calculadas.
+    Nada é gravado aqui: a gravação é feita depois, em uma única transação.
+    
+    Args:
+        cursor: Cursor do banco de dados
+        modelo: ModeloUsuario carregado
+        template: Template compilado
+        elements: linhas da seção (mesma ordem da renderização)
+        section: nome da seção (para o log de acesso)
+        log_key: flag do session_state que controla o log de alteração
+    
+    Returns:
+        dict: name_element -> valor calculado (formula e call_insumos)
     """
+    # 1. Alterações pendentes dos widgets
+    alterados = []
+    for element in elements:
+        name, type_elem = element[0], element[1]
+        
+        if type_elem == 'selectbox':
+            selected = st.session_state.get(chave_widget('select', element))
+            if selected is not None and selected != modelo.texto(name):
+                # condicaoH dependentes resolvidos em memória (gravados no salvar da seção)
+                alterados.extend(modelo.selecionar(name, selected))
+        
+        elif type_elem == 'input':
+            input_value = st.session_state.get(chave_widget('input', element))
+            if input_value is None:
+                continue
+            try:
+                # Remove pontos de milhar e converte vírgula para ponto
+                numeric_value = float(input_value.strip().replace('.', '').replace(',', '.'))
+            except ValueError:
+                continue  # o erro é exibido junto ao campo, na renderização
+            
+            if abs(numeric_value - modelo.valor(name)) > 1e-10:
+                # Registra log apenas uma vez por seção
+                if not st.session_state[log_key]:
+                    registrar_acesso(
+                        st.session_state.user_id,
+                        f"forms_{section}",
+                        f"Alteração em formulário de {section}"
+                    )
+                    st.session_state[log_key] = True
+                modelo.definir(name, numeric_value)
+                alterados.append(name)
+        
+        elif type_elem == 'input_data':
+            input_value = st.session_state.get(chave_widget('input_data', element))
+            if data_valida(input_value) and input_value != (modelo.texto(name) or ''):
+                modelo.definir(name, date_to_days(input_value), texto=input_value)
+                alterados.append(name)
+    
+    # 2. Recálculo incremental, em memória, a jusante dos widgets alterados
+    modelo.propagar(alterados)
+    
+    # 3. Células da seção: ocultas, fórmulas e referências à forms_insumos
+    resultados = {}
+    mudaram = []
+    for element in elements:
+        name, type_elem = element[0], element[1]
+        
+        if type_elem in ('condicaoH', 'call_insumosH'):
+            if modelo.atualizar(name):
+                mudaram.append(name)
+        
+        elif type_elem == 'formula':
+            result = calculate_formula(element[2], st.session_state.form_values, cursor, template, modelo)
+            resultados[name] = result
+            if modelo.definir(name, result):
+                mudaram.append(name)
+        
+        elif type_elem == 'call_insumos':
+            referencia = (element[6] or '').strip()
+            result = modelo.insumos.get(referencia)
+            if result is None:
+                invalido = getattr(modelo.insumos, 'invalidos', {}).get(referencia)
+                if invalido:
+                    st.error(f"{invalido} para a referência '{referencia}'")
+                elif referencia:
+                    st.warning(f"Referência '{referencia}' não encontrada em forms_insumos")
+                result = 0.0
+            resultados[name] = result
+            if modelo.definir(name, result):
+                mudaram.append(name)
+    
+    modelo.propagar(mudaram)
+    return resultados
+
+def chave_modelo(section):
+    """Chave do ModeloUsuario da seção no session_state (usado pelos fragmentos)"""
+    return f"modelo_formulario_{section}"
+
+def blocos_secao(template, elements):
+    """
+    Divide as linhas da seção em blocos, um fragmento por bloco.
+    
+    Cada linha com título inicia um bloco. Se uma entrada de um bloco altera
+    uma fórmula exibida em outro, os blocos entre os dois são reunidos (um
+    fragmento ocupa uma área contínua da página): assim a reexecução do
+    fragmento do widget atualiza todas as exibições que dependem dele.
+    
+    Args:
+        template: Template compilado
+        elements: linhas da seção ordenadas por e_row, e_col
+    
+    Returns:
+        list: blocos; cada bloco é uma lista de linhas (elementos de mesmo e_row)
+    """
+    linhas = {}
+    for element in elements:
+        linhas.setdefault(element[8], []).append(element)
+    
+    blocos = []
+    for e_row in sorted(linhas):
+        if not blocos or any(element[1] == 'titulo' for element in linhas[e_row]):
+            blocos.append([])
+        blocos[-1].append(linhas[e_row])
+    
+    # Bloco em que cada célula calculada é exibida (fórmulas só com str_element)
+    exibidas = {}
+    for i, bloco in enumerate(blocos):
+        for linha in bloco:
+            for element in linha:
+                slot = template.indice.get(element[0])
+                if slot is None:
+                    continue
+                if element[1] == 'call_insumos' or (element[1] == 'formula' and (element[6] or '').strip()):
+                    exibidas[slot] = i
+    
+    # ate[i]: último bloco que precisa ser reexecutado junto com o bloco i
+    ate = list(range(len(blocos)))
+    for i, bloco in enumerate(blocos):
+        entradas = set()
+        for linha in bloco:
+            for element in linha:
+                slot = template.indice.get(element[0])
+                if element[1] not in ('input', 'selectbox', 'input_data') or slot is None:
+                    continue
+                entradas.add(slot)
+                # selectbox: condicaoH que o referenciam (resolvidos em modelo.selecionar)
+                for condicao in template.condicoes_por_ref.get(element[0], ()):
+                    entradas.add(template.indice[condicao])
+        for slot in template.afetados(entradas):
+            j = exibidas.get(slot, i)
+            inicio, fim = min(i, j), max(i, j)
+            ate[inicio] = max(ate[inicio], fim)
+    
+    agrupados = []
+    inicio = 0
+    while inicio < len(blocos):
+        fim = ate[inicio]
+        atual = inicio
+        while atual <= fim:
+            fim = max(fim, ate[atual])
+            atual += 1
+        agrupados.append([linha for bloco in blocos[inicio:atual] for linha in bloco])
+        inicio = atual
+    return agrupados
+
+@st.fragment
+def bloco_formulario(section, max_cols, bloco, log_key):
+    """
+    Fragmento com um bloco de linhas da seção. Uma edição em um widget do
+    bloco reexecuta apenas esta função, e não o main.py inteiro (CSS, logo,
+    autenticação, menu e as demais linhas da seção).
+    
+    O modelo do usuário é o da última execução completa da página
+    (session_state), mantido em dia pelos próprios blocos: as alterações
+    são propagadas a todo o modelo e gravadas, mas só as linhas do bloco são
+    recalculadas e redesenhadas.
+    
+    Args:
+        section: nome da seção
+        max_cols: número de colunas da grade
+        bloco: linhas do bloco (ver blocos_secao)
+        log_key: flag do session_state que controla o log de alteração
+    """
+    conn = None
     try:
-        # Verifica se já existem registros para o usuário
-        cursor.execute("""
-            SELECT COUNT(*) FROM forms_tab WHERE user_id = ?
-        """, (user_id,))
+        user_id = st.session_state.user_id
         
-        if cursor.fetchone()[0] == 0:  # Se não existem registros
-            # Copia todos os dados do user_id 0
-            cursor.execute("""
-                INSERT INTO forms_tab (
-                    name_element, type_element, math_element, msg_element,
-                    value_element, select_element, str_element, e_col, e_row,
-                    section, col_len, user_id
-                )
-                SELECT 
-                    name_element, type_element, math_element, msg_element,
-                    value_element, select_element, str_element, e_col, e_row,
-                    section, col_len, ? as user_id
-                FROM forms_tab 
-                WHERE user_id = 0
-            """, (user_id,))
-            
-            st.success(f"Registros iniciais criados para o usuário {user_id}")
+        # Conexão somente leitura do pool; as gravações vão para o escritor único
+        conn = obter_conexao(somente_leitura=True)
+        cursor = conn.cursor()
         
+        modelo = st.session_state.get(chave_modelo(section))
+        if modelo is None or modelo.user_id != user_id:
+            modelo = ModeloUsuario.carregar(cursor, user_id)
+            st.session_state[chave_modelo(section)] = modelo
+        
+        # 1. Fase de cálculo: aplica as alterações dos widgets do bloco e calcula suas células
+        elements = [element for linha in bloco for element in linha]
+        resultados = calcular_secao(cursor, modelo, modelo.template, elements, section, log_key)
+        
+        # 2. Fase de gravação: as alterações em uma única transação,
+        # executada pelo escritor único (banco/escrita.py)
+        if modelo.alterados:
+            try:
+                escrita.executar(modelo.salvar)
+                # Entradas alteradas: resultados recalculados em segundo plano
+                # (motor/precarga.py) enquanto o usuário continua no formulário
+                precarga.agendar(user_id)
+            except sqlite3.Error as e:
+                st.error(f"Erro no banco de dados: {str(e)}")
+        
+        # 3. Renderização a partir dos valores do modelo
+        for row_elements in bloco:
+            renderizar_linha(cursor, modelo, resultados, row_elements, max_cols)
+    
     except Exception as e:
-        st.error(f"Erro ao criar registros para novo usuário: {str(e)}")
-        raise
+        st.error(f"Erro ao processar formulário: {str(e)}")
+    finally:
+        if conn:
+            conn.close()
+
+def renderizar_linha(cursor, modelo, resultados, row_elements, max_cols):
+    """
+    Renderiza uma linha da grade (elementos de mesmo e_row) a partir dos
+    valores do modelo e dos resultados calculados na fase de cálculo.
+    """
+    # Filtra elementos visíveis (os ocultos já foram calculados)
+    visible_elements = [e for e in row_elements if not e[1].endswith('H')]
+    if not visible_elements:
+        return
+        
+    # Verifica se é uma linha de espaçamento
+    if any(element[1] == 'pula_linha' for element in visible_elements):
+        st.markdown("<br>", unsafe_allow_html=True)
+        return
+    
+
+    
+    # Para os elementos normais
+    # Calcula o total de colunas necessário baseado em col_len
+    total_cols = 0
+    for element in visible_elements:
+        col_len = int(element[9]) if element[9] is not None else 1
+        total_cols += col_len
+
+    # Cria lista de larguras relativas respeitando max_cols
+    column_widths = []
+    remaining_cols = max_cols
+
+    for element in visible_elements:
+        col_len = int(element[9]) if element[9] is not None else 1
+        # Ajusta a largura para não ultrapassar o espaço restante
+        actual_width = min(col_len, remaining_cols)
+        column_widths.append(actual_width)
+        remaining_cols -= actual_width
+
+    # Adiciona colunas vazias se necessário
+    if remaining_cols > 0:
+        column_widths.append(remaining_cols)
+
+    # Cria todas as colunas de uma vez com suas larguras relativas
+    cols = st.columns(column_widths)
+    
+    # Processa os elementos dentro das colunas
+    for idx, element in enumerate(visible_elements):
+        with cols[idx]:
+            name = element[0]
+            type_elem = element[1]
+            math_elem = element[2]
+            msg = element[3]
+            value = modelo.valor(name)
+            select_options = element[5]
+            str_value = modelo.texto(name)
+            e_col = element[7] - 1  # Ajusta para índice 0-4
+            
+            # Verifica se a coluna está dentro do limite
+            if e_col >= max_cols:
+                continue  # Pula silenciosamente elementos fora do limite
+
+            try:
+                # Processa elementos do tipo título
+                if type_elem == 'titulo':
+                    titulo(cursor, element)
+                    continue
+
+                # Processamento normal para elementos visíveis - Selectbox
+                if type_elem == 'selectbox':
+                    try:
+                        # Validação das opções do select
+                        if not select_options:
+                            st.error(f"Erro: Opções vazias para {name}")
+                            continue
+                        
+                        options = [opt.strip() for opt in select_options.split('|')]
+                        display_msg = msg if msg.strip() else name
+                        initial_index = options.index(str_value) if str_value in options else 0
+                        
+                        # Renderiza o selectbox; uma mudança de opção já foi
+                        # aplicada ao modelo (e aos condicaoH dependentes) na fase de cálculo
+                        st.selectbox(
+                            display_msg,
+                            options=options,
+                            key=chave_widget('select', element),
+                            index=initial_index,
+                            label_visibility="collapsed" if not msg.strip() else "visible"
+                        )
+
+                    except Exception as e:
+                        st.error(f"Erro no selectbox {name}: {str(e)}")
+
+                elif type_elem == 'call_insumos':
+                    try:
+                        result = resultados.get(name, 0.0)
+                        
+                        # Configurações de estilo para métricas
+                        FONT_SIZES = {
+                            'small': '12px',
+                            'medium': '16px',
+                            'large': '20px',
+                            'xlarge': '24px'
+                        }
+                        
+                        msg_parts = msg.split('|')
+                        display_msg = msg_parts[0].strip()
+                        font_size = 'medium'
+                        
+                        if len(msg_parts) > 1:
+                            for param in msg_parts[1:]:
+                                if param.startswith('size:'):
+                                    requested_size = param.split(':')[1].strip()
+                                    if requested_size in FONT_SIZES:
+                                        font_size = requested_size
+
+                        st.markdown(f"""
+                            <div style='text-align: left;'>
+                                <p style='font-size: {FONT_SIZES[font_size]}; margin-bottom: 0;'>{display_msg}</p>
+                                <p style='font-size: {FONT_SIZES[font_size]}; font-weight: bold;'>{result:.2f}</p>
+                            </div>
+                            """, 
+                            unsafe_allow_html=True
+                        )
+                    except Exception as e:
+                        st.error(f"Erro ao processar call_insumos: {str(e)}")
+
+                elif type_elem == 'input':
+                    try:
+                        # Converte o valor REAL do modelo para exibição no formato BR
+                        # Preserva as casas decimais originais ou usa máximo de 12 casas
+                        if value is not None:
+                            float_value = float(value)
+                            # Determina o número de casas decimais necessárias (máximo 12)
+                            if float_value == int(float_value):
+                                # Se for número inteiro, mostra sem casas decimais
+                                current_value = f"{int(float_value)}"
+                            else:
+                                # Formatação inteligente: detecta quantas casas decimais são realmente necessárias
+                                # Evita forçar 12 casas que podem mostrar imprecisão binária
+                                str_value = str(float_value)
+                                if 'e' in str_value.lower():
+                                    # Para números muito pequenos em notação científica
+                                    current_value = f"{float_value:.6f}".rstrip('0').rstrip('.')
+                                else:
+                                    # Para números normais, usa a representação string direta (mais precisa)
+                                    current_value = str_value
+                            current_value = current_value.replace('.', ',')
+                        else:
+                            current_value = "0"
+                        
+                        # Usa o nome do elemento como label se msg estiver vazio
+                        display_msg = msg if msg.strip() else name
+                        input_value = st.text_input(
+                            display_msg,
+                            value=current_value,
+                            key=chave_widget('input', element),
+                            label_visibility="collapsed" if not msg.strip() else "visible"
+                        )
+                        
+                        try:
+                            # Remove pontos de milhar e converte vírgula para ponto
+                            cleaned_input = input_value.strip().replace('.', '').replace(',', '.')
+                            numeric_value = float(cleaned_input)
+                            
+                            # Alterações já aplicadas e propagadas na fase de cálculo
+                            st.session_state.form_values[name] = numeric_value
+                            
+                        except ValueError:
+                            st.error(f"Por favor, insira apenas números em {msg}")
+                            st.session_state.form_values[name] = float(value or 0)
+                    
+                    except Exception as e:
+                        st.error(f"Erro ao processar input: {str(e)}")
+
+                elif type_elem == 'formula':
+                    try:
+                        # 1. Resultado calculado na fase de cálculo
+                        result = resultados.get(name, 0.0)
+                        
+                        # 2. Renderiza na interface SOMENTE se str_element não estiver vazio
+                        str_value = element[6]
+                        if str_value and str_value.strip():
+                            # Limpa as aspas do str_value antes de usar
+                            str_value = str_value.strip('"').strip("'")  # Remove aspas simples e duplas
+                            
+                            # Formata o resultado segundo as regras especificadas
+                            if result is None or result == 0:
+                                result_br = "0"
+                            elif abs(result) >= 1:
+                                result_br = f"{result:,.0f}".replace(',', 'TEMP').replace('.', ',').replace('TEMP', '.')
+                            else:
+                                result_br = f"{result:,.3f}".replace(',', 'TEMP').replace('.', ',').replace('TEMP', '.')
+                            
+                            # Limpa as aspas da mensagem também
+                            if msg:
+                                msg = msg.strip('"').strip("'")
+                            
+                            # Se não houver estilo definido, usa o padrão
+                            if not str_value:
+                                str_value = '<div style="text-align: left; font-size: 16px; margin-bottom: 0;">[valor]</div>'
+                            
+                            # Substitui o placeholder pelo valor calculado
+                            formatted_html = str_value.replace('[valor]', result_br)
+                            
+                            # Se houver mensagem de título
+                            if msg:
+                                st.markdown(msg, unsafe_allow_html=True)
+                                st.empty()
+                            
+                            # Limpa o HTML final e renderiza
+                            formatted_html = formatted_html.strip()
+                            st.markdown(formatted_html, unsafe_allow_html=True)
+                        
+                    except Exception as e:
+                        st.error(f"Erro ao processar fórmula: {str(e)}")
+                        return 0.0
+
+
+                elif type_elem == 'input_data':
+                    # Pega o valor atual do str_element
+                    current_value = str_value if str_value else ''
+                    
+                    # Campo de entrada para data
+                    input_value = st.text_input(
+                        msg,
+                        value=current_value,
+                        key=chave_widget('input_data', element),
+                        label_visibility="collapsed" if not msg.strip() else "visible"
+                    )
+                    
+                    # Validação do formato da data
+                    if input_value:
+                        # Regex para validar formato dd/mm/aaaa
+                        date_pattern = r'^\d{2}/\d{2}/\d{4}$'
+                        if not re.match(date_pattern, input_value):
+                            st.error(f"Por favor, insira a data no formato dd/mm/aaaa em {msg}")
+                        elif not data_valida(input_value):
+                            st.error(f"Data inválida em {msg}")
+                        else:
+                            # Atualiza o form_values com o número de dias
+                            st.session_state.form_values[name] = date_to_days(input_value)
+
+                elif type_elem == 'formula_data':
+                    # Desabilitado - não faz nada
+                    pass
+
+            except Exception as e:
+                st.error(f"Erro ao processar {name}: {str(e)}")
 
 def process_forms_tab(section='cafe'):
     """
@@ -379,19 +653,24 @@ def process_forms_tab(section='cafe'):
             st.session_state.form_values = {}
         
         # Conexão com o banco
-        conn = sqlite3.connect(DB_PATH)  # Atualizado para usar DB_PATH
+        # Conexão somente leitura do pool; as gravações vão para o escritor único
+        conn = obter_conexao(somente_leitura=True)
         cursor = conn.cursor()
 
-        # 3. Garante que existam dados para o usuário
-        new_user(cursor, user_id)
-        conn.commit()
+        # Template com as fórmulas compiladas (uma verificação de versão por renderização)
+        template = carregar_template(cursor)
+
+        # Modelo do usuário em memória: uma única consulta para todas as referências.
+        # Fica no session_state para as reexecuções dos fragmentos da seção
+        modelo = ModeloUsuario.carregar(cursor, user_id, template)
+        st.session_state[chave_modelo(section)] = modelo
 
-        # 4. Busca dados específicos do usuário logado e da seção atual
-        cursor.execute("""
+        # 3. Busca dados específicos do usuário logado e da seção atual
+        cursor.execute(f"""
             SELECT name_element, type_element, math_element, msg_element,
                    value_element, select_element, str_element, e_col, e_row,
                    col_len
-            FROM forms_tab
+            FROM {visao('forms_tab')}
             WHERE user_id = ? AND section = ?
             ORDER BY e_row, e_col
         """, (user_id, section))
@@ -402,363 +681,12 @@ def process_forms_tab(section='cafe'):
             st.warning(f"Nenhum elemento encontrado para a seção {section}")
             return
 
-        # Agrupa elementos por linha
-        rows = {}
-        for element in elements:
-            e_row = element[8]
-            if e_row not in rows:
-                rows[e_row] = []
-            rows[e_row].append(element)
-
-        # Processa cada linha
-        for row_num in sorted(rows.keys()):
-            row_elements = rows[row_num]
-            
-            # Filtra elementos visíveis
-            visible_elements = [e for e in row_elements if not e[1].endswith('H')]
-            if not visible_elements:
-                continue
-                
-            # Verifica se é uma linha de espaçamento
-            if any(element[1] == 'pula_linha' for element in visible_elements):
-                st.markdown("<br>", unsafe_allow_html=True)
-                continue
-            
-
-            
-            # Para os elementos normais
-            # Calcula o total de colunas necessário baseado em col_len
-            total_cols = 0
-            for element in visible_elements:
-                col_len = int(element[9]) if element[9] is not None else 1
-                total_cols += col_len
-
-            # Cria lista de larguras relativas respeitando max_cols
-            column_widths = []
-            remaining_cols = max_cols
-
-            for element in visible_elements:
-                col_len = int(element[9]) if element[9] is not None else 1
-                # Ajusta a largura para não ultrapassar o espaço restante
-                actual_width = min(col_len, remaining_cols)
-                column_widths.append(actual_width)
-                remaining_cols -= actual_width
-
-            # Adiciona colunas vazias se necessário
-            if remaining_cols > 0:
-                column_widths.append(remaining_cols)
-
-            # Cria todas as colunas de uma vez com suas larguras relativas
-            cols = st.columns(column_widths)
-            
-            # Processa os elementos dentro das colunas
-            for idx, element in enumerate(visible_elements):
-                with cols[idx]:
-                    name = element[0]
-                    type_elem = element[1]
-                    math_elem = element[2]
-                    msg = element[3]
-                    value = element[4]
-                    select_options = element[5]
-                    str_value = element[6]
-                    e_col = element[7] - 1  # Ajusta para índice 0-4
-                    
-                    # Verifica se a coluna está dentro do limite
-                    if e_col >= max_cols:
-                        continue  # Pula silenciosamente elementos fora do limite
-
-                    try:
-                        # Processa elementos do tipo título
-                        if type_elem == 'titulo':
-                            titulo(cursor, element)
-                            continue
-
-                        # Processa elementos ocultos
-                        if type_elem.endswith('H'):
-                            try:
-                                if type_elem == 'condicaoH':
-                                    result = condicaoH(cursor, element, conn)
-                                elif type_elem == 'call_insumosH':
-                                    result = call_insumos(cursor, element)
-
-                                # Atualiza o banco com o resultado
-                                if type_elem in ['condicaoH', 'call_insumosH']:
-                                    cursor.execute("""
-                                        UPDATE forms_tab 
-                                        SET value_element = ? 
-                                        WHERE name_element = ? AND user_id = ?
-                                    """, (result, name, st.session_state.user_id))
-                                    conn.commit()
-                                continue
-
-                            except Exception as e:
-                                st.error(f"Falha ao processar elemento oculto {name}: {str(e)}")
-
-                        # Processamento normal para elementos visíveis - Selectbox
-                        if type_elem == 'selectbox':
-                            try:
-                                # Validação das opções do select
-                                if not select_options:
-                                    st.error(f"Erro: Opções vazias para {name}")
-                                    continue
-                                
-                                options = [opt.strip() for opt in select_options.split('|')]
-                                display_msg = msg if msg.strip() else name
-                                initial_index = options.index(str_value) if str_value in options else 0
-                                
-                                # Renderiza o selectbox
-                                selected = st.selectbox(
-                                    display_msg,
-                                    options=options,
-                                    key=f"select_{name}_{row_num}_{e_col}",
-                                    index=initial_index,
-                                    label_visibility="collapsed" if not msg.strip() else "visible"
-                                )
-                                
-                                # Se o valor mudou, atualiza os elementos dependentes
-                                if selected != str_value:
-                                    try:
-                                        # Atualiza o próprio selectbox
-                                        cursor.execute("""
-                                            UPDATE forms_tab 
-                                            SET str_element = ?,
-                                                value_element = ?
-                                            WHERE name_element = ? 
-                                            AND user_id = ? 
-                                            AND section = ?
-                                        """, (selected, 0.0, name, st.session_state.user_id, section))
-                                        
-                                        # Busca elementos condicaoH que dependem deste selectbox
-                                        cursor.execute("""
-                                            SELECT * FROM forms_tab 
-                                            WHERE type_element = 'condicaoH' 
-                                            AND math_element = ? 
-                                            AND user_id = ?
-                                        """, (name, st.session_state.user_id))
-                                        
-                                        # Para cada elemento encontrado, chama condicaoH
-                                        for elemento in cursor.fetchall():
-                                            # print(f"Elemento encontrado: {elemento}")  # Debug adicional
-                                            condicaoH(cursor, elemento, conn)
-                                        
-                                        conn.commit()
-                                    
-                                    except sqlite3.Error as e:
-                                        st.error(f"Erro no banco de dados: {str(e)}")
-                                        conn.rollback()
-
-                            except Exception as e:
-                                st.error(f"Erro no selectbox {name}: {str(e)}")
-                                if 'conn' in locals():
-                                    conn.rollback()
-
-                        elif type_elem == 'call_insumos':
-                            try:
-                                result = call_insumos(cursor, element)
-                                conn.commit()
-                                
-                                # Configurações de estilo para métricas
-                                FONT_SIZES = {
-                                    'small': '12px',
-                                    'medium': '16px',
-                                    'large': '20px',
-                                    'xlarge': '24px'
-                                }
-                                
-                                msg_parts = msg.split('|')
-                                display_msg = msg_parts[0].strip()
-                                font_size = 'medium'
-                                
-                                if len(msg_parts) > 1:
-                                    for param in msg_parts[1:]:
-                                        if param.startswith('size:'):
-                                            requested_size = param.split(':')[1].strip()
-                                            if requested_size in FONT_SIZES:
-                                                font_size = requested_size
-
-                                st.markdown(f"""
-                                    <div style='text-align: left;'>
-                                        <p style='font-size: {FONT_SIZES[font_size]}; margin-bottom: 0;'>{display_msg}</p>
-                                        <p style='font-size: {FONT_SIZES[font_size]}; font-weight: bold;'>{result:.2f}</p>
-                                    </div>
-                                    """, 
-                                    unsafe_allow_html=True
-                                )
-                            except Exception as e:
-                                st.error(f"Erro ao processar call_insumos: {str(e)}")
-
-                        elif type_elem == 'input':
-                            try:
-                                # Converte o valor REAL do banco para exibição no formato BR
-                                # Preserva as casas decimais originais ou usa máximo de 12 casas
-                                if value is not None:
-                                    float_value = float(value)
-                                    # Determina o número de casas decimais necessárias (máximo 12)
-                                    if float_value == int(float_value):
-                                        # Se for número inteiro, mostra sem casas decimais
-                                        current_value = f"{int(float_value)}"
-                                    else:
-                                        # Formatação inteligente: detecta quantas casas decimais são realmente necessárias
-                                        # Evita forçar 12 casas que podem mostrar imprecisão binária
-                                        str_value = str(float_value)
-                                        if 'e' in str_value.lower():
-                                            # Para números muito pequenos em notação científica
-                                            current_value = f"{float_value:.6f}".rstrip('0').rstrip('.')
-                                        else:
-                                            # Para números normais, usa a representação string direta (mais precisa)
-                                            current_value = str_value
-                                    current_value = current_value.replace('.', ',')
-                                else:
-                                    current_value = "0"
-                                
-                                # Usa o nome do elemento como label se msg estiver vazio
-                                display_msg = msg if msg.strip() else name
-                                input_value = st.text_input(
-                                    display_msg,
-                                    value=current_value,
-                                    key=f"input_{name}_{row_num}_{e_col}",
-                                    label_visibility="collapsed" if not msg.strip() else "visible"
-                                )
-                                
-                                try:
-                                    # Remove pontos de milhar e converte vírgula para ponto
-                                    cleaned_input = input_value.strip().replace('.', '').replace(',', '.')
-                                    numeric_value = float(cleaned_input)
-                                    
-                                    # Compara valores como float
-                                    if abs(numeric_value - float(value or 0)) > 1e-10:
-                                        # Registra log apenas uma vez por seção
-                                        if not st.session_state[log_key]:
-                                            registrar_acesso(
-                                                st.session_state.user_id,
-                                                f"forms_{section}",
-                                                f"Alteração em formulário de {section}"
-                                            )
-                                            st.session_state[log_key] = True
-                                            
-                                        cursor.execute("""
-                                            UPDATE forms_tab 
-                                            SET value_element = ? 
-                                            WHERE name_element = ? AND user_id = ?
-                                        """, (numeric_value, name, st.session_state.user_id))
-                                        conn.commit()
-                                        st.rerun()
-                                    
-                                    st.session_state.form_values[name] = numeric_value
-                                    
-                                except ValueError:
-                                    st.error(f"Por favor, insira apenas números em {msg}")
-                                    st.session_state.form_values[name] = float(value or 0)
-                            
-                            except Exception as e:
-                                st.error(f"Erro ao processar input: {str(e)}")
-
-                        elif type_elem == 'formula':
-                            try:
-                                # 1. Calcula o resultado da fórmula
-                                result = calculate_formula(element[2], st.session_state.form_values, cursor)
-                                
-                                # 2. Renderiza na interface SOMENTE se str_element não estiver vazio
-                                str_value = element[6]
-                                if str_value and str_value.strip():
-                                    # Limpa as aspas do str_value antes de usar
-                                    str_value = str_value.strip('"').strip("'")  # Remove aspas simples e duplas
-                                    
-                                    # Formata o resultado segundo as regras especificadas
-                                    if result is None or result == 0:
-                                        result_br = "0"
-                                    elif abs(result) >= 1:
-                                        result_br = f"{result:,.0f}".replace(',', 'TEMP').replace('.', ',').replace('TEMP', '.')
-                                    else:
-                                        result_br = f"{result:,.3f}".replace(',', 'TEMP').replace('.', ',').replace('TEMP', '.')
-                                    
-                                    # Limpa as aspas da mensagem também
-                                    if msg:
-                                        msg = msg.strip('"').strip("'")
-                                    
-                                    # Se não houver estilo definido, usa o padrão
-                                    if not str_value:
-                                        str_value = '<div style="text-align: left; font-size: 16px; margin-bottom: 0;">[valor]</div>'
-                                    
-                                    # Substitui o placeholder pelo valor calculado
-                                    formatted_html = str_value.replace('[valor]', result_br)
-                                    
-                                    # Se houver mensagem de título
-                                    if msg:
-                                        st.markdown(msg, unsafe_allow_html=True)
-                                        st.empty()
-                                    
-                                    # Limpa o HTML final e renderiza
-                                    formatted_html = formatted_html.strip()
-                                    st.markdown(formatted_html, unsafe_allow_html=True)
-                                
-                                # 3. Atualiza o banco (sempre)
-                                cursor.execute("""
-                                    UPDATE forms_tab 
-                                    SET value_element = ? 
-                                    WHERE name_element = ? AND user_id = ?
-                                """, (result, name, st.session_state.user_id))
-                                conn.commit()  # Salva a alteração no banco
-                                
-                            except Exception as e:
-                                st.error(f"Erro ao processar fórmula: {str(e)}")
-                                return 0.0
-
-
-                        elif type_elem == 'input_data':
-                            # Pega o valor atual do str_element
-                            current_value = str_value if str_value else ''
-                            
-                            # Campo de entrada para data
-                            input_value = st.text_input(
-                                msg,
-                                value=current_value,
-                                key=f"input_data_{name}_{row_num}_{e_col}",
-                                label_visibility="collapsed" if not msg.strip() else "visible"
-                            )
-                            
-                            # Validação do formato da data
-                            if input_value:
-                                # Regex para validar formato dd/mm/aaaa
-                                date_pattern = r'^\d{2}/\d{2}/\d{4}$'
-                                if not re.match(date_pattern, input_value):
-                                    st.error(f"Por favor, insira a data no formato dd/mm/aaaa em {msg}")
-                                else:
-                                    try:
-                                        dia, mes, ano = map(int, input_value.split('/'))
-                                        # Verifica se é uma data válida
-                                        if (mes < 1 or mes > 12 or dia < 1 or dia > 31 or
-                                            ano < 1900 or ano > 2100 or
-                                            (mes in [4, 6, 9, 11] and dia > 30) or
-                                            (mes == 2 and dia > 29)):
-                                            st.error(f"Data inválida em {msg}")
-                                        else:
-                                            # Calcula dias desde 01/01/1900
-                                            days_since_1900 = date_to_days(input_value)
-                                            
-                                            # Atualiza o banco apenas se o valor mudou
-                                            if input_value != current_value:
-                                                cursor.execute("""
-                                                    UPDATE forms_tab 
-                                                    SET str_element = ?,
-                                                        value_element = ? 
-                                                    WHERE name_element = ? AND user_id = ?
-                                                """, (input_value, days_since_1900, name, st.session_state.user_id))
-                                                conn.commit()
-                                                st.rerun()
-                                            
-                                            # Atualiza o form_values com o número de dias
-                                            st.session_state.form_values[name] = days_since_1900
-                                            
-                                    except ValueError:
-                                        st.error(f"Data inválida em {msg}")
-
-                        elif type_elem == 'formula_data':
-                            # Desabilitado - não faz nada
-                            pass
-
-                    except Exception as e:
-                        st.error(f"Erro ao processar {name}: {str(e)}")
+        # 4. Blocos da seção: cada bloco é um fragmento (st.fragment) com as
+        # fases de cálculo, gravação e renderização das suas linhas; uma
+        # edição reexecuta só o bloco do widget, que contém todas as fórmulas
+        # exibidas que dependem dele (ver blocos_secao)
+        for bloco in blocos_secao(template, elements):
+            bloco_formulario(section, max_cols, bloco, log_key)
 
         # Separador
         st.divider()
@@ -768,122 +696,3 @@ def process_forms_tab(section='cafe'):
     finally:
         if conn:
             conn.close()
-
-def call_insumos(cursor, element):
-    """
-    Busca valor de referência na tabela forms_insumos e atualiza value_element.
-    
-    Args:
-        cursor: Cursor do banco de dados SQLite
-        element: Tupla contendo os dados do elemento (name, type, math, msg, value, select, str, col, row)
-    
-    Returns:
-        float: Valor numérico encontrado ou 0.0 em caso de erro
-    """
-    try:
-        name = element[0]  # name_element da forms_tab
-        str_value = element[6]  # str_element da forms_tab (ex: 'InsumosI15')
-        
-        # Verifica se há uma referência válida
-        if not str_value:
-            return 0.0
-            
-        # Busca o math_element na forms_insumos onde name_element = str_value da forms_tab
-        cursor.execute("""
-            SELECT math_element 
-            FROM forms_insumos 
-            WHERE name_element = ?
-        """, (str_value.strip(),))
-        
-        result = cursor.fetchone()
-        if not result:
-            st.warning(f"Referência '{str_value}' não encontrada em forms_insumos")
-            return 0.0
-            
-        try:
-            math_value = result[0]
-            if not math_value:
-                return 0.0
-                
-            # Processa o valor do math_element
-            if '/' in math_value:  # Se for uma fração
-                num, den = map(lambda x: float(x.replace(',', '.')), math_value.split('/'))
-                if den == 0:
-                    st.error(f"Divisão por zero encontrada em '{math_value}'")
-                    return 0.0
-                final_value = num / den
-            else:
-                final_value = float(math_value.replace(',', '.'))
-            
-            # Converte para formato BR antes de salvar
-            final_value_br = f"{final_value:.2f}".replace('.', ',')
-            
-            cursor.execute("""
-                UPDATE forms_tab 
-                SET value_element = ?
-                WHERE name_element = ? AND user_id = ?
-            """, (final_value_br, name, st.session_state.user_id))
-            
-            return final_value  # Retorna float para cálculos
-            
-        except ValueError as e:
-            st.error(f"Valor inválido '{result[0]}' para a referência '{str_value}': {str(e)}")
-            return 0.0
-            
-    except sqlite3.Error as e:
-        st.error(f"Erro no banco de dados: {str(e)}")
-        return 0.0
-    except Exception as e:
-        st.error(f"Erro inesperado ao processar referência: {str(e)}")
-        return 0.0
-
-def formula(cursor, element, conn=None):
-    """
-    Exibe elementos do tipo 'formula' com estilos definidos no str_element.
-    Esta função lida com o timing de renderização do Streamlit para garantir
-    que os estilos sejam aplicados corretamente. As pausas estratégicas (st.empty())
-    são necessárias devido à natureza assíncrona do Streamlit e como ele processa
-    elementos HTML.
-    Parâmetros:
-        cursor: Cursor do banco de dados SQLite
-        element: Tupla contendo os dados do elemento (name, type, math, msg, etc.)
-        conn: Conexão com o banco de dados (opcional, mas necessário para commit)
-    """
-    try:
-        name = element[0]
-        msg = element[3].strip("'").strip('"') if element[3] else ''
-        str_value = element[6]
-        if str_value:
-            str_value = str_value.strip('"""').strip("'''").strip('"').strip("'")
-        result = calculate_formula(element[2], st.session_state.form_values, cursor)
-        
-        # Formata o resultado segundo as regras especificadas para exibição
-        if result is None or result == 0:
-            result_br = "0"
-        elif abs(result) >= 1:
-            result_br = f"{result:,.0f}".replace(',', 'TEMP').replace('.', ',').replace('TEMP', '.')
-        else:
-            result_br = f"{result:,.3f}".replace(',', 'TEMP').replace('.', ',').replace('TEMP', '.')
-            
-        if not str_value:
-            str_value = '<div style="text-align: left; font-size: 16px; margin-bottom: 0;">[valor]</div>'
-        st.empty()
-        formatted_html = str_value.replace('[valor]', result_br)
-        if msg:
-            st.markdown(msg, unsafe_allow_html=True)
-            st.empty()
-        formatted_html = formatted_html.strip()
-        st.markdown(formatted_html, unsafe_allow_html=True)
-        # Atualiza o valor no banco (valor original, sem formatação)
-        cursor.execute("""
-            UPDATE forms_tab 
-            SET value_element = ? 
-            WHERE name_element = ? AND user_id = ?
-        """, (result, name, st.session_state.user_id))
-        if conn:
-            conn.commit()
-        else:
-            cursor.connection.commit()  # Faz commit através do cursor se conn não foi passado
-    except Exception as e:
-        st.error(f"Erro ao processar fórmula: {str(e)}")
-        return 0.0
@@ -14,6 +14,8 @@ import tempfile
 import matplotlib.pyplot as plt
 import traceback
 from config import DB_PATH
+from banco.conexao import conexao
+from banco import acessos
 import os
 
 try:
@@ -33,9 +35,9 @@ try:
 except ImportError as e:
     print(f"Erro ao importar ReportLab: {e}")
 
-def criar_conexao():
-    """Cria conexão com o banco de dados"""
-    return sqlite3.connect(DB_PATH)
+def criar_conexao(somente_leitura=False):
+    """Empresta uma conexão do pool (usar com 'with')"""
+    return conexao(somente_leitura=somente_leitura)
 
 def get_timezone_adjusted_datetime():
     """
@@ -49,7 +51,8 @@ def get_timezone_adjusted_datetime():
 
 def carregar_dados_acessos():
     """Carrega dados de acessos do banco de dados"""
-    conn = criar_conexao()
+    # Grava as linhas do log ainda na fila antes de consultar
+    acessos.descarregar()
     
     # Ajusta a query baseada no ambiente
     timezone_adjust = "'+3 hours'" if os.getenv('RENDER') else "'0 hours'"
@@ -101,44 +104,29 @@ def carregar_dados_acessos():
     ORDER BY dates.date
     """
     
-    df_empresas = pd.read_sql_query(query_empresas, conn)
-    df_usuarios = pd.read_sql_query(query_usuarios, conn)
-    df_frequencia = pd.read_sql_query(query_frequencia, conn)
+    with criar_conexao(somente_leitura=True) as conn:
+        df_empresas = pd.read_sql_query(query_empresas, conn)
+        df_usuarios = pd.read_sql_query(query_usuarios, conn)
+        df_frequencia = pd.read_sql_query(query_frequencia, conn)
     
-    conn.close()
     return df_empresas, df_usuarios, df_frequencia
 
 def registrar_acesso(user_id, programa, acao):
     """
-    Registra o acesso do usuário no banco de dados com ajuste de timezone
+    Registra o acesso do usuário com ajuste de timezone.
+    A linha é enfileirada e gravada em lote por uma thread em segundo plano
+    (banco/acessos.py), sem acessar o banco durante a requisição.
     """
     try:
-        conn = criar_conexao()
-        cursor = conn.cursor()
-        
         # Obtém data e hora ajustadas
         dt_adjusted = get_timezone_adjusted_datetime()
         data_acesso = dt_adjusted.strftime('%Y-%m-%d')
         hora_acesso = dt_adjusted.strftime('%H:%M:%S')
         
-        cursor.execute("""
-        INSERT INTO log_acessos (
-            user_id,
-            data_acesso,
-            hora_acesso,
-            programa,
-            acao
-        )
-        VALUES (?, ?, ?, ?, ?)
-        """, (user_id, data_acesso, hora_acesso, programa, acao))
-        
-        conn.commit()
-        conn.close()
+        acessos.registrar(user_id, data_acesso, hora_acesso, programa, acao)
         
     except Exception as e:
         st.error(f"Erro ao registrar acesso: {str(e)}")
-        if 'conn' in locals():
-            conn.close()
 
 def subtitulo():
     """
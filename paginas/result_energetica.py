@@ -5,14 +5,15 @@
 # ajustes layout Anna e ABIC
 
 import streamlit as st
-import sqlite3
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from config import DB_PATH  # Adicione esta importação
-from paginas.form_model_recalc import verificar_dados_usuario, calculate_formula, atualizar_formulas
+from banco.conexao import obter_conexao
+from banco.series import buscar_grupos, buscar_serie
+from banco.valores import visao
+from motor import precarga
+from motor.grafo import CicloDependenciaError
 import io
-import time
 import traceback
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
@@ -83,80 +84,6 @@ def pula_linha(cursor, element):
     except Exception as e:
         st.error(f"Erro ao processar pula linha: {str(e)}")
 
-def new_user(cursor, user_id):
-    """
-    Cria registros iniciais para um novo usuário na tabela forms_energetica,
-    copiando os dados do template (user_id = 0)
-    """
-    try:
-        # Verifica se já existem registros para o usuário
-        cursor.execute("""
-            SELECT COUNT(*) FROM forms_energetica 
-            WHERE user_id = ?
-        """, (user_id,))
-        
-        if cursor.fetchone()[0] == 0:
-            # Copia dados do template (user_id = 0) para o novo usuário
-            cursor.execute("""
-                INSERT INTO forms_energetica (
-                    user_id, name_element, type_element, math_element,
-                    msg_element, value_element, select_element, str_element,
-                    e_col, e_row, section
-                )
-                SELECT 
-                    ?, name_element, type_element, math_element,
-                    msg_element, value_element, select_element, str_element,
-                    e_col, e_row, section
-                FROM forms_energetica
-                WHERE user_id = 0
-            """, (user_id,))
-            
-            cursor.connection.commit()
-            st.success("Dados iniciais criados com sucesso!")
-            
-    except Exception as e:
-        st.error(f"Erro ao criar dados do usuário: {str(e)}")
-
-def call_dados(cursor, element):
-    """
-    Busca dados na tabela forms_tab e atualiza o value_element do registro atual.
-    Mantém consistência usando o mesmo user_id.
-    """
-    try:
-        name = element[0]        # name_element
-        type_elem = element[1]   # type_element
-        str_value = element[6]   # str_element
-        user_id = element[10]    # user_id
-        
-        if type_elem == 'call_dados':
-            cursor.execute("""
-                SELECT value_element 
-                FROM forms_tab 
-                WHERE name_element = ? 
-                AND user_id = ?
-                ORDER BY ID_element DESC
-                LIMIT 1
-            """, (str_value, user_id))
-            
-            result = cursor.fetchone()
-            
-            if result:
-                value = result[0]
-                
-                cursor.execute("""
-                    UPDATE forms_energetica 
-                    SET value_element = ? 
-                    WHERE name_element = ? 
-                    AND user_id = ?
-                """, (value, name, user_id))
-                
-                cursor.connection.commit()
-            else:
-                st.warning(f"Valor não encontrado na tabela forms_tab para {str_value} (user_id: {user_id})")
-                
-    except Exception as e:
-        st.error(f"Erro ao processar call_dados: {str(e)}")
-
 def subtitulo():
     """
     Exibe um subtítulo centralizado com estilo personalizado
@@ -196,22 +123,12 @@ def show_results():
         if gerar_pdf:
             try:
                 msg_placeholder.info("Gerando PDF... Por favor, aguarde.")
-                for _ in range(3):
-                    try:
-                        conn = sqlite3.connect(DB_PATH, timeout=20)
-                        cursor = conn.cursor()
-                        break
-                    except sqlite3.OperationalError as e:
-                        if "database is locked" in str(e):
-                            time.sleep(1)
-                            continue
-                        raise e
-                else:
-                    st.error("Não foi possível conectar ao banco de dados. Tente novamente.")
-                    return
+                # Leitura: conexão somente leitura, não espera pelo escritor
+                conn = obter_conexao(somente_leitura=True)
+                cursor = conn.cursor()
+                precarga.carregar(cursor, user_id)  # valores em dia para o PDF
                 buffer = generate_pdf_content_energetica(cursor, st.session_state.user_id)
                 if buffer:
-                    conn.close()
                     msg_placeholder.success("PDF gerado com sucesso!")
                     # Centralizar o botão de download
                     col_esq_dl, col_centro_dl, col_dir_dl = st.columns([3,2,3])
@@ -235,31 +152,23 @@ def show_results():
                 if 'conn' in locals() and conn:
                     conn.close()
         
-        conn = sqlite3.connect(DB_PATH)
+        # Conexão somente leitura; as gravações vão para o escritor único (banco/escrita.py)
+        conn = obter_conexao(somente_leitura=True)
         cursor = conn.cursor()
         
-        # Atualiza todas as fórmulas
-        if not atualizar_formulas(cursor, user_id):
-            st.error("Erro ao atualizar fórmulas!")
+        # Resultados do usuário: pré-carga em segundo plano (motor/precarga.py)
+        # ou recálculo das fórmulas agora, se os dados mudaram desde então
+        try:
+            resultados = precarga.carregar(cursor, user_id)
+        except CicloDependenciaError as e:
+            st.error(f"Erro no template de cálculo: {str(e)}")
             return
         
-        # Garante que existam dados para o usuário
-        new_user(cursor, user_id)
-        
-        # Buscar todos os elementos
-        cursor.execute("""
-            SELECT name_element, type_element, math_element, msg_element,
-                   value_element, select_element, str_element, e_col, e_row,
-                   section, user_id
-            FROM forms_energetica
-            WHERE (type_element = 'titulo' OR type_element = 'pula linha' 
-                  OR type_element = 'call_dados' OR type_element = 'grafico_ae'
-                  OR type_element = 'tabela_ae')
-            AND user_id = ?
-            ORDER BY e_row, e_col
-        """, (user_id,))
-        
-        elements = cursor.fetchall()
+        # Elementos exibidos, já ordenados por row e col
+        elements = [
+            element for element in resultados.elementos['forms_energetica']
+            if element[1] in ('titulo', 'pula linha', 'grafico_ae', 'tabela_ae')
+        ]
         row_elements = {}
         
         # Agrupa elementos por e_row
@@ -305,8 +214,6 @@ def show_results():
                                     titulo(cursor, element)
                                 elif element[1] == 'pula linha':
                                     pula_linha(cursor, element)
-                                elif element[1] == 'call_dados':
-                                    call_dados(cursor, element)
                                 elif element[1] == 'grafico_ae':
                                     grafico_ae(cursor, element)
                         else:
@@ -315,13 +222,14 @@ def show_results():
                                     titulo(cursor, element)
                                 elif element[1] == 'pula linha':
                                     pula_linha(cursor, element)
-                                elif element[1] == 'call_dados':
-                                    call_dados(cursor, element)
                                 elif element[1] == 'grafico_ae':
                                     grafico_ae(cursor, element)
         
     except Exception as e:
         st.error(f"Erro ao carregar resultados: {str(e)}")
+    finally:
+        if 'conn' in locals() and conn:
+            conn.close()
 
 def create_br_ticks(max_value, target_ticks: int = 6):
     """
@@ -474,28 +382,10 @@ def grafico_ae(cursor, element):
         print(f"Erro detalhado: {str(e)}")
 
 def buscar_dados_grafico(cursor, select, user_id):
-    """Busca dados do banco para o gráfico"""
-    dados = []
+    """Busca dados do banco para o gráfico (todos os grupos com uma consulta)"""
     grupos_dados = [grupo.split(',') for grupo in select.split('|')]
-    
-    for grupo in grupos_dados:
-        valores_grupo = []
-        for type_name in grupo:
-            cursor.execute("""
-                SELECT value_element 
-                FROM forms_energetica 
-                WHERE name_element = ? 
-                AND user_id = ?
-                ORDER BY ID_element DESC
-                LIMIT 1
-            """, (type_name.strip(), user_id))
-            
-            result = cursor.fetchone()
-            valor = result[0] if result and result[0] is not None else 0.0
-            valores_grupo.append(valor)
-        dados.append(valores_grupo)
-    
-    return dados
+    grupos = buscar_grupos(cursor, 'forms_energetica', user_id, grupos_dados, precarga.valores(user_id, 'forms_energetica'))
+    return [grupo.tolist() for grupo in grupos]
 
 def tabela_ae(cursor, element):
     """
@@ -512,26 +402,13 @@ def tabela_ae(cursor, element):
             st.warning("Configuração incorreta dos dados da tabela.")
             return
         
-        # Busca valores do banco usando o user_id correto
-        dados = []
-        for ref in valores_ref:
-            ref = ref.strip()
-            cursor.execute("""
-                SELECT value_element 
-                FROM forms_energetica 
-                WHERE name_element = ? 
-                AND user_id = ?
-                ORDER BY ID_element DESC 
-                LIMIT 1
-            """, (ref, user_id))
-            
-            result = cursor.fetchone()
-            if result and result[0] is not None:
-                valor = round(float(result[0]))
-                valor_formatado = f"{valor:,.0f}".replace(',', '.')
-            else:
-                valor_formatado = "0"
-            dados.append(valor_formatado)
+        # Busca valores do banco usando o user_id correto (uma consulta)
+        dados = [
+            f"{round(valor):,.0f}".replace(',', '.')
+            for valor in buscar_serie(
+                cursor, 'forms_energetica', user_id, valores_ref, precarga.valores(user_id, 'forms_energetica')
+            )
+        ]
         
         # Cria DataFrame
         df = pd.DataFrame({
@@ -597,9 +474,9 @@ def buscar_valor_referencia(cursor, referencia, user_id):
     Busca o valor de uma referência específica no banco de dados.
     """
     try:
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT value_element 
-            FROM forms_energetica 
+            FROM {visao('forms_energetica')}
             WHERE name_element = ? AND user_id = ?
         """, (referencia, user_id))
         
@@ -680,11 +557,11 @@ def generate_pdf_content_energetica(cursor, user_id: int):
         elements.append(Spacer(1, 12))  # Reduzido de 20 para 12
 
         # Buscar elementos da tabela e gráficos
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT name_element, type_element, math_element, msg_element,
                    value_element, select_element, str_element, e_col, e_row,
                    section, user_id
-            FROM forms_energetica
+            FROM {visao('forms_energetica')}
             WHERE (type_element = 'tabela_ae' OR type_element = 'grafico_ae')
             AND user_id = ?
             ORDER BY e_row, e_col
@@ -704,24 +581,12 @@ def generate_pdf_content_energetica(cursor, user_id: int):
             select = tabela[5]
             user_id = tabela[10]
             valores_ref = select.split(',')
-            dados = []
-            for ref in valores_ref:
-                ref = ref.strip()
-                cursor.execute("""
-                    SELECT value_element 
-                    FROM forms_energetica 
-                    WHERE name_element = ? 
-                    AND user_id = ?
-                    ORDER BY ID_element DESC 
-                    LIMIT 1
-                """, (ref, user_id))
-                result = cursor.fetchone()
-                if result and result[0] is not None:
-                    valor = round(float(result[0]))
-                    valor_formatado = f"{valor:,.0f}".replace(',', '.')
-                else:
-                    valor_formatado = "0"
-                dados.append(valor_formatado)
+            dados = [
+                f"{round(valor):,.0f}".replace(',', '.')
+                for valor in buscar_serie(
+                    cursor, 'forms_energetica', user_id, valores_ref, precarga.valores(user_id, 'forms_energetica')
+                )
+            ]
             df = pd.DataFrame({
                 'Demandas de energia (MJ/1000kg de café)': [
                     'Total', 'Elétrica', 'Térmica', 'Renovável', 'Fóssil'
@@ -22,6 +22,11 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib import colors
 from config import DB_PATH
+from banco.conexao import conexao, obter_conexao
+from banco import escrita
+from banco.series import buscar_serie
+from banco import cenarios as cenarios_salvos
+from banco.valores import visao
 
 # Configurações centralizadas para subtítulos
 def get_subtitle_configs():
@@ -76,9 +81,14 @@ def get_pages_config():
         }
     }
 
-from datetime import date
+from datetime import date, datetime
 from paginas.monitor import registrar_acesso
-from paginas.form_model_recalc import verificar_dados_usuario, calculate_formula, atualizar_formulas
+from motor import memoria, precarga
+from motor.grafo import CicloDependenciaError
+from motor.incerteza import AMOSTRAS, DISTRIBUICOES, Distribuicao, percentis
+from motor.modelo import ModeloUsuario
+from motor import sensibilidade
+from motor.meta import buscar_meta
 
 
 def format_br_number(value):
@@ -157,91 +167,6 @@ def pula_linha(cursor, element):
     except Exception as e:
         st.error(f"Erro ao processar pula linha: {str(e)}")
 
-def new_user(cursor, user_id: int, tabela: str):
-    """
-    Cria registros iniciais para um novo usuário na tabela especificada,
-    copiando os dados do template (user_id = 0)
-    
-    Args:
-        cursor: Cursor do banco de dados
-        user_id: ID do usuário
-        tabela: Nome da tabela para criar os registros
-    """
-    try:
-        # Verifica se já existem registros para o usuário
-        cursor.execute(f"""
-            SELECT COUNT(*) FROM {tabela} 
-            WHERE user_id = ?
-        """, (user_id,))
-        
-        if cursor.fetchone()[0] == 0:
-            # Copia dados do template (user_id = 0) para o novo usuário
-            cursor.execute(f"""
-                INSERT INTO {tabela} (
-                    user_id, name_element, type_element, math_element,
-                    msg_element, value_element, select_element, str_element,
-                    e_col, e_row, section
-                )
-                SELECT 
-                    ?, name_element, type_element, math_element,
-                    msg_element, value_element, select_element, str_element,
-                    e_col, e_row, section
-                FROM {tabela}
-                WHERE user_id = 0
-            """, (user_id,))
-            
-            cursor.connection.commit()
-            st.success("Dados iniciais criados com sucesso!")
-            
-    except Exception as e:
-        st.error(f"Erro ao criar dados do usuário: {str(e)}")
-
-def call_dados(cursor, element, tabela_destino: str):
-    """
-    Busca dados na tabela forms_tab e atualiza o value_element do registro atual.
-    
-    Args:
-        cursor: Cursor do banco de dados
-        element: Tupla com dados do elemento
-        tabela_destino: Nome da tabela onde o valor será atualizado
-    """
-    try:
-        name = element[0]        # name_element
-        type_elem = element[1]   # type_element
-        str_value = element[6]   # str_element
-        user_id = element[10]    # user_id
-        
-        if type_elem == 'call_dados':
-            # Busca o valor com CAST para garantir precisão decimal
-            cursor.execute("""
-                SELECT CAST(value_element AS DECIMAL(20, 8))
-                FROM forms_tab 
-                WHERE name_element = ? 
-                AND user_id = ?
-                ORDER BY ID_element DESC
-                LIMIT 1
-            """, (str_value, user_id))
-            
-            result = cursor.fetchone()
-            
-            if result:
-                value = float(result[0]) if result[0] is not None else 0.0
-                
-                # Atualiza usando a tabela passada como parâmetro
-                cursor.execute(f"""
-                    UPDATE {tabela_destino}
-                    SET value_element = CAST(? AS DECIMAL(20, 8))
-                    WHERE name_element = ? 
-                    AND user_id = ?
-                """, (value, name, user_id))
-                
-                cursor.connection.commit()
-            else:
-                st.warning(f"Valor não encontrado na tabela forms_tab para {str_value} (user_id: {user_id})")
-                
-    except Exception as e:
-        st.error(f"Erro ao processar call_dados: {str(e)}")
-
 def create_br_ticks(max_value, target_ticks: int = 6):
     """
     Gera ticks "bonitos" (nice numbers) e define o maior tick como o primeiro múltiplo
@@ -338,24 +263,9 @@ def grafico_barra(cursor, element):
         type_names = select.split('|')
         labels = rotulos.split('|')
         
-        # Lista para armazenar os valores
-        valores = []
-        
-        # Busca os valores para cada type_name no banco
-        for type_name in type_names:
-            tabela = st.session_state.tabela_escolhida
-            cursor.execute(f"""
-                SELECT value_element 
-                FROM {tabela}
-                WHERE name_element = ? 
-                AND user_id = ?
-                ORDER BY ID_element DESC
-                LIMIT 1
-            """, (type_name.strip(), user_id))
-            
-            result = cursor.fetchone()
-            valor = result[0] if result and result[0] is not None else 0.0
-            valores.append(valor)
+        # Busca os valores de todos os type_names (pré-carga ou uma consulta)
+        tabela = st.session_state.tabela_escolhida
+        valores = buscar_serie(cursor, tabela, user_id, type_names, precarga.valores(user_id, tabela)).tolist()
         
         # Define a cor das barras
         cor = section if section else '#1f77b4'  # azul padrão se não houver cor definida
@@ -374,8 +284,12 @@ def grafico_barra(cursor, element):
                 '>{msg}</p>
             """, unsafe_allow_html=True)
         
+        # Faixas da análise de incerteza (P5, P50, P95), quando houver
+        faixas = faixas_incerteza(user_id, st.session_state.tabela_escolhida)
+        faixas = [faixas.get(type_name.strip()) for type_name in type_names]
+        
         # Encontra o valor máximo para criar ticks brasileiros
-        max_value = max(valores) if valores else 0
+        max_value = max(valores + [f[2] for f in faixas if f]) if valores else 0
         tick_vals, tick_texts = create_br_ticks(max_value)
         
         # Cria o gráfico usando plotly express
@@ -385,6 +299,24 @@ def grafico_barra(cursor, element):
             title=None,  # Remove título do plotly pois já usamos markdown
             color_discrete_sequence=cores
         )
+        # Mediana e faixa P5-P95 ao lado de cada barra
+        if any(faixas):
+            fig.add_trace(go.Scatter(
+                x=[label for label, f in zip(labels, faixas) if f],
+                y=[f[1] for f in faixas if f],
+                mode='markers',
+                marker=dict(symbol='diamond', size=9, color='#1E1E1E'),
+                error_y=dict(
+                    type='data',
+                    symmetric=False,
+                    array=[f[2] - f[1] for f in faixas if f],
+                    arrayminus=[f[1] - f[0] for f in faixas if f],
+                    color='#1E1E1E',
+                    thickness=1.5,
+                    width=8,
+                ),
+            ))
+        
         # Desabilita tooltips/hover nos traços
         fig.update_traces(hoverinfo='skip', hovertemplate=None)
         
@@ -487,23 +419,13 @@ def tabela_dados(cursor, element):
             st.error("Número de rótulos diferente do número de valores")
             return
             
-        # Lista para armazenar os valores
-        valores = []
-        
-        # Busca os valores para cada type_name
-        for type_name in type_names:
-            cursor.execute("""
-                SELECT value_element 
-                FROM forms_resultados 
-                WHERE name_element = ? 
-                AND user_id = ?
-                ORDER BY ID_element DESC
-                LIMIT 1
-            """, (type_name.strip(), user_id))
-            
-            result = cursor.fetchone()
-            valor = format_br_number(result[0]) if result and result[0] is not None else '0,00'
-            valores.append(valor)
+        # Busca os valores de todos os type_names (pré-carga ou uma consulta)
+        valores = [
+            format_br_number(valor)
+            for valor in buscar_serie(
+                cursor, 'forms_resultados', user_id, type_names, precarga.valores(user_id, 'forms_resultados')
+            )
+        ]
         
         # Criar DataFrame com os dados
         df = pd.DataFrame({
@@ -580,22 +502,13 @@ def gerar_dados_tabela(cursor, elemento, height_pct=100, width_pct=100):
         # Separa os type_names e rótulos
         type_names = str(select).split('|')
         labels = str(rotulos).split('|')
-        valores = []
         
-        # Busca os valores para cada type_name
-        for type_name in type_names:
-            cursor.execute(f"""
-                SELECT name_element, value_element 
-                FROM {st.session_state.tabela_escolhida}
-                WHERE name_element = ? 
-                AND user_id = ?
-                ORDER BY ID_element DESC
-                LIMIT 1
-            """, (type_name.strip(), user_id))
-            
-            result = cursor.fetchone()
-            valor = format_br_number(result[1]) if result and result[1] is not None else '0,00'
-            valores.append(valor)
+        # Busca os valores de todos os type_names (pré-carga ou uma consulta)
+        tabela = st.session_state.tabela_escolhida
+        valores = [
+            format_br_number(valor)
+            for valor in buscar_serie(cursor, tabela, user_id, type_names, precarga.valores(user_id, tabela))
+        ]
         
         # Retornar dados formatados para a tabela
         return {
@@ -634,20 +547,10 @@ def gerar_dados_grafico(cursor, elemento, tabela_escolhida: str, height_pct=100,
             return None
         type_names = str(select).split('|')
         labels = str(rotulos).split('|')
-        valores = []
-        # Busca os valores para cada type_name
-        for type_name in type_names:
-            cursor.execute(f"""
-                SELECT value_element 
-                FROM {tabela_escolhida}
-                WHERE name_element = ? 
-                AND user_id = ?
-                ORDER BY ID_element DESC
-                LIMIT 1
-            """, (type_name.strip(), user_id))
-            result = cursor.fetchone()
-            valor = float(result[0]) if result and result[0] is not None else 0.0
-            valores.append(valor)
+        # Busca os valores de todos os type_names (pré-carga ou uma consulta)
+        valores = buscar_serie(
+            cursor, tabela_escolhida, user_id, type_names, precarga.valores(user_id, tabela_escolhida)
+        ).tolist()
         cor = section if section else '#1f77b4'
         cores = [cor] * len(valores)
         # Ajustar base_width para ocupar mais da largura da página A4
@@ -730,20 +633,12 @@ def subtitulo(titulo_pagina: str):
                     msg_placeholder = st.empty()
                     msg_placeholder.info("Gerando PDF... Por favor, aguarde.")
                     
-                    for _ in range(3):
-                        try:
-                            conn = sqlite3.connect(DB_PATH, timeout=20)
-                            cursor = conn.cursor()
-                            break
-                        except sqlite3.OperationalError as e:
-                            if "database is locked" in str(e):
-                                time.sleep(1)
-                                continue
-                            raise e
-                    else:
-                        st.error("Não foi possível conectar ao banco de dados. Tente novamente.")
-                        return
+                    # Leitura: conexão somente leitura, não espera pelo escritor
+                    conn = obter_conexao(somente_leitura=True)
+                    cursor = conn.cursor()
                     
+                    # Resultados conferidos com os dados atuais antes do PDF
+                    precarga.carregar(cursor, st.session_state.user_id)
                     buffer = generate_pdf_content(
                         cursor, 
                         st.session_state.user_id,
@@ -751,7 +646,6 @@ def subtitulo(titulo_pagina: str):
                     )
                     
                     if buffer:
-                        conn.close()
                         msg_placeholder.success("PDF gerado com sucesso!")
                         
                         # Gera nome do arquivo baseado no subtítulo
@@ -845,7 +739,7 @@ def generate_pdf_content(cursor, user_id: int, tabela_escolhida: str):
             bottomMargin=36
         )
 
-        with sqlite3.connect(DB_PATH, timeout=20) as pdf_conn:
+        with conexao(somente_leitura=True) as pdf_conn:
             pdf_cursor = pdf_conn.cursor()
             elements = []
             styles = getSampleStyleSheet()
@@ -942,7 +836,7 @@ def generate_pdf_content(cursor, user_id: int, tabela_escolhida: str):
                 SELECT name_element, type_element, math_element, msg_element,
                        value_element, select_element, str_element, e_col, e_row,
                        section, user_id
-                FROM {tabela_escolhida}
+                FROM {visao(tabela_escolhida)}
                 WHERE (type_element = 'tabela' OR type_element = 'grafico')
                 AND user_id = ?
                 ORDER BY e_row, e_col
@@ -1055,6 +949,414 @@ def generate_pdf_content(cursor, user_id: int, tabela_escolhida: str):
         st.error(f"Erro ao gerar conteúdo do PDF: {str(e)}")
         return None
 
+def entradas_numericas(cursor):
+    """
+    Células input da forms_tab com o rótulo exibido no formulário
+    (último título da mesma seção e coluna acima da célula).
+
+    Returns:
+        list: (name_element, rótulo) na ordem do formulário
+    """
+    cursor.execute("""
+        SELECT name_element, type_element, msg_element, e_row, e_col, section
+        FROM forms_tab
+        WHERE user_id = 0 AND type_element IN ('input', 'titulo')
+        ORDER BY section, e_col, e_row
+    """)
+    titulos = {}
+    entradas = []
+    for name, tipo, msg, e_row, e_col, section in cursor.fetchall():
+        if tipo == 'titulo':
+            titulos[(section, e_col)] = (msg or '').strip()
+        elif name and name.strip():
+            rotulo = titulos.get((section, e_col), '')
+            entradas.append((name.strip(), f"{name.strip()} - {rotulo[:60]}" if rotulo else name.strip()))
+    return sorted(entradas, key=lambda entrada: entrada[0])
+
+
+def refs_call_dados(cursor, tabela, template):
+    """
+    Células call_dados de uma tabela de resultados ligadas a células da forms_tab.
+
+    Returns:
+        list: (name_element, rótulo, célula da forms_tab)
+    """
+    cursor.execute(f"""
+        SELECT name_element, msg_element, str_element
+        FROM {tabela}
+        WHERE user_id = 0 AND type_element = 'call_dados'
+        ORDER BY ID_element
+    """)
+    return [
+        (name, (msg or name).split('|')[0].strip(), ref.strip())
+        for name, msg, ref in cursor.fetchall()
+        if ref and ref.strip() in template.indice
+    ]
+
+
+def faixas_incerteza(user_id, tabela):
+    """Faixas (P5, P50, P95) da última simulação Monte Carlo do usuário nesta tabela"""
+    simulacao = st.session_state.get('incerteza', {}).get((user_id, tabela))
+    return simulacao['faixas'] if simulacao else {}
+
+
+def painel_ativo(tabela_escolhida, prefixo):
+    """
+    Chave no topo de um painel de análise: desligada, o painel não consulta
+    o banco nem calcula nada (o conteúdo de um expander fechado também é
+    executado a cada execução da página).
+    """
+    return st.toggle("Ativar", key=f"{prefixo}_ativo_{tabela_escolhida}")
+
+@st.fragment
+def painel_incerteza(user_id, tabela_escolhida, modelo):
+    """
+    Análise de incerteza (Monte Carlo): o usuário atribui distribuições às
+    células de entrada e os gráficos passam a exibir a faixa P5-P95 de cada
+    barra. A simulação é calculada em memória (motor/incerteza.py) e não
+    grava no banco; é descartada quando os dados do usuário mudam.
+    Fragmento: os widgets do painel reexecutam só o painel; a página inteira
+    só é redesenhada quando as faixas dos gráficos mudam.
+    """
+    try:
+        simulacoes = st.session_state.setdefault('incerteza', {})
+        chave = (user_id, tabela_escolhida)
+
+        impressao = memoria.impressao_digital(modelo)
+        if chave in simulacoes and simulacoes[chave]['impressao'] != impressao:
+            del simulacoes[chave]
+
+        with st.expander("Análise de Incerteza (Monte Carlo)", expanded=False):
+            if not painel_ativo(tabela_escolhida, "mc"):
+                return
+            with conexao(somente_leitura=True) as conn:
+                cursor = conn.cursor()
+                entradas = dict(entradas_numericas(cursor))
+                refs = {
+                    name: ref for name, _, ref in refs_call_dados(cursor, tabela_escolhida, modelo.template)
+                }
+            escolhidas = st.multiselect(
+                "Células de entrada com incerteza",
+                options=list(entradas),
+                format_func=lambda nome: entradas[nome],
+                key=f"mc_celulas_{tabela_escolhida}",
+            )
+
+            distribuicoes = {}
+            for nome in escolhidas:
+                atual = float(modelo.valores[modelo.slot(nome)])
+                variacao = abs(atual) * 0.1
+                cols = st.columns([3, 2, 2, 2, 2])
+                cols[0].markdown(f"**{entradas[nome]}**")
+                tipo = cols[1].selectbox(
+                    "Distribuição", list(DISTRIBUICOES), key=f"mc_tipo_{tabela_escolhida}_{nome}"
+                )
+                padroes = {
+                    'normal': (atual, variacao),
+                    'triangular': (atual - variacao, atual, atual + variacao),
+                    'uniforme': (atual - variacao, atual + variacao),
+                }[tipo]
+                parametros = tuple(
+                    cols[2 + i].number_input(
+                        parametro, value=padrao, format="%.4f",
+                        key=f"mc_{parametro}_{tabela_escolhida}_{nome}",
+                    )
+                    for i, (parametro, padrao) in enumerate(zip(DISTRIBUICOES[tipo], padroes))
+                )
+                try:
+                    distribuicoes[nome] = Distribuicao(tipo, parametros)
+                except ValueError as e:
+                    st.warning(f"{nome}: {str(e)}")
+
+            amostras = st.number_input(
+                "Número de amostras", min_value=100, max_value=100000, value=AMOSTRAS, step=1000,
+                key=f"mc_amostras_{tabela_escolhida}",
+            )
+
+            col1, col2 = st.columns(2)
+            if col1.button("Simular", key=f"mc_simular_{tabela_escolhida}",
+                           disabled=not distribuicoes or len(distribuicoes) != len(escolhidas)):
+                inicio = time.perf_counter()
+                resultado = percentis(modelo, distribuicoes, sorted(set(refs.values())), int(amostras))
+                simulacoes[chave] = {
+                    'impressao': impressao,
+                    'faixas': {name: resultado[ref] for name, ref in refs.items()},
+                    'amostras': int(amostras),
+                    'duracao': time.perf_counter() - inicio,
+                }
+                st.rerun()  # página inteira: os gráficos passam a exibir as faixas
+            if chave in simulacoes:
+                if col2.button("Remover faixas", key=f"mc_remover_{tabela_escolhida}"):
+                    del simulacoes[chave]
+                    st.rerun()
+                simulacao = simulacoes[chave]
+                if 'amostras' in simulacao:
+                    st.success(
+                        f"{simulacao['amostras']} amostras calculadas em {simulacao['duracao']:.2f} s"
+                    )
+                st.caption("Os gráficos exibem a mediana (losango) e a faixa P5-P95 de cada barra.")
+
+    except Exception as e:
+        st.error(f"Erro na análise de incerteza: {str(e)}")
+
+@st.fragment
+def painel_sensibilidade(user_id, tabela_escolhida, modelo):
+    """
+    Análise de sensibilidade: gráfico de tornado com as entradas que mais
+    alteram o indicador escolhido, para uma variação de ±X% em cada entrada.
+    As derivadas de todas as entradas são calculadas em uma única passada
+    (motor/sensibilidade.py), sem gravar no banco, e guardadas na sessão
+    enquanto os dados do usuário, o indicador e a variação forem os mesmos.
+    """
+    try:
+        with st.expander("Análise de Sensibilidade", expanded=False):
+            if not painel_ativo(tabela_escolhida, "sens"):
+                return
+            with conexao(somente_leitura=True) as conn:
+                cursor = conn.cursor()
+                indicadores = refs_call_dados(cursor, tabela_escolhida, modelo.template)
+                entradas = dict(entradas_numericas(cursor))
+            if not indicadores:
+                st.info("Nenhum indicador disponível nesta simulação.")
+                return
+
+            rotulos = {ref: rotulo for _, rotulo, ref in indicadores}
+            opcoes = list(rotulos)
+            padrao = next((i for i, ref in enumerate(opcoes) if 'Total' in rotulos[ref] and 'GEE' in rotulos[ref]), 0)
+
+            col1, col2 = st.columns([3, 1])
+            saida = col1.selectbox(
+                "Indicador", opcoes, index=padrao, format_func=lambda ref: rotulos[ref],
+                key=f"sens_saida_{tabela_escolhida}",
+            )
+            variacao = col2.number_input(
+                "Variação (%)", min_value=1, max_value=100, value=int(sensibilidade.VARIACAO * 100),
+                key=f"sens_variacao_{tabela_escolhida}",
+            )
+
+            tornados = st.session_state.setdefault('sensibilidade', {})
+            chave = (memoria.impressao_digital(modelo), saida, variacao)
+            if tornados.get(tabela_escolhida, (None,))[0] != chave:
+                tornados[tabela_escolhida] = (chave, sensibilidade.tornado(modelo, saida, variacao=variacao / 100))
+            barras = tornados[tabela_escolhida][1]
+            if not barras:
+                st.info("O indicador não depende das entradas preenchidas (valor atual nulo ou constante).")
+                return
+
+            base = modelo.valor(saida)
+            barras = list(reversed(barras))  # maior efeito no topo
+            nomes = [entradas.get(nome, nome) for nome, *_ in barras]
+
+            fig = go.Figure()
+            fig.add_trace(go.Bar(
+                y=nomes, x=[baixo - base for _, baixo, _, _ in barras], base=base,
+                orientation='h', name=f"-{variacao}%", marker_color='#4C9F70',
+                hovertemplate="%{y}: %{x:,.2f}<extra></extra>",
+            ))
+            fig.add_trace(go.Bar(
+                y=nomes, x=[alto - base for _, _, alto, _ in barras], base=base,
+                orientation='h', name=f"+{variacao}%", marker_color='#D95F02',
+                hovertemplate="%{y}: %{x:,.2f}<extra></extra>",
+            ))
+            fig.update_layout(
+                barmode='overlay',
+                height=max(300, 45 * len(barras)),
+                margin=dict(l=10, r=10, t=30, b=10),
+                xaxis=dict(title=rotulos[saida], showgrid=True, gridcolor='#E0E0E0'),
+                legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
+                shapes=[dict(type='line', x0=base, x1=base, yref='paper', y0=0, y1=1,
+                             line=dict(color='#1E1E1E', width=1))],
+            )
+            st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
+            st.caption(
+                f"Valor atual: {format_br_number(base)}. Efeito linear de uma variação de "
+                f"±{variacao}% em cada entrada (elasticidade = variação relativa do indicador "
+                "por variação relativa da entrada)."
+            )
+            st.dataframe(
+                pd.DataFrame(
+                    [(entradas.get(nome, nome), elasticidade) for nome, _, _, elasticidade in reversed(barras)],
+                    columns=["Entrada", "Elasticidade"],
+                ),
+                hide_index=True, use_container_width=True,
+            )
+
+    except Exception as e:
+        st.error(f"Erro na análise de sensibilidade: {str(e)}")
+
+@st.fragment
+def painel_meta(user_id, tabela_escolhida, modelo):
+    """
+    Busca de meta: valor de uma entrada que leva o indicador escolhido ao
+    valor alvo (motor/meta.py). O cálculo é feito em memória, apenas ao
+    clicar em Buscar; o banco só é alterado quando o usuário aplica o valor
+    encontrado.
+    """
+    try:
+        with st.expander("Busca de Meta", expanded=False):
+            if not painel_ativo(tabela_escolhida, "meta"):
+                return
+            with conexao(somente_leitura=True) as conn:
+                cursor = conn.cursor()
+                indicadores = refs_call_dados(cursor, tabela_escolhida, modelo.template)
+                entradas = dict(entradas_numericas(cursor))
+            if not indicadores:
+                st.info("Nenhum indicador disponível nesta simulação.")
+                return
+
+            rotulos = {ref: rotulo for _, rotulo, ref in indicadores}
+
+            col1, col2 = st.columns(2)
+            saida = col1.selectbox(
+                "Indicador", list(rotulos), format_func=lambda ref: rotulos[ref],
+                key=f"meta_saida_{tabela_escolhida}",
+            )
+            entrada = col2.selectbox(
+                "Entrada a ajustar", list(entradas), format_func=lambda nome: entradas[nome],
+                key=f"meta_entrada_{tabela_escolhida}",
+            )
+            col1, col2 = st.columns(2)
+            col1.metric("Valor atual do indicador", format_br_number(modelo.valor(saida)))
+            alvo = col2.number_input(
+                "Valor alvo", value=float(modelo.valor(saida)), format="%.4f",
+                key=f"meta_alvo_{tabela_escolhida}",
+            )
+
+            chave = f"meta_resultado_{tabela_escolhida}"
+            if st.button("Buscar", key=f"meta_buscar_{tabela_escolhida}"):
+                try:
+                    st.session_state[chave] = buscar_meta(modelo, entrada, saida, alvo)
+                except ValueError as e:
+                    st.session_state.pop(chave, None)
+                    st.warning(str(e))
+                except ArithmeticError as e:
+                    st.session_state.pop(chave, None)
+                    st.warning(f"Não foi possível calcular o indicador para esta entrada: {str(e)}")
+
+            resultado = st.session_state.get(chave)
+            if resultado is None or (resultado.entrada, resultado.saida) != (entrada, saida):
+                return
+
+            texto = (
+                f"{resultado.mensagem}: {entradas.get(entrada, entrada)} = "
+                f"**{resultado.valor:,.4f}** (atual: {modelo.valor(entrada):,.4f}) → "
+                f"{rotulos[saida]} = {resultado.obtido:,.4f} "
+                f"({resultado.iteracoes} iterações, {resultado.duracao_ms:.1f} ms)"
+            )
+            if resultado.convergiu:
+                st.success(texto)
+            else:
+                st.warning(texto)
+
+            # Valor sem convergência só é aplicado com confirmação explícita
+            confirmado = resultado.convergiu or st.checkbox(
+                "Aplicar mesmo assim o valor mais próximo (meta não atingida)",
+                key=f"meta_confirmar_{tabela_escolhida}",
+            )
+            if st.button("Aplicar valor", type="primary", disabled=not confirmado,
+                         key=f"meta_aplicar_{tabela_escolhida}"):
+                modelo.definir(entrada, resultado.valor)
+                modelo.propagar([entrada])
+                escrita.executar(modelo.salvar)
+                del st.session_state[chave]
+                registrar_acesso(
+                    user_id,
+                    "resultados",
+                    f"Busca de meta aplicada: {entrada} = {resultado.valor}"
+                )
+                st.rerun()
+
+    except Exception as e:
+        st.error(f"Erro na busca de meta: {str(e)}")
+
+@st.fragment
+def painel_cenarios(user_id, tabela_escolhida, modelo):
+    """
+    Cenários nomeados: o usuário salva os dados atuais com um nome (apenas as
+    entradas diferentes do template), ativa um cenário salvo (recálculo
+    incremental das células afetadas) e compara cenários lado a lado,
+    calculados em uma única passada vetorizada (banco/cenarios.py). A
+    comparação fica na sessão enquanto os dados e os cenários forem os mesmos.
+    """
+    try:
+        with st.expander("Cenários", expanded=False):
+            if not painel_ativo(tabela_escolhida, "cen"):
+                return
+            with conexao(somente_leitura=True) as conn:
+                cursor = conn.cursor()
+                col1, col2 = st.columns([3, 1])
+                nome = col1.text_input("Nome do cenário", key=f"cen_nome_{tabela_escolhida}")
+                col2.markdown("<div style='height: 28px'></div>", unsafe_allow_html=True)
+                if col2.button("Salvar dados atuais", key=f"cen_salvar_{tabela_escolhida}"):
+                    if not nome.strip():
+                        st.warning("Informe o nome do cenário.")
+                    else:
+                        escrita.executar(
+                            cenarios_salvos.salvar, user_id, nome.strip(),
+                            cenarios_salvos.entradas_gravadas(cursor, user_id, modelo.template),
+                            datetime.now().strftime('%d/%m/%Y %H:%M'),
+                        )
+                        registrar_acesso(user_id, "resultados", f"Cenário salvo: {nome.strip()}")
+                        st.rerun()
+
+                salvos = cenarios_salvos.listar(cursor, user_id)
+                if not salvos:
+                    st.info("Nenhum cenário salvo.")
+                    return
+
+                descricoes = {
+                    cenario_id: f"{nome} ({celulas} células alteradas, {criado_em})"
+                    for cenario_id, nome, criado_em, celulas in salvos
+                }
+                nomes = {cenario_id: nome for cenario_id, nome, _, _ in salvos}
+
+                escolhido = st.selectbox(
+                    "Cenário salvo", list(descricoes), format_func=descricoes.get,
+                    key=f"cen_escolhido_{tabela_escolhida}",
+                )
+                col1, col2 = st.columns(2)
+                if col1.button("Ativar cenário", key=f"cen_ativar_{tabela_escolhida}"):
+                    novo = cenarios_salvos.carregar(cursor, [escolhido])[escolhido]
+                    atual = cenarios_salvos.entradas_gravadas(cursor, user_id, modelo.template)
+                    cenarios_salvos.ativar(modelo, atual, novo)
+                    escrita.executar(modelo.salvar)
+                    registrar_acesso(user_id, "resultados", f"Cenário ativado: {nomes[escolhido]}")
+                    st.rerun()
+                if col2.button("Excluir cenário", key=f"cen_excluir_{tabela_escolhida}"):
+                    escrita.executar(cenarios_salvos.excluir, user_id, escolhido)
+                    st.rerun()
+
+                comparados = st.multiselect(
+                    "Comparar com os dados atuais", list(descricoes), format_func=nomes.get,
+                    key=f"cen_comparar_{tabela_escolhida}",
+                )
+                if comparados:
+                    indicadores = refs_call_dados(cursor, tabela_escolhida, modelo.template)
+                    comparacoes = st.session_state.setdefault('cenarios', {})
+                    chave = (
+                        memoria.impressao_digital(modelo),
+                        tuple(descricoes[cenario_id] for cenario_id in comparados),
+                        tuple(comparados),
+                    )
+                    if comparacoes.get(tabela_escolhida, (None,))[0] != chave:
+                        deltas = cenarios_salvos.carregar(cursor, comparados)
+                        comparacoes[tabela_escolhida] = (chave, cenarios_salvos.comparar(
+                            ModeloUsuario.carregar(cursor, 0, modelo.template),
+                            [cenarios_salvos.entradas_gravadas(cursor, user_id, modelo.template)]
+                            + [deltas[cenario_id] for cenario_id in comparados],
+                            [ref for _, _, ref in indicadores],
+                        ))
+                    resultado = comparacoes[tabela_escolhida][1]
+                    df = pd.DataFrame(
+                        resultado.T,
+                        index=[rotulo for _, rotulo, _ in indicadores],
+                        columns=["Dados atuais"] + [nomes[cenario_id] for cenario_id in comparados],
+                    )
+                    st.dataframe(df.map(format_br_number), use_container_width=True)
+
+    except Exception as e:
+        st.error(f"Erro nos cenários: {str(e)}")
+
 def show_results(tabela_escolhida: str, titulo_pagina: str, user_id: int):
     """
     Função principal para exibir a interface web
@@ -1070,40 +1372,35 @@ def show_results(tabela_escolhida: str, titulo_pagina: str, user_id: int):
         # Adiciona o subtítulo antes do conteúdo principal
         subtitulo(titulo_pagina)
         
-        # Estabelece conexão com retry
-        for _ in range(3):
-            try:
-                conn = sqlite3.connect(DB_PATH, timeout=20)
-                cursor = conn.cursor()
-                break
-            except sqlite3.OperationalError as e:
-                if "database is locked" in str(e):
-                    time.sleep(1)
-                    continue
-                raise e
-        else:
-            st.error("Não foi possível conectar ao banco de dados. Tente novamente.")
-            return
+        # Conexão somente leitura; as gravações vão para o escritor único (banco/escrita.py)
+        conn = obter_conexao(somente_leitura=True)
+        cursor = conn.cursor()
             
-        # 1. Verifica se usuário tem dados em forms_tab
-        verificar_dados_usuario(cursor, user_id)
-        
-        # 2. Atualiza todas as fórmulas e verifica o resultado
-        if not atualizar_formulas(cursor, user_id):
-            st.error("Erro ao atualizar fórmulas!")
+        # 1. Resultados do usuário: pré-carga feita em segundo plano após a
+        # última gravação (motor/precarga.py) ou, se os dados mudaram desde
+        # então, recálculo das fórmulas agora
+        try:
+            resultados = precarga.carregar(cursor, user_id)
+        except CicloDependenciaError as e:
+            st.error(f"Erro no template de cálculo: {str(e)}")
             return
-
-        # 3. Verifica/inicializa dados na tabela escolhida
-        new_user(cursor, user_id, tabela_escolhida)
-        conn.commit()
         
-        # 4. Registra acesso à página
+        # 2. Registra acesso à página
         registrar_acesso(
             user_id,
             "resultados",
             f"Acesso na simulação {titulo_pagina}"
         )
 
+        # 3. Análises: incerteza (faixas nos gráficos), sensibilidade (tornado),
+        # busca de meta e cenários. Cada painel é um fragmento que recebe uma
+        # cópia do modelo já calculado e só consulta o banco e calcula quando
+        # ligado pelo usuário
+        painel_incerteza(user_id, tabela_escolhida, resultados.modelo.copiar())
+        painel_sensibilidade(user_id, tabela_escolhida, resultados.modelo.copiar())
+        painel_meta(user_id, tabela_escolhida, resultados.modelo.copiar())
+        painel_cenarios(user_id, tabela_escolhida, resultados.modelo.copiar())
+
         # Configuração para esconder elementos durante a impressão e controlar quebra de página
         hide_streamlit_style = """
             <style>
@@ -1126,20 +1423,11 @@ def show_results(tabela_escolhida: str, titulo_pagina: str, user_id: int):
         """
         st.markdown(hide_streamlit_style, unsafe_allow_html=True)
         
-        # Buscar todos os elementos ordenados por row e col
-        cursor.execute(f"""
-            SELECT name_element, type_element, math_element, msg_element,
-                   value_element, select_element, str_element, e_col, e_row,
-                   section, user_id
-            FROM {tabela_escolhida}
-            WHERE (type_element = 'titulo' OR type_element = 'pula linha' 
-                  OR type_element = 'call_dados' OR type_element = 'grafico'
-                  OR type_element = 'tabela')
-            AND user_id = ?
-            ORDER BY e_row, e_col
-        """, (user_id,))
-        
-        elements = cursor.fetchall()
+        # Elementos exibidos, já ordenados por row e col
+        elements = [
+            element for element in resultados.elementos[tabela_escolhida]
+            if element[1] in ('titulo', 'pula linha', 'grafico', 'tabela')
+        ]
         
         # Contador para gráficos
         grafico_count = 0
@@ -1186,8 +1474,6 @@ def show_results(tabela_escolhida: str, titulo_pagina: str, user_id: int):
                                     titulo(cursor, element)
                                 elif element[1] == 'pula linha':
                                     pula_linha(cursor, element)
-                                elif element[1] == 'call_dados':
-                                    call_dados(cursor, element, tabela_escolhida)
                         else:
                             with col2:
                                 if element[1] == 'grafico':
@@ -1199,8 +1485,6 @@ def show_results(tabela_escolhida: str, titulo_pagina: str, user_id: int):
                                     titulo(cursor, element)
                                 elif element[1] == 'pula linha':
                                     pula_linha(cursor, element)
-                                elif element[1] == 'call_dados':
-                                    call_dados(cursor, element, tabela_escolhida)
         
     except Exception as e:
         st.error(f"Erro ao carregar resultados: {str(e)}")
@@ -1233,24 +1517,12 @@ def tabela_dados_sem_titulo(cursor, element):
             st.error("Número de rótulos diferente do número de valores")
             return
             
-        # Lista para armazenar os valores
-        valores = []
-        
-        # Busca os valores para cada type_name
-        for type_name in type_names:
-            tabela = st.session_state.tabela_escolhida  # Pega a tabela da sessão
-            cursor.execute(f"""
-                SELECT value_element 
-                FROM {tabela}
-                WHERE name_element = ? 
-                AND user_id = ?
-                ORDER BY ID_element DESC
-                LIMIT 1
-            """, (type_name.strip(), user_id))
-            
-            result = cursor.fetchone()
-            valor = format_br_number(result[0]) if result and result[0] is not None else '0,00'
-            valores.append(valor)
+        # Busca os valores de todos os type_names (pré-carga ou uma consulta)
+        tabela = st.session_state.tabela_escolhida
+        valores = [
+            format_br_number(valor)
+            for valor in buscar_serie(cursor, tabela, user_id, type_names, precarga.valores(user_id, tabela))
+        ]
         
         # Criar DataFrame com os dados
         df = pd.DataFrame({
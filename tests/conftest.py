@@ -0,0 +1,64 @@
+# Arquivo: tests/conftest.py
+# Data: 17/10/2026
+# Fixtures compartilhadas pelos testes
+# Os testes que usam o banco trabalham em uma cópia do data/calcpc.db com as
+# migrações aplicadas; o banco do projeto nunca é alterado.
+
+import shutil
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from banco.migracoes import aplicar_migracoes
+from motor.template import Template
+
+BANCO_PROJETO = Path(__file__).resolve().parent.parent / 'data' / 'calcpc.db'
+
+
+@pytest.fixture
+def banco_original(tmp_path):
+    """Cópia do banco do projeto sem migrações aplicadas"""
+    caminho = tmp_path / 'calcpc.db'
+    shutil.copyfile(BANCO_PROJETO, caminho)
+    return caminho
+
+
+@pytest.fixture
+def banco(banco_original):
+    """Cópia do banco do projeto com todas as migrações aplicadas"""
+    aplicar_migracoes(banco_original)
+    return banco_original
+
+
+@pytest.fixture
+def cursor(banco):
+    conn = sqlite3.connect(banco)
+    try:
+        yield conn.cursor()
+    finally:
+        conn.close()
+
+
+def montar_template(celulas, versao='teste'):
+    """
+    Template a partir de (name_element, type_element, math_element), sem
+    condicaoH nem call_insumosH.
+    """
+    return Template(versao, [(nome, tipo, math, None, None) for nome, tipo, math in celulas])
+
+
+@pytest.fixture
+def template_simples():
+    """
+    A1, A2: entradas; B1 = A1 * 2; B2 = B1 + A2; B3 = B2 / A1; C1 = A2 * 3
+    (C1 não depende de A1)
+    """
+    return montar_template([
+        ('A1', 'input', None),
+        ('A2', 'input', None),
+        ('B1', 'formula', 'A1 * 2'),
+        ('B2', 'formula', 'B1 + A2'),
+        ('B3', 'formula', 'B2 / A1'),
+        ('C1', 'formula', 'A2 * 3'),
+    ])
@@ -0,0 +1,92 @@
+# Arquivo: tests/test_cenarios.py
+# Data: 17/10/2026
+# Cenários nomeados (banco/cenarios.py): deltas, ativação pela diferença
+# simétrica e comparação vetorizada
+
+import pytest
+
+from banco import cenarios
+from motor.modelo import ModeloUsuario
+from motor.template import carregar_template
+
+
+def modelo_com_padroes(template, padroes, **entradas):
+    """Modelo com os padrões do template e as entradas informadas"""
+    padrao_valores = [padroes.get(nome, 0.0) for nome in template.nomes]
+    modelo = ModeloUsuario(template, 1, list(padrao_valores), [None] * len(template),
+                           padroes=(padrao_valores, [None] * len(template)))
+    for nome, valor in entradas.items():
+        modelo.definir(nome, valor)
+    modelo.recalcular()
+    modelo.alterados.clear()
+    return modelo
+
+
+def test_ativar_toca_so_a_diferenca_simetrica(template_simples):
+    modelo = modelo_com_padroes(template_simples, {'A1': 1.0, 'A2': 1.0}, A1=5.0)
+    alterados = cenarios.ativar(modelo, {'A1': (5.0, None)}, {'A2': (7.0, None)})
+
+    # A1 volta ao padrão e A2 recebe o valor do cenário
+    assert modelo.valor('A1') == 1.0
+    assert modelo.valor('A2') == 7.0
+    assert alterados == {'A1', 'A2', 'B1', 'B2', 'B3', 'C1'}
+    assert modelo.valor('B3') == pytest.approx(9.0)
+
+
+def test_ativar_o_mesmo_delta_nao_altera(template_simples):
+    modelo = modelo_com_padroes(template_simples, {'A1': 1.0}, A1=5.0)
+    delta = {'A1': (5.0, None)}
+    assert cenarios.ativar(modelo, delta, dict(delta)) == set()
+    assert not modelo.alterados
+
+
+def test_ativar_ignora_calculadas_e_celulas_desconhecidas(template_simples):
+    modelo = modelo_com_padroes(template_simples, {'A1': 1.0, 'A2': 1.0})
+    alterados = cenarios.ativar(modelo, {}, {'B1': (50.0, None), 'Z9': (1.0, None), 'A1': (2.0, None)})
+    assert alterados == {'A1', 'B1', 'B2', 'B3'}
+    assert modelo.valor('B1') == 4.0
+
+
+def test_salvar_carregar_e_excluir(cursor):
+    template = carregar_template(cursor)
+    delta = cenarios.entradas_gravadas(cursor, 24, template)
+    assert delta
+
+    cenario_id = cenarios.salvar(cursor, 24, 'Base', delta, '17/10/2026 10:00')
+    assert cenarios.salvar(cursor, 24, 'Base', delta, '17/10/2026 11:00') == cenario_id
+    assert cenarios.listar(cursor, 24) == [(cenario_id, 'Base', '17/10/2026 11:00', len(delta))]
+    assert cenarios.carregar(cursor, [cenario_id]) == {cenario_id: delta}
+
+    cenarios.excluir(cursor, 23, cenario_id)  # de outro usuário: não exclui
+    assert cenarios.listar(cursor, 24)
+    cenarios.excluir(cursor, 24, cenario_id)
+    assert cenarios.listar(cursor, 24) == []
+    assert cenarios.carregar(cursor, [cenario_id]) == {cenario_id: {}}
+
+
+def test_ativar_cenario_reproduz_o_usuario(cursor):
+    template = carregar_template(cursor)
+    usuario = ModeloUsuario.carregar(cursor, 24, template)
+    usuario.recalcular()
+
+    # Usuário sem valores gravados ativa o cenário com os dados do usuário 24
+    modelo = ModeloUsuario.carregar(cursor, 30, template)
+    modelo.recalcular()
+    delta = cenarios.entradas_gravadas(cursor, 24, template)
+    cenarios.ativar(modelo, cenarios.entradas_gravadas(cursor, 30, template), delta)
+    assert modelo.valores == pytest.approx(usuario.valores, rel=1e-12)
+    assert modelo.textos == usuario.textos
+
+
+def test_comparar_igual_aos_modelos_calculados(cursor):
+    template = carregar_template(cursor)
+    delta = cenarios.entradas_gravadas(cursor, 24, template)
+    saidas = [template.nomes[slot] for slot in template.ordem[-5:]]
+
+    resultado = cenarios.comparar(ModeloUsuario.carregar(cursor, 0, template), [{}, delta], saidas)
+    assert resultado.shape == (2, len(saidas))
+
+    for linha, user_id in zip(resultado, (30, 24)):
+        modelo = ModeloUsuario.carregar(cursor, user_id, template)
+        modelo.recalcular()
+        assert linha == pytest.approx([modelo.valor(nome) for nome in saidas], rel=1e-12)
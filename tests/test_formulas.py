@@ -0,0 +1,122 @@
+# Arquivo: tests/test_formulas.py
+# Data: 17/10/2026
+# Fórmulas compiladas (motor/formulas.py) comparadas com o avaliador antigo
+# (substituição por regex + eval, antes em paginas/form_model.py)
+
+import random
+import re
+
+import numpy as np
+import pytest
+
+from motor.formulas import DIAS_POR_MES, compilar_formula, safe_div
+from motor.modelo import data_para_dias
+from motor.sensibilidade import Dual
+from motor.template import linhas_template
+from conftest import montar_template
+
+
+def avaliar_antigo(texto, valores):
+    """Avaliador antigo: troca as referências pelos valores e avalia o texto"""
+    processada = str(texto)
+    for ref in re.findall(r'(?:Insumos!)?[A-Z]{1,2}[0-9]+', processada):
+        processada = re.sub(r'\b' + re.escape(ref) + r'\b', str(float(valores[ref])), processada)
+    processada = processada.replace(',', '.')
+    processada = re.sub(r'(\d+\.?\d*|\([^)]+\))\s*/\s*(\d+\.?\d*|\([^)]+\))',
+                        r'safe_div(\1, \2)', processada)
+    return float(eval(processada, {'safe_div': safe_div, '__builtins__': None}, {}))
+
+
+def compilar(texto, tipo=None):
+    slots = {}
+    compilada = compilar_formula(texto, lambda ref: slots.setdefault(ref, len(slots)), tipo)
+    return compilada, slots
+
+
+def test_formulas_do_template_iguais_ao_avaliador_antigo(cursor):
+    sorteio = random.Random(17)
+    formulas = [math for _, _, tipo, math, _, _ in linhas_template(cursor)
+                if tipo == 'formula' and math and not re.fullmatch(r'\s*[A-Z]+\d+\s*-\s*[A-Z]+\d+\s*', math)]
+    assert formulas
+
+    for texto in formulas:
+        compilada, slots = compilar(texto)
+        valores = {ref: sorteio.uniform(1, 100) for ref in slots}
+        v = [0.0] * len(slots)
+        for ref, slot in slots.items():
+            v[slot] = valores[ref]
+        assert compilada.avaliar(v) == pytest.approx(avaliar_antigo(texto, valores), rel=1e-12), texto
+
+
+def test_referencias_sem_repeticao_na_ordem_do_texto():
+    compilada, slots = compilar('(B15/B11/1000*F15*D151)*1000 + B15')
+    assert compilada.refs == ('B15', 'B11', 'F15', 'D151')
+    assert compilada.slots == tuple(slots[ref] for ref in compilada.refs)
+
+
+def test_insumos_e_decimal_com_virgula():
+    compilada, slots = compilar('Insumos!D15 * 0,5')
+    assert list(slots) == ['Insumos!D15']
+    assert compilada.avaliar([4.0]) == 2.0
+
+
+def test_divisao_por_zero_resulta_zero():
+    compilada, _ = compilar('A1 / (A2 - A2)')
+    assert compilada.avaliar([5.0, 3.0]) == 0.0
+
+
+def test_formula_vazia_vale_zero():
+    compilada, _ = compilar('')
+    assert compilada.avaliar([]) == 0.0
+
+
+@pytest.mark.parametrize('texto', ['A1 ** 2', 'A1 % 2', '__import__("os")', 'A1 +', 'abs(A1)'])
+def test_construcoes_nao_suportadas(texto):
+    with pytest.raises(ValueError):
+        compilar(texto)
+
+
+def test_diferenca_de_datas_em_meses():
+    tipos = {'A3': 'input_data', 'B3': 'input_data'}
+    compilada, slots = compilar('B3 - A3', tipos.get)
+    inicio, fim = data_para_dias('01/01/2024'), data_para_dias('31/12/2024')
+    v = [0.0] * 2
+    v[slots['A3']], v[slots['B3']] = inicio, fim
+    assert compilada.avaliar(v) == pytest.approx((fim - inicio) / DIAS_POR_MES)
+
+    # Data final antes da inicial: nunca negativa
+    v[slots['A3']], v[slots['B3']] = fim, inicio
+    assert compilada.avaliar(v) == 0.0
+
+
+def test_diferenca_de_datas_em_vetores_e_duais():
+    tipos = {'A3': 'input_data', 'B3': 'input_data'}
+    compilada, slots = compilar('B3 - A3', tipos.get)
+    v = [None, None]
+    v[slots['A3']] = np.array([0.0, 100.0])
+    v[slots['B3']] = np.array([DIAS_POR_MES * 2, 50.0])
+    resultado = compilada.avaliar(v)
+    assert resultado.tolist() == [pytest.approx(2.0), 0.0]
+    assert not np.signbit(resultado).any()
+
+    v[slots['A3']] = Dual(0.0, np.array([0.0]))
+    v[slots['B3']] = Dual(DIAS_POR_MES, np.array([1.0]))
+    resultado = compilada.avaliar(v)
+    assert resultado.valor == pytest.approx(1.0)
+    assert resultado.derivada[0] == pytest.approx(1 / DIAS_POR_MES)
+
+
+def test_subtracao_de_celulas_que_nao_sao_datas():
+    # Slots na ordem do texto: v[0] = B3, v[1] = A3
+    compilada, _ = compilar('B3 - A3', {'A3': 'input', 'B3': 'input'}.get)
+    assert compilada.avaliar([2.0, 5.0]) == -3.0
+    compilada, _ = compilar('B3 - A3')
+    assert compilada.avaliar([2.0, 5.0]) == -3.0
+
+
+def test_template_reaproveita_compilacao_e_congela_slots():
+    template = montar_template([('A1', 'input', None), ('B1', 'formula', 'A1 * 2')])
+    assert template.compilar('A1 * 3') is template.compilar(' A1 * 3 ')
+    with pytest.raises(ValueError):
+        template.compilar('Z99 + 1')
+    assert len(template) == 2
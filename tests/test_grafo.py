@@ -0,0 +1,77 @@
+# Arquivo: tests/test_grafo.py
+# Data: 17/10/2026
+# Ordem topológica e detecção de referências circulares (motor/grafo.py)
+
+import pytest
+
+from motor.grafo import CicloDependenciaError, ordem_topologica
+from motor.template import carregar_template
+from conftest import montar_template
+
+
+def test_dependencias_antes_das_dependentes():
+    dependencias = {'D': ['B', 'C'], 'B': ['A'], 'C': ['B'], 'A': []}
+    ordem = ordem_topologica(dependencias)
+    assert sorted(ordem) == sorted(dependencias)
+    for no, refs in dependencias.items():
+        assert all(ordem.index(ref) < ordem.index(no) for ref in refs)
+
+
+def test_empates_mantem_a_ordem_das_chaves():
+    assert ordem_topologica({'C': [], 'A': [], 'B': []}) == ['C', 'A', 'B']
+
+
+def test_referencias_fora_das_chaves_sao_valores_fixos():
+    # X e Y não são calculadas: não entram na ordem nem a bloqueiam
+    assert ordem_topologica({'B': ['X', 'A'], 'A': ['Y']}) == ['A', 'B']
+
+
+def test_referencia_repetida_conta_uma_vez():
+    assert ordem_topologica({'B': ['A', 'A'], 'A': []}) == ['A', 'B']
+
+
+def test_ciclo_informa_o_caminho():
+    with pytest.raises(CicloDependenciaError) as erro:
+        ordem_topologica({'A': ['C'], 'B': ['A'], 'C': ['B'], 'D': []})
+    ciclo = erro.value.ciclo
+    assert ciclo[0] == ciclo[-1]
+    assert set(ciclo) == {'A', 'B', 'C'}
+    assert 'D' not in str(erro.value)
+
+
+def test_ciclo_de_uma_celula_com_nomes():
+    with pytest.raises(CicloDependenciaError) as erro:
+        ordem_topologica({0: [1], 1: [1]}, nomes=lambda slot: f"B{slot}")
+    assert erro.value.ciclo == ['B1', 'B1']
+
+
+def test_ciclo_e_value_error():
+    # As páginas tratam CicloDependenciaError junto com os erros de valor
+    assert issubclass(CicloDependenciaError, ValueError)
+
+
+def test_template_com_referencia_circular():
+    with pytest.raises(CicloDependenciaError) as erro:
+        montar_template([
+            ('A1', 'input', None),
+            ('B1', 'formula', 'A1 + B2'),
+            ('B2', 'formula', 'B1 * 2'),
+        ])
+    assert set(erro.value.ciclo) == {'B1', 'B2'}
+
+
+def test_afetados_na_ordem_de_calculo(template_simples):
+    slot = template_simples.indice
+    assert template_simples.afetados({slot['A1']}) == [slot['B1'], slot['B2'], slot['B3']]
+    assert template_simples.afetados({slot['A2']}) == [slot['C1'], slot['B2'], slot['B3']]
+    assert template_simples.afetados({slot['C1']}) == []
+
+
+def test_ordem_do_template_do_projeto(cursor):
+    template = carregar_template(cursor)
+    posicao = {slot: pos for pos, slot in enumerate(template.ordem)}
+    assert set(posicao) == set(template.dependencias)
+    for slot, refs in template.dependencias.items():
+        for ref in refs:
+            if ref in template.dependencias:
+                assert posicao[ref] < posicao[slot], template.nomes[slot]
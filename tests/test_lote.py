@@ -0,0 +1,55 @@
+# Arquivo: tests/test_lote.py
+# Data: 17/10/2026
+# Cálculo vetorizado (motor/lote.py) comparado com o modelo de um usuário
+
+import numpy as np
+import pytest
+
+from motor.lote import LoteUsuarios, div_vetorizada
+from motor.modelo import ModeloUsuario
+from motor.sensibilidade import entradas_numericas
+from motor.template import carregar_template
+
+
+def test_div_vetorizada_igual_a_safe_div():
+    resultado = div_vetorizada(np.array([1.0, 2.0, 3.0]), np.array([2.0, 0.0, 1e-11]))
+    assert resultado.tolist() == [0.5, 0.0, 0.0]
+
+
+def test_lote_igual_aos_modelos_por_usuario(cursor):
+    template = carregar_template(cursor)
+    lote = LoteUsuarios.carregar(cursor, template=template)
+    assert 24 in lote.user_ids
+    lote.recalcular()
+
+    for col, user_id in enumerate(lote.user_ids):
+        modelo = ModeloUsuario.carregar(cursor, user_id, template)
+        modelo.recalcular()
+        assert lote.valores[:, col] == pytest.approx(np.array(modelo.valores), rel=1e-12), user_id
+
+
+def test_lote_com_entradas_diferentes_por_coluna(cursor):
+    template = carregar_template(cursor)
+    modelo = ModeloUsuario.carregar(cursor, 24, template)
+    modelo.recalcular()
+    lote = LoteUsuarios.replicar(modelo, 3)
+
+    nome = next(nome for nome in entradas_numericas(template)
+                if modelo.valor(nome) and template.afetados({template.indice[nome]}))
+    slot = template.indice[nome]
+    for col, fator in enumerate((1.0, 2.0, 0.5)):
+        lote.valores[slot, col] = modelo.valor(nome) * fator
+    lote.recalcular()
+
+    for col, fator in enumerate((1.0, 2.0, 0.5)):
+        esperado = modelo.copiar()
+        esperado.definir(nome, modelo.valor(nome) * fator)
+        esperado.recalcular()
+        assert lote.valores[:, col] == pytest.approx(np.array(esperado.valores), rel=1e-12)
+
+
+def test_recalcular_sem_alteracao_nao_marca_celulas(cursor):
+    lote = LoteUsuarios.carregar(cursor, [24])
+    lote.recalcular()
+    lote.alterados[:] = False
+    assert lote.recalcular() == 0
@@ -0,0 +1,61 @@
+# Arquivo: tests/test_memoria.py
+# Data: 17/10/2026
+# Cache LRU dos vetores de resultado (motor/memoria.py)
+
+import pytest
+
+from motor.memoria import CacheResultados, impressao_digital
+from motor.modelo import ModeloUsuario
+
+
+def test_descarta_o_menos_usado():
+    cache = CacheResultados(capacidade=2)
+    cache.guardar('a', (1.0,))
+    cache.guardar('b', (2.0,))
+    assert cache.obter('a') == (1.0,)  # 'a' passa a ser o mais recente
+    cache.guardar('c', (3.0,))
+
+    assert cache.obter('b') is None
+    assert cache.obter('a') == (1.0,)
+    assert cache.obter('c') == (3.0,)
+    estatisticas = cache.estatisticas()
+    assert estatisticas['tamanho'] == 2
+    assert estatisticas['descartes'] == 1
+    assert (estatisticas['acertos'], estatisticas['falhas']) == (3, 1)
+    assert estatisticas['taxa_acerto'] == pytest.approx(75.0)
+
+
+def test_guardar_chave_existente_nao_descarta():
+    cache = CacheResultados(capacidade=2)
+    cache.guardar('a', (1.0,))
+    cache.guardar('b', (2.0,))
+    cache.guardar('a', (4.0,))
+    assert cache.estatisticas()['descartes'] == 0
+    assert cache.obter('a') == (4.0,)
+
+
+def test_impressao_ignora_celulas_calculadas(template_simples):
+    modelo = ModeloUsuario(template_simples, 1, [0.0] * len(template_simples), [None] * len(template_simples))
+    impressao = impressao_digital(modelo)
+    modelo.valores[template_simples.indice['B1']] = 99.0
+    assert impressao_digital(modelo) == impressao
+    modelo.definir('A1', 5.0)
+    assert impressao_digital(modelo) != impressao
+
+
+def test_acerto_aplica_o_vetor_calculado(cursor):
+    cache = CacheResultados()
+    primeiro = ModeloUsuario.carregar(cursor, 24)
+    primeiro.definir('B15', primeiro.valor('B15') + 5)
+    esperado = primeiro.copiar()
+    esperado.recalcular()
+    mudaram = cache.recalcular(primeiro)
+    assert cache.estatisticas()['falhas'] == 1
+
+    # Outro modelo com as mesmas entradas usa o resultado do cache
+    segundo = ModeloUsuario.carregar(cursor, 24)
+    segundo.definir('B15', segundo.valor('B15') + 5)
+    assert cache.recalcular(segundo) == mudaram
+    assert cache.estatisticas()['acertos'] == 1
+    assert segundo.valores == pytest.approx(esperado.valores, rel=1e-12)
+    assert {segundo.template.nomes[slot] for slot in segundo.alterados} >= mudaram
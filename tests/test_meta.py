@@ -0,0 +1,113 @@
+# Arquivo: tests/test_meta.py
+# Data: 17/10/2026
+# Busca de meta (motor/meta.py): convergência, limites da entrada e erros
+
+import math
+
+import pytest
+
+from motor.meta import buscar_meta
+from motor.modelo import ModeloUsuario
+from motor.sensibilidade import entradas_numericas
+from motor.template import carregar_template
+from conftest import montar_template
+
+
+def modelo_calculado(template, **entradas):
+    valores = [0.0] * len(template)
+    for nome, valor in entradas.items():
+        valores[template.indice[nome]] = valor
+    modelo = ModeloUsuario(template, 1, valores, [None] * len(template))
+    modelo.recalcular()
+    modelo.alterados.clear()
+    return modelo
+
+
+def test_saida_linear(template_simples):
+    modelo = modelo_calculado(template_simples, A1=2.0, A2=3.0)
+    resultado = buscar_meta(modelo, 'A1', 'B2', 20.0)
+    assert resultado.convergiu
+    assert resultado.valor == pytest.approx(8.5)
+    assert resultado.obtido == pytest.approx(20.0)
+    assert resultado.iteracoes <= 3
+
+
+def test_saida_nao_linear(template_simples):
+    # B3 = 2 + A2 / A1 = 2,5 com A2 = 3: A1 = 6
+    modelo = modelo_calculado(template_simples, A1=2.0, A2=3.0)
+    resultado = buscar_meta(modelo, 'A1', 'B3', 2.5)
+    assert resultado.convergiu
+    assert resultado.valor == pytest.approx(6.0)
+
+
+def test_modelo_nao_e_alterado(template_simples):
+    modelo = modelo_calculado(template_simples, A1=2.0, A2=3.0)
+    valores = list(modelo.valores)
+    buscar_meta(modelo, 'A1', 'B2', 20.0)
+    assert modelo.valores == valores
+    assert not modelo.alterados
+
+
+def test_limite_maximo(template_simples):
+    modelo = modelo_calculado(template_simples, A1=2.0, A2=3.0)
+    resultado = buscar_meta(modelo, 'A1', 'B2', 20.0, maximo=5.0)
+    assert not resultado.convergiu
+    assert resultado.valor == 5.0
+    assert resultado.obtido == pytest.approx(13.0)
+    assert 'inatingível' in resultado.mensagem
+
+
+def test_limite_minimo(template_simples):
+    # B2 = 1 exigiria A1 = -1
+    modelo = modelo_calculado(template_simples, A1=2.0, A2=3.0)
+    resultado = buscar_meta(modelo, 'A1', 'B2', 1.0)
+    assert not resultado.convergiu
+    assert resultado.valor == 0.0
+    resultado = buscar_meta(modelo, 'A1', 'B2', 1.0, minimo=None)
+    assert resultado.convergiu
+    assert resultado.valor == pytest.approx(-1.0)
+
+
+def test_saida_saturada_nao_estoura():
+    template = montar_template([('A1', 'input', None), ('B1', 'formula', 'A1 / (A1 + 1)')])
+    modelo = modelo_calculado(template, A1=1.0)
+    resultado = buscar_meta(modelo, 'A1', 'B1', 2.0)
+    assert not resultado.convergiu
+    assert math.isfinite(resultado.valor)
+    assert resultado.obtido <= 1.0
+    assert resultado.iteracoes <= 100
+
+
+@pytest.mark.parametrize('entrada, saida', [('B1', 'B2'), ('Z9', 'B2'), ('A1', 'Z9'), ('A1', 'C1')])
+def test_entrada_ou_saida_invalida(template_simples, entrada, saida):
+    modelo = modelo_calculado(template_simples, A1=2.0, A2=3.0)
+    with pytest.raises(ValueError):
+        buscar_meta(modelo, entrada, saida, 1.0)
+
+
+def test_meta_no_template_do_projeto(cursor):
+    template = carregar_template(cursor)
+    modelo = ModeloUsuario.carregar(cursor, 24, template)
+    modelo.recalcular()
+    # Entrada preenchida e uma saída que muda com ela; alvo atingível: a
+    # saída calculada com a entrada 50% maior
+    for entrada in entradas_numericas(template):
+        if not modelo.valor(entrada):
+            continue
+        variado = modelo.copiar()
+        variado.definir(entrada, modelo.valor(entrada) * 1.5)
+        mudaram = sorted(nome for nome in variado.propagar({entrada}) if nome in template.formulas)
+        if mudaram:
+            saida = mudaram[0]
+            alvo = variado.valor(saida)
+            break
+    else:
+        pytest.fail("Nenhuma entrada preenchida com saída dependente")
+
+    resultado = buscar_meta(modelo, entrada, saida, alvo)
+    assert resultado.convergiu
+
+    # O valor encontrado, aplicado ao modelo, leva a saída ao alvo
+    modelo.definir(entrada, resultado.valor)
+    modelo.propagar({entrada})
+    assert modelo.valor(saida) == pytest.approx(alvo, rel=1e-8)
@@ -0,0 +1,67 @@
+# Arquivo: tests/test_migracoes.py
+# Data: 17/10/2026
+# Migrações versionadas (banco/migracoes.py)
+
+import sqlite3
+
+import pytest
+
+from banco import migracoes
+from banco.migracoes import MIGRACOES, aplicar_migracoes, migracoes_pendentes, versao_atual
+
+
+def consultar(caminho, sql):
+    conn = sqlite3.connect(caminho)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def test_aplica_todas_uma_vez(banco_original):
+    conn = sqlite3.connect(banco_original)
+    try:
+        assert migracoes_pendentes(conn.cursor()) == [versao for versao, _, _ in MIGRACOES]
+    finally:
+        conn.close()
+
+    assert aplicar_migracoes(banco_original) == [versao for versao, _, _ in MIGRACOES]
+    assert aplicar_migracoes(banco_original) == []
+
+    conn = sqlite3.connect(banco_original)
+    try:
+        cursor = conn.cursor()
+        assert migracoes_pendentes(cursor) == []
+        assert versao_atual(cursor) == MIGRACOES[-1][0]
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_forms_%'")
+        assert {'idx_forms_tab_user_name', 'idx_forms_insumos_name'} <= {nome for nome, in cursor.fetchall()}
+    finally:
+        conn.close()
+
+
+def test_template_sem_linhas_de_usuario(banco):
+    for tabela in ('forms_tab', 'forms_resultados', 'forms_energetica'):
+        assert consultar(banco, f"SELECT COUNT(*) FROM {tabela} WHERE user_id <> 0") == [(0,)]
+    assert consultar(banco, "SELECT COUNT(*) FROM valores_usuario WHERE user_id = 24")[0][0] > 0
+
+
+def test_migracao_com_erro_e_desfeita(banco_original, monkeypatch):
+    def falhar(cursor):
+        cursor.execute("CREATE TABLE parcial (x INTEGER)")
+        cursor.execute("DELETE FROM forms_tab")
+        raise sqlite3.OperationalError("falha simulada")
+
+    linhas = consultar(banco_original, "SELECT COUNT(*) FROM forms_tab")
+    monkeypatch.setattr(migracoes, 'MIGRACOES', [MIGRACOES[0], (2, "Falha", falhar), MIGRACOES[2]])
+
+    with pytest.raises(sqlite3.OperationalError):
+        aplicar_migracoes(banco_original)
+
+    # A versão 1 ficou gravada; nada da versão 2 e a 3 não foi aplicada
+    assert consultar(banco_original, "SELECT versao FROM schema_versao") == [(1,)]
+    assert consultar(banco_original, "SELECT name FROM sqlite_master WHERE name = 'parcial'") == []
+    assert consultar(banco_original, "SELECT COUNT(*) FROM forms_tab") == linhas
+
+    # Corrigida a migração, a execução seguinte continua da versão 2
+    monkeypatch.setattr(migracoes, 'MIGRACOES', MIGRACOES)
+    assert aplicar_migracoes(banco_original) == [versao for versao, _, _ in MIGRACOES[1:]]
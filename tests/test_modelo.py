@@ -0,0 +1,61 @@
+# Arquivo: tests/test_modelo.py
+# Data: 17/10/2026
+# Recálculo incremental (ModeloUsuario.propagar) comparado com o recálculo
+# completo na ordem topológica
+
+import pytest
+
+from motor.modelo import ModeloUsuario
+from motor.sensibilidade import entradas_numericas
+from motor.template import carregar_template
+
+
+def modelo_simples(template, a1=2.0, a2=3.0):
+    valores = [0.0] * len(template)
+    valores[template.indice['A1']] = a1
+    valores[template.indice['A2']] = a2
+    modelo = ModeloUsuario(template, 1, valores, [None] * len(template))
+    modelo.recalcular()
+    return modelo
+
+
+def test_recalcular(template_simples):
+    modelo = modelo_simples(template_simples)
+    assert [modelo.valor(nome) for nome in ('B1', 'B2', 'B3', 'C1')] == [4.0, 7.0, 3.5, 9.0]
+
+
+def test_propagar_so_recalcula_a_jusante(template_simples):
+    modelo = modelo_simples(template_simples)
+    modelo.alterados.clear()
+    modelo.definir('A1', 4.0)
+    assert modelo.propagar({'A1'}) == {'B1', 'B2', 'B3'}
+    assert modelo.valor('B3') == pytest.approx(11 / 4)
+    assert modelo.valor('C1') == 9.0
+
+
+def test_propagar_para_quando_o_valor_nao_muda(template_simples):
+    modelo = modelo_simples(template_simples)
+    # B3 = (2 * A1 + A2) / A1: com A2 = 0 não depende de A1
+    modelo.definir('A2', 0.0)
+    modelo.propagar({'A2'})
+    modelo.definir('A1', 5.0)
+    assert modelo.propagar({'A1'}) == {'B1', 'B2'}
+
+
+def test_propagar_igual_ao_recalculo_completo(cursor):
+    template = carregar_template(cursor)
+    entradas = [nome for nome in entradas_numericas(template)
+                if template.afetados({template.indice[nome]})]
+    assert entradas
+
+    for fator, nome in enumerate(entradas, start=2):
+        incremental = ModeloUsuario.carregar(cursor, 24, template)
+        incremental.recalcular()
+        completo = incremental.copiar()
+
+        novo = incremental.valor(nome) * fator + 1
+        incremental.definir(nome, novo)
+        incremental.propagar({nome})
+        completo.definir(nome, novo)
+        completo.recalcular()
+        assert incremental.valores == pytest.approx(completo.valores, rel=1e-12), nome
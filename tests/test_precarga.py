@@ -0,0 +1,48 @@
+# Arquivo: tests/test_precarga.py
+# Data: 17/10/2026
+# Validade da pré-carga dos resultados (motor/precarga.py)
+
+import sqlite3
+
+from banco import migracoes
+from motor import precarga
+from motor.modelo import ModeloUsuario
+
+
+def test_impressao_muda_com_os_dados_do_usuario_e_os_resultados(cursor):
+    impressao = precarga.impressao(cursor, 24)
+    assert precarga.impressao(cursor, 24) == impressao
+
+    # Outro usuário grava: a impressão do usuário 24 não muda
+    modelo = ModeloUsuario.carregar(cursor, 30)
+    modelo.definir('B15', modelo.valor('B15') + 1)
+    modelo.salvar(cursor)
+    assert precarga.impressao(cursor, 24) == impressao
+
+    modelo = ModeloUsuario.carregar(cursor, 24)
+    modelo.definir('B15', modelo.valor('B15') + 1)
+    modelo.salvar(cursor)
+    alterada = precarga.impressao(cursor, 24)
+    assert alterada != impressao
+
+    # Edição de uma tabela de resultados pelo CRUD
+    cursor.execute("UPDATE forms_energetica SET msg_element = msg_element WHERE ID_element = "
+                   "(SELECT MIN(ID_element) FROM forms_energetica)")
+    cursor.connection.commit()
+    assert precarga.impressao(cursor, 24) != alterada
+
+
+def test_impressao_antes_das_marcas_de_versao(banco_original, monkeypatch):
+    # Banco migrado até a versão anterior às marcas (hash do conteúdo)
+    monkeypatch.setattr(migracoes, 'MIGRACOES', [m for m in migracoes.MIGRACOES if m[0] < 6])
+    migracoes.aplicar_migracoes(banco_original)
+    conn = sqlite3.connect(banco_original)
+    try:
+        cursor = conn.cursor()
+        impressao = precarga.impressao(cursor, 24)
+        assert isinstance(impressao, str)
+        cursor.execute("UPDATE forms_resultados SET value_element = value_element + 1 WHERE ID_element = "
+                       "(SELECT MIN(ID_element) FROM forms_resultados)")
+        assert precarga.impressao(cursor, 24) != impressao
+    finally:
+        conn.close()
@@ -0,0 +1,97 @@
+# Arquivo: tests/test_sensibilidade.py
+# Data: 17/10/2026
+# Números duais e derivadas em uma passada (motor/sensibilidade.py)
+
+import numpy as np
+import pytest
+
+from motor.modelo import ModeloUsuario
+from motor.sensibilidade import Dual, derivadas, div_dual, entradas_numericas, tornado
+from motor.template import carregar_template
+
+
+def dual(valor, *derivada):
+    return Dual(valor, np.array(derivada, dtype=float))
+
+
+def conferir(resultado, valor, *derivada):
+    assert resultado.valor == pytest.approx(valor)
+    assert resultado.derivada == pytest.approx(np.array(derivada))
+
+
+def test_aritmetica():
+    x, y = dual(3.0, 1.0, 0.0), dual(2.0, 0.0, 1.0)
+    conferir(x + y, 5.0, 1.0, 1.0)
+    conferir(x - y, 1.0, 1.0, -1.0)
+    conferir(x * y, 6.0, 2.0, 3.0)
+    conferir(x / y, 1.5, 0.5, -0.75)
+    conferir(-x, -3.0, -1.0, 0.0)
+    assert +x is x
+    assert float(x) == 3.0
+
+
+def test_aritmetica_com_constantes():
+    x = dual(4.0, 1.0)
+    conferir(x + 1, 5.0, 1.0)
+    conferir(1 + x, 5.0, 1.0)
+    conferir(x - 1, 3.0, 1.0)
+    conferir(10 - x, 6.0, -1.0)
+    conferir(2 * x, 8.0, 2.0)
+    conferir(x / 2, 2.0, 0.5)
+    conferir(8 / x, 2.0, -0.5)
+
+
+def test_divisao_segura():
+    x = dual(4.0, 1.0, 2.0)
+    conferir(div_dual(x, dual(0.0, 1.0, 1.0)), 0.0, 0.0, 0.0)
+    conferir(div_dual(x, 1e-11), 0.0, 0.0, 0.0)
+    conferir(div_dual(3.0, dual(0.0, 1.0, 0.0)), 0.0, 0.0, 0.0)
+    assert div_dual(3.0, 0.0) == 0.0
+    conferir(div_dual(x, 2.0), 2.0, 0.5, 1.0)
+
+
+def test_derivadas_do_modelo_simples(template_simples):
+    valores = [0.0] * len(template_simples)
+    valores[template_simples.indice['A1']] = 2.0
+    valores[template_simples.indice['A2']] = 3.0
+    modelo = ModeloUsuario(template_simples, 1, valores, [None] * len(template_simples))
+    modelo.recalcular()
+
+    # B3 = (2 * A1 + A2) / A1 = 2 + A2 / A1
+    resultado, matriz = derivadas(modelo, ['B3', 'C1'], ['A1', 'A2'])
+    assert resultado == pytest.approx([3.5, 9.0])
+    assert matriz == pytest.approx(np.array([[-3.0 / 4, 1.0 / 2], [0.0, 3.0]]))
+
+
+def test_derivadas_iguais_a_diferencas_finitas(cursor):
+    template = carregar_template(cursor)
+    modelo = ModeloUsuario.carregar(cursor, 24, template)
+    modelo.recalcular()
+    entradas = [nome for nome in entradas_numericas(template) if modelo.valor(nome)]
+    saida = template.nomes[template.ordem[-1]]
+    _, matriz = derivadas(modelo, [saida], entradas)
+    assert matriz.any()
+
+    for nome, derivada in zip(entradas, matriz[0]):
+        passo = abs(modelo.valor(nome)) * 1e-6
+        variado = modelo.copiar()
+        variado.definir(nome, modelo.valor(nome) + passo)
+        variado.recalcular()
+        estimada = (variado.valor(saida) - modelo.valor(saida)) / passo
+        assert derivada == pytest.approx(estimada, rel=1e-4, abs=1e-6), nome
+
+
+def test_tornado_ordenado_pelo_efeito(template_simples):
+    valores = [0.0] * len(template_simples)
+    valores[template_simples.indice['A1']] = 2.0
+    valores[template_simples.indice['A2']] = 3.0
+    modelo = ModeloUsuario(template_simples, 1, valores, [None] * len(template_simples))
+    modelo.recalcular()
+
+    # B2 = 2 * A1 + A2 = 7: ±10% em A1 muda 0,4; em A2, 0,3
+    barras = tornado(modelo, 'B2', variacao=0.1)
+    assert [nome for nome, *_ in barras] == ['A1', 'A2']
+    assert barras[0][1:3] == pytest.approx((6.6, 7.4))
+    assert barras[1][1:3] == pytest.approx((6.7, 7.3))
+    assert barras[0][3] == pytest.approx(4 / 7)
+    assert tornado(modelo, 'C1', entradas=['A1']) == []
@@ -0,0 +1,77 @@
+# Arquivo: tests/test_valores.py
+# Data: 17/10/2026
+# Cópia sob demanda dos valores do usuário (banco/valores.py): só as células
+# diferentes do template são gravadas e a visão {tabela}_usuario as lê de volta
+
+import pytest
+
+from banco import versoes
+from banco.valores import TABELA, visao
+from motor.modelo import ModeloUsuario
+from motor.template import carregar_template
+
+# Usuário cadastrado sem valores gravados
+USUARIO = 30
+
+
+def linhas_usuario(cursor, user_id):
+    cursor.execute(f"SELECT name_element, value_element FROM {TABELA} WHERE user_id = ?", (user_id,))
+    return dict(cursor.fetchall())
+
+
+def valor_visao(cursor, user_id, nome):
+    cursor.execute(f"""
+        SELECT value_element FROM {visao('forms_tab')}
+        WHERE user_id = ? AND name_element = ?
+    """, (user_id, nome))
+    return cursor.fetchone()[0]
+
+
+def test_usuario_novo_le_o_template_sem_gravar(cursor):
+    assert linhas_usuario(cursor, USUARIO) == {}
+    modelo = ModeloUsuario.carregar(cursor, USUARIO)
+    modelo.recalcular()
+    assert modelo.salvar(cursor) == 0
+    assert linhas_usuario(cursor, USUARIO) == {}
+
+
+def test_ida_e_volta(cursor):
+    template = carregar_template(cursor)
+    modelo = ModeloUsuario.carregar(cursor, USUARIO, template)
+    modelo.recalcular()
+    nome = 'B15'
+    padrao = modelo.valor(nome)
+    dependentes = {template.nomes[slot] for slot in template.afetados({template.indice[nome]})}
+
+    # Alteração: a entrada e as calculadas que mudaram são gravadas, nada mais
+    modelo.definir(nome, padrao + 10)
+    mudaram = modelo.propagar({nome})
+    assert mudaram and mudaram <= dependentes
+    modelo.salvar(cursor)
+    gravadas = linhas_usuario(cursor, USUARIO)
+    assert set(gravadas) == {nome} | mudaram
+    assert valor_visao(cursor, USUARIO, nome) == pytest.approx(padrao + 10)
+    assert valor_visao(cursor, USUARIO - 1, nome) == pytest.approx(padrao)
+
+    recarregado = ModeloUsuario.carregar(cursor, USUARIO, template)
+    assert recarregado.valores == pytest.approx(modelo.valores)
+
+    # Volta ao padrão: as linhas são removidas
+    modelo.definir(nome, padrao)
+    modelo.propagar({nome})
+    modelo.salvar(cursor)
+    assert linhas_usuario(cursor, USUARIO) == {}
+    assert valor_visao(cursor, USUARIO, nome) == pytest.approx(padrao)
+
+
+def test_gravacao_troca_so_a_marca_do_usuario(cursor):
+    chaves = (versoes.chave_usuario(USUARIO), versoes.chave_usuario(USUARIO - 1)) + versoes.CHAVES
+    antes = versoes.marcas(cursor, chaves)
+
+    modelo = ModeloUsuario.carregar(cursor, USUARIO)
+    modelo.definir('B15', modelo.valor('B15') + 1)
+    modelo.salvar(cursor)
+
+    depois = versoes.marcas(cursor, chaves)
+    assert depois[0] != antes[0]
+    assert depois[1:] == antes[1:]